@@ -10,73 +10,233 @@ from src.models.user import db
 from src.models.cliente import Cliente
 from src.models.servico import Servico
 from src.models.agendamento import Agendamento
+from src.models.agendamento_historico import AgendamentoHistorico
+from src.models.idempotencia import ChaveIdempotencia
+from src.models.lembrete import Lembrete
+from src.models.lista_espera import ListaEspera
+from src.models.relatorio import Relatorio
+from src.models.auditoria import RegistroAuditoria
+from src.models.esquema import atualizar_esquema
 from src.routes.user import user_bp
 from src.routes.cliente import cliente_bp
 from src.routes.servico import servico_bp
 from src.routes.agendamento import agendamento_bp
 from src.routes.dashboard import dashboard_bp
+from src.routes.lista_espera import lista_espera_bp
+from src.routes.relatorio import relatorio_bp
+from src.routes.batch import batch_bp
+from src.routes.auditoria import auditoria_bp
+from src.routes.admin import admin_bp
+from src.services.arquivamento import comando_arquivar
+from src.services import inquilinos, negociacao, leitura, perfilamento, rastreamento, lembretes, manutencao, relatorios, batch, auditoria
+from src.services.snapshots import comando_snapshots
+from src.services.contadores import COLUNAS_CONTADORES, registrar_eventos, recalcular_contadores, comando_recalcular
+from src.services.orcamento_sql import comando_orcamento_sql
+from src.services.consultas import comando_benchmark_consultas
 
-# Configuração básica do Flask
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Inicialização do banco de dados
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-# Swagger config
-swagger_config = {
-    "headers": [],
-    "specs": [
-        {
-            "endpoint": 'apispec_1',
-            "route": '/api/docs/swagger.json',
-            "rule_filter": lambda rule: True,
-            "model_filter": lambda tag: True,
+
+def criar_app(configuracao=None):
+    """Cria a aplicação; `configuracao` sobrescreve os valores padrão (ex.: outro banco)"""
+    # Configuração básica do Flask
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Cache de SQL compilado por engine (consultas cacheadas em src/services/consultas.py)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
+
+    # Modo multi-inquilino: um banco SQLite por salão (ver `flask inquilinos`)
+    app.config['INQUILINOS_ATIVO'] = False
+    app.config['INQUILINOS_DIRETORIO'] = os.path.join(os.path.dirname(__file__), 'database', 'inquilinos')
+    app.config['INQUILINOS_DOMINIO'] = None  # ex.: 'agenda.exemplo.com' para <salao>.agenda.exemplo.com
+    app.config['INQUILINOS_MAXIMO_ENGINES'] = 64  # engines abertas ao mesmo tempo (LRU)
+
+    # Arquivamento de agendamentos antigos (ver `flask arquivar-agendamentos`)
+    app.config['ARQUIVAMENTO_HORIZONTE_DIAS'] = 180
+    app.config['ARQUIVAMENTO_TAMANHO_LOTE'] = 500
+
+    # Linhas lidas do banco por vez na exportação CSV
+    app.config['EXPORTACAO_TAMANHO_LOTE'] = 1000
+
+    # Respostas guardadas para o cabeçalho Idempotency-Key
+    app.config['IDEMPOTENCIA_TTL_HORAS'] = 24
+    app.config['IDEMPOTENCIA_INTERVALO_LIMPEZA'] = 300  # segundos entre remoções de chaves vencidas
+    app.config['IDEMPOTENCIA_PRAZO_PROCESSAMENTO'] = 60  # segundos até uma reserva sem resposta poder ser assumida
+
+    # Escritas em clientes, serviços e agendamentos sem If-Match recebem 428 (ver src/services/concorrencia.py)
+    app.config['CONCORRENCIA_EXIGIR_IF_MATCH'] = False
+
+    # Clientes gravados por INSERT na sincronização com o CRM (POST /api/clientes/sync)
+    app.config['SINCRONIZACAO_TAMANHO_LOTE'] = 500
+
+    # Relatórios calculados em segundo plano (POST /api/relatorios)
+    app.config['RELATORIOS_TRABALHADORES'] = 2  # threads do pool
+    app.config['RELATORIOS_TTL_HORAS'] = 24  # tempo em que o resultado fica disponível
+    app.config['RELATORIOS_TEMPO_MAXIMO_MINUTOS'] = 30  # pedidos em andamento além disso são dados como interrompidos
+
+    # Várias chamadas da API em uma requisição (POST /api/batch)
+    app.config['BATCH_MAXIMO_REQUISICOES'] = 20
+    app.config['BATCH_TRABALHADORES'] = 4  # threads para lotes paralelos de GETs
+
+    # Maior página aceita por ?limite= nas listagens de agendamentos e clientes
+    app.config['LISTAGEM_LIMITE_MAXIMO'] = 500
+
+    # Quantidade máxima de agendamentos por operação em lote
+    app.config['LOTE_MAXIMO_AGENDAMENTOS'] = 500
+
+    # Horário liberado por cancelamento ou remoção é agendado para o melhor pedido da lista de espera
+    app.config['LISTA_ESPERA_PREENCHIMENTO_AUTOMATICO'] = True
+
+    # Engine separada para dashboard e relatórios (ver src/services/leitura.py)
+    app.config['LEITURA_MODO'] = 'wal'  # 'wal', 'replica' ou 'principal'
+    app.config['LEITURA_DEFASAGEM_MAXIMA'] = 30  # segundos entre renovações da réplica
+    app.config['LEITURA_REPLICA_CAMINHO'] = None  # padrão: <banco>.replica
+
+    # Snapshots do banco com a aplicação no ar (ver `flask snapshots` e /api/admin/snapshots)
+    app.config['SNAPSHOTS_DIRETORIO'] = os.path.join(os.path.dirname(__file__), 'database', 'snapshots')
+    app.config['SNAPSHOTS_RETENCAO'] = 7  # snapshots mantidos por banco
+    app.config['SNAPSHOTS_PAGINAS_POR_PASSO'] = 100
+    app.config['SNAPSHOTS_PAUSA_MS'] = 10  # espera entre passos da cópia
+    app.config['SNAPSHOTS_MAXIMO_REINICIOS'] = 20  # bancos fora do modo WAL: recomeços tolerados
+
+    # Área administrativa (/api/admin/*), protegida pelo cabeçalho X-Admin-Token
+    app.config['ADMIN_SEGREDO'] = os.environ.get('ADMIN_SEGREDO')
+
+    # Perfilamento sob demanda: cabeçalho X-Perfil com o segredo ou amostragem aleatória
+    app.config['PERFIL_SEGREDO'] = os.environ.get('PERFIL_SEGREDO')
+    app.config['PERFIL_TAXA_AMOSTRAGEM'] = 0.0  # fração das requisições perfiladas (0 desativa)
+    app.config['PERFIL_DIRETORIO'] = os.path.join(os.path.dirname(__file__), 'perfis')
+    app.config['PERFIL_MAXIMO_ARQUIVOS'] = 50
+
+    # Rastros de requisições (seções e SQL) em JSON do Chrome: cabeçalho X-Rastreio com o segredo ou amostragem
+    app.config['RASTREAMENTO_SEGREDO'] = os.environ.get('RASTREAMENTO_SEGREDO')
+    app.config['RASTREAMENTO_TAXA_AMOSTRAGEM'] = 0.0  # fração das requisições rastreadas (0 desativa)
+    app.config['RASTREAMENTO_DIRETORIO'] = os.path.join(os.path.dirname(__file__), 'rastros')
+    app.config['RASTREAMENTO_MAXIMO_ARQUIVOS'] = 200
+
+    # Horário de funcionamento considerado no mapa de ocupação
+    app.config['OCUPACAO_HORA_ABERTURA'] = 8
+    app.config['OCUPACAO_HORA_FECHAMENTO'] = 20
+
+    # Compressão das respostas da API (brotli se instalado, senão gzip) e MessagePack via Accept
+    app.config['COMPRESSAO_TAMANHO_MINIMO'] = 1024  # bytes
+    app.config['COMPRESSAO_NIVEL_GZIP'] = 6
+    app.config['COMPRESSAO_QUALIDADE_BROTLI'] = 5
+
+    # Lembretes 24h e 2h antes de cada agendamento, gravados na tabela `lembrete`
+    app.config['LEMBRETES_ATIVO'] = True
+    app.config['LEMBRETES_HORIZONTE_HORAS'] = 48  # janela mantida em memória (recarregada na metade)
+    app.config['LEMBRETES_TOLERANCIA_MINUTOS'] = 30  # atraso máximo aceito para um lembrete (ex.: após reinício)
+    app.config['LEMBRETES_TAMANHO_LOTE'] = 200
+
+    # Histórico de alterações (GET /api/auditoria), gravado em lotes por uma thread
+    app.config['AUDITORIA_ATIVO'] = True
+    app.config['AUDITORIA_TAMANHO_FILA'] = 10000  # registros aguardando gravação; além disso, quem confirma grava
+    app.config['AUDITORIA_TAMANHO_LOTE'] = 200
+    app.config['AUDITORIA_INTERVALO_MS'] = 500  # espera máxima para completar um lote
+
+    # Encerramento de agendamentos vencidos (ver `flask manutencao-agendamentos`)
+    app.config['MANUTENCAO_STATUS_VENCIDO'] = 'nao_compareceu'
+    app.config['MANUTENCAO_TOLERANCIA_MINUTOS'] = 60  # após o horário marcado
+    app.config['MANUTENCAO_TAMANHO_LOTE'] = 500
+    app.config['MANUTENCAO_INTERVALO_MINUTOS'] = 0  # execução automática em segundo plano (0 desativa)
+
+    if configuracao:
+        app.config.update(configuracao)
+
+    # Inicialização do banco de dados
+    db.init_app(app)
+    registrar_eventos()
+    lembretes.registrar_eventos()
+    auditoria.registrar_eventos()
+    with app.app_context():
+        db.create_all()
+        colunas_adicionadas = atualizar_esquema()
+        # Bancos criados antes dos contadores precisam preenchê-los uma vez
+        if COLUNAS_CONTADORES.intersection(colunas_adicionadas):
+            recalcular_contadores()
+            db.session.commit()
+    inquilinos.init_app(app)
+    negociacao.init_app(app)  # primeiro after_request registrado: comprime por último
+    leitura.init_app(app)
+    perfilamento.init_app(app)
+    rastreamento.init_app(app)
+    lembretes.init_app(app)
+    manutencao.init_app(app)
+    relatorios.init_app(app)
+    batch.init_app(app)
+    auditoria.init_app(app)
+
+    # Swagger config
+    swagger_config = {
+        "headers": [],
+        "specs": [
+            {
+                "endpoint": 'apispec_1',
+                "route": '/api/docs/swagger.json',
+                "rule_filter": lambda rule: True,
+                "model_filter": lambda tag: True,
+            }
+        ],
+        "static_url_path": "/flasgger_static",
+        "swagger_ui": True,
+        "specs_route": "/api/docs/"
+    }
+
+    swagger_template = {
+        "swagger": "2.0",
+        "info": {
+            "title": "API de Agendamentos",
+            "description": "Documentação da API com Swagger UI",
+            "version": "1.0.0"
         }
-    ],
-    "static_url_path": "/flasgger_static",
-    "swagger_ui": True,
-    "specs_route": "/api/docs/"
-}
-
-swagger_template = {
-    "swagger": "2.0",
-    "info": {
-        "title": "API de Agendamentos",
-        "description": "Documentação da API com Swagger UI",
-        "version": "1.0.0"
     }
-}
-
-swagger = Swagger(app, config=swagger_config, template=swagger_template)
-
-# Registro de blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(cliente_bp, url_prefix='/api')
-app.register_blueprint(servico_bp, url_prefix='/api')
-app.register_blueprint(agendamento_bp, url_prefix='/api')
-app.register_blueprint(dashboard_bp, url_prefix='/api')
-
-# Rota para servir o front (SPA)
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+
+    swagger = Swagger(app, config=swagger_config, template=swagger_template)
+
+    # Registro de blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(cliente_bp, url_prefix='/api')
+    app.register_blueprint(servico_bp, url_prefix='/api')
+    app.register_blueprint(agendamento_bp, url_prefix='/api')
+    app.register_blueprint(dashboard_bp, url_prefix='/api')
+    app.register_blueprint(lista_espera_bp, url_prefix='/api')
+    app.register_blueprint(relatorio_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(auditoria_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+
+    # Comandos de linha de comando (flask --app src.main <comando>)
+    app.cli.add_command(comando_arquivar)
+    app.cli.add_command(comando_recalcular)
+    app.cli.add_command(comando_orcamento_sql)
+    app.cli.add_command(manutencao.comando_manutencao)
+    app.cli.add_command(inquilinos.comando_inquilinos)
+    app.cli.add_command(negociacao.comando_benchmark)
+    app.cli.add_command(comando_benchmark_consultas)
+    app.cli.add_command(comando_snapshots)
+
+    # Rota para servir o front (SPA)
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+            return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    return app
+
+
+app = criar_app()
 
 # Inicialização do servidor
 if __name__ == '__main__':
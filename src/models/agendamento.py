@@ -1,14 +1,25 @@
 from src.models.user import db
+from src.models.auditoria import auditada
 from datetime import datetime, timezone
 
+STATUS_VALIDOS = ['agendado', 'concluido', 'cancelado', 'nao_compareceu']
+
 class Agendamento(db.Model):
+    __table_args__ = (
+        db.Index('ix_agendamento_status_data', 'status', 'data_agendamento'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
-    servico_id = db.Column(db.Integer, db.ForeignKey('servico.id'), nullable=False)
-    data_agendamento = db.Column(db.DateTime, nullable=False)
-    data_criacao = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    status = db.Column(db.String(20), default='agendado')  # agendado, concluido, cancelado
-    observacoes = db.Column(db.Text, nullable=True)
+    cliente_id = auditada(db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True))
+    servico_id = auditada(db.Column(db.Integer, db.ForeignKey('servico.id'), nullable=False, index=True))
+    data_agendamento = auditada(db.Column(db.DateTime, nullable=False, index=True))
+    data_criacao = auditada(db.Column(db.DateTime, default=datetime.now(timezone.utc)))
+    status = auditada(db.Column(db.String(20), default='agendado'))  # agendado, concluido, cancelado, nao_compareceu
+    observacoes = auditada(db.Column(db.Text, nullable=True))
+
+    # Controle de concorrência otimista: todo UPDATE do ORM leva `WHERE versao = <lida>` e incrementa a versão
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': versao}
 
     def __repr__(self):
         return f'<Agendamento {self.id} - Cliente: {self.cliente_id} - Serviço: {self.servico_id}>'
@@ -22,6 +33,7 @@ class Agendamento(db.Model):
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
             'status': self.status,
             'observacoes': self.observacoes,
+            'versao': self.versao,
             'cliente_nome': self.cliente.nome if self.cliente else None,
             'servico_nome': self.servico.nome if self.servico else None,
             'servico_preco': self.servico.preco if self.servico else None,
@@ -0,0 +1,29 @@
+from src.models.user import db
+
+class AgendamentoHistorico(db.Model):
+    """Agendamentos antigos (concluídos/cancelados) movidos para fora da tabela principal"""
+    __tablename__ = 'agendamento_historico'
+
+    id = db.Column(db.Integer, primary_key=True)  # mesmo id do agendamento original
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
+    servico_id = db.Column(db.Integer, db.ForeignKey('servico.id'), nullable=False, index=True)
+    data_agendamento = db.Column(db.DateTime, nullable=False, index=True)
+    data_criacao = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    observacoes = db.Column(db.Text, nullable=True)
+    data_arquivamento = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<AgendamentoHistorico {self.id} - Cliente: {self.cliente_id} - Serviço: {self.servico_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cliente_id': self.cliente_id,
+            'servico_id': self.servico_id,
+            'data_agendamento': self.data_agendamento.isoformat() if self.data_agendamento else None,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'status': self.status,
+            'observacoes': self.observacoes,
+            'data_arquivamento': self.data_arquivamento.isoformat() if self.data_arquivamento else None
+        }
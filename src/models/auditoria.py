@@ -0,0 +1,55 @@
+import json
+from src.models.user import db
+from sqlalchemy import DDL, event
+
+def auditada(coluna):
+    """Coluna cujas alterações vão para o histórico.
+
+    Com `active_history`, atribuir a um atributo expirado (ex.: após um
+    commit) carrega antes o valor anterior, para que o "antes" da
+    auditoria nunca fique em branco.
+    """
+    return db.column_property(coluna, active_history=True)
+
+
+class RegistroAuditoria(db.Model):
+    """Alteração confirmada em um agendamento, cliente ou serviço (ver src/services/auditoria.py)"""
+    __tablename__ = 'auditoria'
+    __table_args__ = (
+        db.Index('ix_auditoria_entidade', 'entidade', 'entidade_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.DateTime, nullable=False, index=True)  # momento do commit (UTC)
+    entidade = db.Column(db.String(20), nullable=False)  # agendamento, cliente ou servico
+    entidade_id = db.Column(db.Integer, nullable=False)
+    acao = db.Column(db.String(20), nullable=False)  # criacao, alteracao ou remocao
+    alteracoes = db.Column(db.Text, nullable=False)  # JSON: campo -> [antes, depois]
+    autor = db.Column(db.String(100), nullable=True)  # cabeçalho X-Usuario da requisição
+    origem = db.Column(db.String(45), nullable=True)  # endereço IP
+    requisicao = db.Column(db.String(200), nullable=True)  # método e caminho, ou comando da CLI
+
+    def __repr__(self):
+        return f'<RegistroAuditoria {self.acao} - {self.entidade} {self.entidade_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'data': self.data.isoformat() if self.data else None,
+            'entidade': self.entidade,
+            'entidade_id': self.entidade_id,
+            'acao': self.acao,
+            'alteracoes': json.loads(self.alteracoes),
+            'autor': self.autor,
+            'origem': self.origem,
+            'requisicao': self.requisicao
+        }
+
+
+# Somente inclusão: o próprio banco recusa UPDATE e DELETE na tabela
+for _operacao in ('UPDATE', 'DELETE'):
+    event.listen(RegistroAuditoria.__table__, 'after_create', DDL(
+        f'CREATE TRIGGER auditoria_sem_{_operacao.lower()} BEFORE {_operacao} ON auditoria '
+        "BEGIN SELECT RAISE(ABORT, 'auditoria: registros não podem ser alterados nem removidos'); END"
+    ).execute_if(dialect='sqlite'))
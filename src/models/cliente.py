@@ -1,12 +1,22 @@
 from src.models.user import db
+from src.models.auditoria import auditada
 from datetime import datetime
 
 class Cliente(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False)
-    telefone = db.Column(db.String(20), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=True)
-    data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
+    nome = auditada(db.Column(db.String(100), nullable=False))
+    telefone = auditada(db.Column(db.String(20), nullable=False))
+    email = auditada(db.Column(db.String(120), unique=True, nullable=True))
+    data_cadastro = auditada(db.Column(db.DateTime, default=datetime.utcnow))
+
+    # Contadores mantidos a cada escrita de agendamento (ver src/services/contadores.py)
+    total_agendamentos = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    total_concluidos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    ultimo_agendamento = db.Column(db.DateTime, nullable=True)
+
+    # Versão da linha para If-Match/ETag (ver src/services/concorrencia.py)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': versao}
     
     # Relacionamento com agendamentos
     agendamentos = db.relationship('Agendamento', backref='cliente', lazy=True, cascade='all, delete-orphan')
@@ -20,6 +30,9 @@ class Cliente(db.Model):
             'nome': self.nome,
             'telefone': self.telefone,
             'email': self.email,
-            'data_cadastro': self.data_cadastro.isoformat() if self.data_cadastro else None
+            'data_cadastro': self.data_cadastro.isoformat() if self.data_cadastro else None,
+            'total_agendamentos': self.total_agendamentos,
+            'ultimo_agendamento': self.ultimo_agendamento.isoformat() if self.ultimo_agendamento else None,
+            'versao': self.versao
         }
 
@@ -0,0 +1,107 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from flask import current_app
+from src.models.user import db
+from src.models.auditoria import RegistroAuditoria
+from sqlalchemy import insert, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+def atualizar_esquema(engine=None):
+    """Adiciona a bancos existentes as colunas e índices novos dos modelos.
+
+    `db.create_all()` só cria tabelas que não existem; esta função completa
+    as tabelas já existentes com `ALTER TABLE ... ADD COLUMN` e `CREATE INDEX`
+    e aplica as migrações de dados ainda pendentes (MIGRACOES_DADOS).
+    Retorna a lista de colunas adicionadas no formato 'tabela.coluna'.
+    """
+    engine = engine or db.engine
+    inspetor = inspect(engine)
+    adicionadas = []
+
+    with engine.begin() as conexao:
+        for tabela in db.metadata.sorted_tables:
+            if not inspetor.has_table(tabela.name):
+                continue
+
+            existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in existentes:
+                    continue
+                definicao = CreateColumn(coluna).compile(dialect=engine.dialect)
+                conexao.exec_driver_sql(f'ALTER TABLE {tabela.name} ADD COLUMN {definicao}')
+                adicionadas.append(f'{tabela.name}.{coluna.name}')
+
+            indices = {indice['name'] for indice in inspetor.get_indexes(tabela.name)}
+            for indice in tabela.indexes:
+                if indice.name not in indices:
+                    indice.create(conexao)
+
+        _migrar_dados(conexao)
+
+    return adicionadas
+
+
+def _migrar_dados(conexao):
+    """Executa, na transação do esquema, as migrações de dados que este banco ainda não recebeu.
+
+    `PRAGMA user_version` guarda quantas migrações de MIGRACOES_DADOS já foram
+    aplicadas: cada uma roda uma única vez por banco, não a cada inicialização.
+    """
+    aplicadas = conexao.exec_driver_sql('PRAGMA user_version').scalar()
+    for versao, migracao in enumerate(MIGRACOES_DADOS[aplicadas:], start=aplicadas + 1):
+        migracao(conexao)
+        conexao.exec_driver_sql(f'PRAGMA user_version = {versao}')
+
+
+def _normalizar_emails(conexao):
+    """Grava os e-mails de clientes no formato usado pela sincronização com o CRM.
+
+    O upsert da sincronização usa ON CONFLICT(email) e só encontra o cliente
+    se o e-mail gravado já estiver normalizado. Quando mais de um cliente
+    normaliza para o mesmo e-mail nenhum deles é alterado e o conflito
+    vai para o log. As alterações entram no histórico de auditoria.
+    """
+    # Importado aqui: o pacote de serviços depende deste módulo (inquilinos)
+    from src.services.sincronizacao import normalizar_email
+
+    grupos = defaultdict(list)
+    for cliente_id, email in conexao.execute(text('SELECT id, email FROM cliente WHERE email IS NOT NULL')):
+        grupos[normalizar_email(email)].append((cliente_id, email))
+
+    colisoes = {}
+    alteracoes = []
+    for normalizado, clientes in grupos.items():
+        if normalizado is not None and len(clientes) > 1:
+            colisoes[normalizado] = sorted(cliente_id for cliente_id, _ in clientes)
+            continue
+        alteracoes.extend(
+            {'id': cliente_id, 'email': normalizado, 'anterior': email}
+            for cliente_id, email in clientes if email != normalizado
+        )
+
+    if alteracoes:
+        conexao.execute(text('UPDATE cliente SET email = :email, versao = versao + 1 WHERE id = :id'), alteracoes)
+        if current_app.config['AUDITORIA_ATIVO']:
+            data = datetime.now(timezone.utc).replace(tzinfo=None)
+            conexao.execute(insert(RegistroAuditoria), [
+                {
+                    'data': data,
+                    'entidade': 'cliente',
+                    'entidade_id': alteracao['id'],
+                    'acao': 'alteracao',
+                    'alteracoes': json.dumps({'email': [alteracao['anterior'], alteracao['email']]}, ensure_ascii=False),
+                    'requisicao': 'migração: normalização de e-mails'
+                }
+                for alteracao in alteracoes
+            ])
+
+    if colisoes:
+        current_app.logger.warning(
+            'E-mails de clientes não normalizados por colisão (resolva manualmente): %s',
+            '; '.join(f'{email}: ids {", ".join(map(str, ids))}' for email, ids in colisoes.items())
+        )
+
+
+# Migrações de dados, na ordem em que foram criadas; só se acrescenta ao fim da lista
+MIGRACOES_DADOS = [_normalizar_emails]
@@ -0,0 +1,18 @@
+from src.models.user import db
+
+class ChaveIdempotencia(db.Model):
+    """Resposta armazenada para uma requisição identificada por Idempotency-Key"""
+    __tablename__ = 'chave_idempotencia'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(255), unique=True, nullable=False)
+    hash_requisicao = db.Column(db.String(64), nullable=False)  # método + rota + corpo
+    status_code = db.Column(db.Integer, nullable=True)  # None enquanto a requisição está em processamento
+    mimetype = db.Column(db.String(100), nullable=True)
+    corpo = db.Column(db.LargeBinary, nullable=True)
+    cabecalhos = db.Column(db.Text, nullable=True)  # JSON: ETag, Location, Content-Type e Vary da resposta
+    data_criacao = db.Column(db.DateTime, nullable=False)  # reserva da chave; renovada quando outra requisição a assume
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ChaveIdempotencia {self.chave}>'
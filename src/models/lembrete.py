@@ -0,0 +1,35 @@
+from src.models.user import db
+
+class Lembrete(db.Model):
+    """Caixa de saída de lembretes; o gateway de SMS lê as linhas com enviado_em nulo"""
+    __tablename__ = 'lembrete'
+    __table_args__ = (
+        # O mesmo lembrete nunca é gerado duas vezes (nem por dois processos)
+        db.UniqueConstraint('agendamento_id', 'tipo', 'data_agendamento', name='uq_lembrete_agendamento_tipo_data'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    agendamento_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(10), nullable=False)  # '24h' ou '2h'
+    data_agendamento = db.Column(db.DateTime, nullable=False)
+    cliente_nome = db.Column(db.String(100), nullable=False)
+    cliente_telefone = db.Column(db.String(20), nullable=False)
+    mensagem = db.Column(db.Text, nullable=False)
+    data_criacao = db.Column(db.DateTime, nullable=False)
+    enviado_em = db.Column(db.DateTime, nullable=True, index=True)  # preenchido pelo gateway
+
+    def __repr__(self):
+        return f'<Lembrete {self.tipo} - Agendamento: {self.agendamento_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'agendamento_id': self.agendamento_id,
+            'tipo': self.tipo,
+            'data_agendamento': self.data_agendamento.isoformat() if self.data_agendamento else None,
+            'cliente_nome': self.cliente_nome,
+            'cliente_telefone': self.cliente_telefone,
+            'mensagem': self.mensagem,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'enviado_em': self.enviado_em.isoformat() if self.enviado_em else None
+        }
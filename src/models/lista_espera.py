@@ -0,0 +1,46 @@
+from src.models.user import db
+from datetime import datetime, timezone
+
+STATUS_LISTA_ESPERA = ['aguardando', 'atendido']
+
+class ListaEspera(db.Model):
+    """Pedido de um cliente por um serviço em qualquer horário dentro de [janela_inicio, janela_fim)"""
+    __tablename__ = 'lista_espera'
+    __table_args__ = (
+        # Busca de candidatos para uma vaga liberada (ver src/services/lista_espera.py)
+        db.Index('ix_lista_espera_status_duracao_janela', 'status', 'duracao_minutos', 'janela_inicio', 'janela_fim'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
+    servico_id = db.Column(db.Integer, db.ForeignKey('servico.id'), nullable=False, index=True)
+    # Cópia da duração do serviço, mantida ao editar o serviço, para filtrar pelo índice
+    duracao_minutos = db.Column(db.Integer, nullable=False)
+    janela_inicio = db.Column(db.DateTime, nullable=False)
+    janela_fim = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='aguardando')  # aguardando, atendido
+    agendamento_id = db.Column(db.Integer, db.ForeignKey('agendamento.id'), nullable=True)
+    observacoes = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    cliente = db.relationship('Cliente', backref=db.backref('lista_espera', lazy=True, cascade='all, delete-orphan'))
+    servico = db.relationship('Servico', backref=db.backref('lista_espera', lazy=True, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<ListaEspera {self.id} - Cliente: {self.cliente_id} - Serviço: {self.servico_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cliente_id': self.cliente_id,
+            'servico_id': self.servico_id,
+            'duracao_minutos': self.duracao_minutos,
+            'janela_inicio': self.janela_inicio.isoformat() if self.janela_inicio else None,
+            'janela_fim': self.janela_fim.isoformat() if self.janela_fim else None,
+            'status': self.status,
+            'agendamento_id': self.agendamento_id,
+            'observacoes': self.observacoes,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'cliente_nome': self.cliente.nome if self.cliente else None,
+            'servico_nome': self.servico.nome if self.servico else None
+        }
@@ -0,0 +1,46 @@
+import json
+from src.models.user import db
+
+STATUS_ATIVOS = ('pendente', 'executando')
+
+class Relatorio(db.Model):
+    """Relatório calculado em segundo plano (ver src/services/relatorios.py)"""
+    __tablename__ = 'relatorio'
+    __table_args__ = (
+        # Um único cálculo em andamento por conjunto de parâmetros, mesmo entre processos
+        db.Index(
+            'uq_relatorio_chave_ativo', 'chave', unique=True,
+            sqlite_where=db.text("status IN ('pendente', 'executando')")
+        ),
+        # Ids de relatórios expirados não são reaproveitados (a URL antiga não aponta para outro relatório)
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False)
+    parametros = db.Column(db.Text, nullable=False)  # JSON normalizado
+    chave = db.Column(db.String(64), nullable=False, index=True)  # sha256 de tipo + parâmetros
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, executando, concluido, erro
+    resultado = db.Column(db.Text, nullable=True)  # JSON
+    erro = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, nullable=False)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<Relatorio {self.id} - {self.tipo} ({self.status})>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': json.loads(self.parametros),
+            'status': self.status,
+            'resultado': json.loads(self.resultado) if self.resultado else None,
+            'erro': self.erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'iniciado_em': self.iniciado_em.isoformat() if self.iniciado_em else None,
+            'concluido_em': self.concluido_em.isoformat() if self.concluido_em else None,
+            'expira_em': self.expira_em.isoformat() if self.expira_em else None
+        }
@@ -1,12 +1,22 @@
 from src.models.user import db
+from src.models.auditoria import auditada
 
 class Servico(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False)
-    descricao = db.Column(db.Text, nullable=True)
-    preco = db.Column(db.Float, nullable=False)
-    duracao_minutos = db.Column(db.Integer, nullable=False)  # duração em minutos
-    ativo = db.Column(db.Boolean, default=True)
+    nome = auditada(db.Column(db.String(100), nullable=False))
+    descricao = auditada(db.Column(db.Text, nullable=True))
+    preco = auditada(db.Column(db.Float, nullable=False))
+    duracao_minutos = auditada(db.Column(db.Integer, nullable=False))  # duração em minutos
+    ativo = auditada(db.Column(db.Boolean, default=True))
+
+    # Contadores mantidos a cada escrita de agendamento (ver src/services/contadores.py)
+    total_agendamentos = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    total_concluidos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    ultimo_agendamento = db.Column(db.DateTime, nullable=True)
+
+    # Versão da linha para If-Match/ETag (ver src/services/concorrencia.py)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': versao}
     
     # Relacionamento com agendamentos
     agendamentos = db.relationship('Agendamento', backref='servico', lazy=True)
@@ -21,6 +31,8 @@ class Servico(db.Model):
             'descricao': self.descricao,
             'preco': self.preco,
             'duracao_minutos': self.duracao_minutos,
-            'ativo': self.ativo
+            'ativo': self.ativo,
+            'total_agendamentos': self.total_agendamentos,
+            'versao': self.versao
         }
 
@@ -0,0 +1,12 @@
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+class SessaoInquilino(Session):
+    """Sessão que usa o banco do salão da requisição atual, quando houver (ver src/services/inquilinos.py)"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engine = g.get('inquilino_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.models.sessao import SessaoInquilino
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SessaoInquilino})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
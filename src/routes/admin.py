@@ -0,0 +1,148 @@
+import hmac
+from flask import Blueprint, current_app, request, jsonify, send_from_directory
+from src.services.perfilamento import NOME_VALIDO, listar_perfis
+from src.services.snapshots import criar_snapshots, listar_snapshots
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.before_request
+def verificar_acesso():
+    """Exige o cabeçalho X-Admin-Token igual a ADMIN_SEGREDO"""
+    segredo = current_app.config['ADMIN_SEGREDO']
+    if not segredo:
+        return jsonify({'erro': 'Área administrativa desabilitada (defina ADMIN_SEGREDO)'}), 403
+
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token, segredo):
+        return jsonify({'erro': 'Acesso negado'}), 403
+
+
+@admin_bp.route('/admin/perfis', methods=['GET'])
+def listar():
+    """
+    Lista os perfis de requisições gravados
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Resumos dos perfis, do mais recente para o mais antigo
+    """
+    try:
+        return jsonify(listar_perfis(current_app.config['PERFIL_DIRETORIO'])), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+
+@admin_bp.route('/admin/perfis/<nome>', methods=['GET'])
+def obter(nome):
+    """
+    Resumo completo de um perfil (SQL executado, pico de memória e funções mais custosas)
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: nome
+        in: path
+        type: string
+        required: true
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Resumo do perfil em JSON
+    """
+    if not NOME_VALIDO.match(nome):
+        return jsonify({'erro': 'Nome de perfil inválido'}), 400
+    return send_from_directory(current_app.config['PERFIL_DIRETORIO'], f'{nome}.json', mimetype='application/json')
+
+
+@admin_bp.route('/admin/perfis/<nome>/prof', methods=['GET'])
+def baixar(nome):
+    """
+    Baixa o arquivo pstats de um perfil (abra com `python -m pstats` ou snakeviz)
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: nome
+        in: path
+        type: string
+        required: true
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Arquivo .prof
+    """
+    if not NOME_VALIDO.match(nome):
+        return jsonify({'erro': 'Nome de perfil inválido'}), 400
+    return send_from_directory(current_app.config['PERFIL_DIRETORIO'], f'{nome}.prof', as_attachment=True)
+
+
+@admin_bp.route('/admin/snapshots', methods=['GET'])
+def listar_snapshots_banco():
+    """
+    Lista os snapshots guardados do banco
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: inquilino
+        in: query
+        type: string
+        required: false
+        description: Salão (padrão: banco principal)
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Snapshots, do mais recente para o mais antigo
+    """
+    try:
+        return jsonify(listar_snapshots(request.args.get('inquilino'))), 200
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+
+@admin_bp.route('/admin/snapshots', methods=['POST'])
+def criar_snapshot_banco():
+    """
+    Cria um snapshot do banco sem parar a aplicação
+    ---
+    tags:
+      - Admin
+    parameters:
+      - name: inquilino
+        in: query
+        type: string
+        required: false
+        description: Salão copiado (padrão: banco principal e todos os salões)
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      201:
+        description: Snapshots criados, com duração, maior pausa e arquivos removidos pela retenção
+    """
+    try:
+        return jsonify(criar_snapshots(request.args.get('inquilino'))), 201
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
@@ -1,10 +1,25 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from src.models.user import db
-from src.models.agendamento import Agendamento
+from src.models.agendamento import Agendamento, STATUS_VALIDOS
+from src.models.agendamento_historico import AgendamentoHistorico
 from src.models.cliente import Cliente
 from src.models.servico import Servico
+from src.services.arquivamento import alcanca_arquivo
+from src.services.idempotencia import idempotente
+from src.services.lote import verificar_conflitos, deslocar_periodo, mover_para_dia, alterar_status
+from src.services.leitura import sessao_leitura
+from src.services.paginacao import ler_paginacao, pagina
+from src.services.rastreamento import secao
+from src.services.lista_espera import preencher_vaga
+from src.services.concorrencia import (
+    com_etag, etag_agendamento, etag_atual_agendamento, nao_modificado, precondicao_falhou, verificar_if_match
+)
+from src.services import consultas
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, union_all
+from sqlalchemy.orm.exc import StaleDataError
 
 agendamento_bp = Blueprint('agendamento', __name__)
 
@@ -31,48 +46,189 @@ def listar_agendamentos():
         in: query
         type: string
         required: false
-        description: Status do agendamento (agendado, concluido, cancelado)
+        description: Status do agendamento (agendado, concluido, cancelado, nao_compareceu)
       - name: cliente_id
         in: query
         type: integer
         required: false
+      - name: limite
+        in: query
+        type: integer
+        required: false
+        description: Tamanho da página; sem ele a lista vem completa
+      - name: deslocamento
+        in: query
+        type: integer
+        required: false
+        description: Posição da primeira linha da página (padrão 0)
     responses:
       200:
-        description: Lista de agendamentos
+        description: Lista de agendamentos (com limite, objeto com itens, total, limite e deslocamento)
     """
     try:
-        # Parâmetros de filtro
-        data_inicio = request.args.get('data_inicio')
-        data_fim = request.args.get('data_fim')
-        status = request.args.get('status')
-        cliente_id = request.args.get('cliente_id')
+        filtros = _ler_filtros()
+
+        try:
+            paginacao = ler_paginacao()
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        if paginacao is None:
+            # Consulta cacheada, já ordenada por data de agendamento
+            agendamentos = consultas.listar_agendamentos(db.session, **filtros)
+            return jsonify([agendamento.to_dict() for agendamento in agendamentos]), 200
+
+        limite, deslocamento = paginacao
+        agendamentos = consultas.listar_agendamentos(db.session, limite=limite, deslocamento=deslocamento, **filtros)
+        total = consultas.contar_agendamentos(db.session, **filtros)
+        return jsonify(pagina([agendamento.to_dict() for agendamento in agendamentos], total, limite, deslocamento)), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
 
-        query = Agendamento.query
+def _ler_filtros():
+    """Lê os filtros de listagem da query string"""
+    data_inicio = request.args.get('data_inicio')
+    data_fim = request.args.get('data_fim')
 
-        # Aplicar filtros
-        if data_inicio:
-            data_inicio_dt = datetime.fromisoformat(data_inicio)
-            query = query.filter(Agendamento.data_agendamento >= data_inicio_dt)
+    return {
+        'data_inicio': datetime.fromisoformat(data_inicio) if data_inicio else None,
+        'data_fim': datetime.fromisoformat(data_fim) if data_fim else None,
+        'status': request.args.get('status'),
+        'cliente_id': request.args.get('cliente_id')
+    }
 
-        if data_fim:
-            data_fim_dt = datetime.fromisoformat(data_fim)
-            query = query.filter(Agendamento.data_agendamento <= data_fim_dt)
 
-        if status:
-            query = query.filter(Agendamento.status == status)
+def _aplicar_filtros(query, tabela, filtros):
+    """Aplica os filtros de listagem a uma consulta sobre `tabela`
+
+    Funciona tanto para `Agendamento` quanto para `AgendamentoHistorico`,
+    e tanto para `Query` quanto para `select()`.
+    """
+    if filtros['data_inicio']:
+        query = query.filter(tabela.data_agendamento >= filtros['data_inicio'])
+
+    if filtros['data_fim']:
+        query = query.filter(tabela.data_agendamento <= filtros['data_fim'])
+
+    if filtros['status']:
+        query = query.filter(tabela.status == filtros['status'])
+
+    if filtros['cliente_id']:
+        query = query.filter(tabela.cliente_id == filtros['cliente_id'])
+
+    return query
 
-        if cliente_id:
-            query = query.filter(Agendamento.cliente_id == cliente_id)
 
-        # Ordenar por data de agendamento
-        agendamentos = query.order_by(Agendamento.data_agendamento.asc()).all()
+# Colunas do CSV exportado, na ordem em que aparecem no arquivo
+COLUNAS_CSV = [
+    'id', 'data_agendamento', 'status',
+    'cliente_id', 'cliente_nome', 'cliente_telefone', 'cliente_email',
+    'servico_id', 'servico_nome', 'servico_preco', 'servico_duracao',
+    'receita', 'observacoes'
+]
 
-        return jsonify([agendamento.to_dict() for agendamento in agendamentos]), 200
+
+@agendamento_bp.route('/agendamentos/export.csv', methods=['GET'])
+def exportar_agendamentos_csv():
+    """Exporta agendamentos em CSV (mesmos filtros da listagem)
+    ---
+    tags:
+      - Agendamentos
+    parameters:
+      - name: data_inicio
+        in: query
+        type: string
+        required: false
+        description: Data inicial para filtrar (ISO 8601)
+      - name: data_fim
+        in: query
+        type: string
+        required: false
+        description: Data final para filtrar (ISO 8601)
+      - name: status
+        in: query
+        type: string
+        required: false
+      - name: cliente_id
+        in: query
+        type: integer
+        required: false
+    produces:
+      - text/csv
+    responses:
+      200:
+        description: Arquivo CSV transmitido em partes (chunked)
+    """
+    try:
+        filtros = _ler_filtros()
+        leitura = sessao_leitura()
+
+        # Inclui o histórico apenas se o período alcança dados arquivados
+        fontes = [Agendamento]
+        if alcanca_arquivo(filtros['data_inicio'], leitura):
+            fontes.append(AgendamentoHistorico)
+
+        partes = [
+            _aplicar_filtros(
+                select(fonte.id, fonte.cliente_id, fonte.servico_id, fonte.data_agendamento, fonte.status, fonte.observacoes),
+                fonte, filtros
+            )
+            for fonte in fontes
+        ]
+        ag = (union_all(*partes) if len(partes) > 1 else partes[0]).subquery('ag')
+
+        consulta = select(
+            ag.c.id, ag.c.data_agendamento, ag.c.status,
+            Cliente.id, Cliente.nome, Cliente.telefone, Cliente.email,
+            Servico.id, Servico.nome, Servico.preco, Servico.duracao_minutos,
+            ag.c.observacoes
+        ).join(
+            Cliente, Cliente.id == ag.c.cliente_id
+        ).join(
+            Servico, Servico.id == ag.c.servico_id
+        ).order_by(
+            ag.c.data_agendamento.asc(), ag.c.id.asc()
+        ).execution_options(yield_per=current_app.config['EXPORTACAO_TAMANHO_LOTE'])
+
+        def gerar():
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+
+            # BOM para que planilhas reconheçam o arquivo como UTF-8
+            buffer.write('\ufeff')
+            escritor.writerow(COLUNAS_CSV)
+
+            # Cada partição vira um pedaço da resposta; só um lote fica em memória
+            for linhas in leitura.execute(consulta).partitions():
+                for (ag_id, data_ag, status, cliente_id, cliente_nome, cliente_telefone, cliente_email,
+                     servico_id, servico_nome, servico_preco, servico_duracao, observacoes) in linhas:
+                    escritor.writerow([
+                        ag_id, data_ag.isoformat() if data_ag else '', status,
+                        cliente_id, cliente_nome, cliente_telefone, cliente_email or '',
+                        servico_id, servico_nome, servico_preco, servico_duracao,
+                        servico_preco if status == 'concluido' else 0,
+                        observacoes or ''
+                    ])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+            restante = buffer.getvalue()
+            if restante:
+                yield restante
+
+        return Response(
+            stream_with_context(gerar()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=agendamentos.csv'}
+        )
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 
 @agendamento_bp.route('/agendamentos', methods=['POST'])
+@idempotente
 def criar_agendamento():
     """Cria um novo agendamento
     ---
@@ -101,65 +257,55 @@ def criar_agendamento():
         description: Agendamento criado com sucesso
     """
     try:
-        data = request.get_json()
-
-        # Validação básica
-        if not data.get('cliente_id') or not data.get('servico_id') or not data.get('data_agendamento'):
-            return jsonify({'erro': 'Cliente, serviço e data são obrigatórios'}), 400
-
-        # Verificar se cliente existe
-        cliente = Cliente.query.get(data['cliente_id'])
-        if not cliente:
-            return jsonify({'erro': 'Cliente não encontrado'}), 404
-
-        # Verificar se serviço existe e está ativo
-        servico = Servico.query.get(data['servico_id'])
-        if not servico:
-            return jsonify({'erro': 'Serviço não encontrado'}), 404
-        if not servico.ativo:
-            return jsonify({'erro': 'Serviço não está ativo'}), 400
-
-        # Converter data
-        try:
-            data_agendamento = datetime.fromisoformat(data['data_agendamento']).replace(tzinfo=timezone.utc)
-        except ValueError:
-            return jsonify({'erro': 'Formato de data inválido. Use ISO format'}), 400
-
-        # Verificar se a data não é no passado
-        if data_agendamento < datetime.now(timezone.utc):
-            return jsonify({'erro': 'Não é possível agendar para datas passadas'}), 400
-
-        # Verificar conflitos de horário
-        data_fim = data_agendamento + timedelta(minutes=servico.duracao_minutos)
-
-        agendamentos_existentes = Agendamento.query.filter_by(status='agendado').all()
-
-        for ag in agendamentos_existentes:
-            servico_existente = Servico.query.get(ag.servico_id)
-            if not servico_existente:
-                continue
-
-            inicio_existente = ag.data_agendamento
-            fim_existente = inicio_existente + timedelta(minutes=servico_existente.duracao_minutos)
-
-            inicio_novo = data_agendamento
-            fim_novo = data_agendamento + timedelta(minutes=servico.duracao_minutos)
-
-            if (inicio_novo < fim_existente and fim_novo > inicio_existente):
+        with secao('validacao'):
+            data = request.get_json()
+
+            # Validação básica
+            if not data.get('cliente_id') or not data.get('servico_id') or not data.get('data_agendamento'):
+                return jsonify({'erro': 'Cliente, serviço e data são obrigatórios'}), 400
+
+            # Verificar se cliente existe
+            cliente = Cliente.query.get(data['cliente_id'])
+            if not cliente:
+                return jsonify({'erro': 'Cliente não encontrado'}), 404
+
+            # Verificar se serviço existe e está ativo
+            servico = Servico.query.get(data['servico_id'])
+            if not servico:
+                return jsonify({'erro': 'Serviço não encontrado'}), 404
+            if not servico.ativo:
+                return jsonify({'erro': 'Serviço não está ativo'}), 400
+
+            # Converter data
+            try:
+                data_agendamento = datetime.fromisoformat(data['data_agendamento']).replace(tzinfo=timezone.utc)
+            except ValueError:
+                return jsonify({'erro': 'Formato de data inválido. Use ISO format'}), 400
+
+            # Verificar se a data não é no passado
+            if data_agendamento < datetime.now(timezone.utc):
+                return jsonify({'erro': 'Não é possível agendar para datas passadas'}), 400
+
+        # Verificar conflitos de horário (uma consulta para a janela afetada)
+        with secao('conflitos'):
+            inicio_novo = data_agendamento.replace(tzinfo=None)
+            fim_novo = inicio_novo + timedelta(minutes=servico.duracao_minutos)
+            if verificar_conflitos({None: (inicio_novo, fim_novo)}):
                 return jsonify({'erro': 'Horário não disponível. Há conflito com outro agendamento'}), 400
 
+        with secao('gravacao'):
+            agendamento = Agendamento(
+                cliente_id=data['cliente_id'],
+                servico_id=data['servico_id'],
+                data_agendamento=data_agendamento,
+                observacoes=data.get('observacoes', '')
+            )
 
-        agendamento = Agendamento(
-            cliente_id=data['cliente_id'],
-            servico_id=data['servico_id'],
-            data_agendamento=data_agendamento,
-            observacoes=data.get('observacoes', '')
-        )
-
-        db.session.add(agendamento)
-        db.session.commit()
+            db.session.add(agendamento)
+            db.session.commit()
 
-        return jsonify(agendamento.to_dict()), 201
+        with secao('resposta'):
+            return jsonify(agendamento.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -169,19 +315,29 @@ def criar_agendamento():
 def obter_agendamento(agendamento_id):
     """Obtém um agendamento específico"""
     try:
+        # GET condicional: compara a ETag lendo só as colunas que a compõem
+        resposta = nao_modificado(lambda: etag_atual_agendamento(agendamento_id))
+        if resposta:
+            return resposta
+
         agendamento = Agendamento.query.get_or_404(agendamento_id)
-        return jsonify(agendamento.to_dict()), 200
+        return com_etag(jsonify(agendamento.to_dict()), etag_agendamento(agendamento)), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 
 @agendamento_bp.route('/agendamentos/<int:agendamento_id>', methods=['PUT'])
+@idempotente
 def atualizar_agendamento(agendamento_id):
     """Atualiza um agendamento"""
     try:
         agendamento = Agendamento.query.get_or_404(agendamento_id)
         data = request.get_json()
 
+        erro = verificar_if_match(agendamento.versao)
+        if erro:
+            return erro
+
         # Validação básica
         if not data.get('cliente_id') or not data.get('servico_id') or not data.get('data_agendamento'):
             return jsonify({'erro': 'Cliente, serviço e data são obrigatórios'}), 400
@@ -216,45 +372,229 @@ def atualizar_agendamento(agendamento_id):
 
         db.session.commit()
 
-        return jsonify(agendamento.to_dict()), 200
+        return com_etag(jsonify(agendamento.to_dict()), etag_agendamento(agendamento)), 200
+    except StaleDataError:
+        db.session.rollback()
+        return precondicao_falhou()
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
 
 @agendamento_bp.route('/agendamentos/<int:agendamento_id>/status', methods=['PATCH'])
+@idempotente
 def atualizar_status_agendamento(agendamento_id):
     """Atualiza apenas o status de um agendamento"""
     try:
         agendamento = Agendamento.query.get_or_404(agendamento_id)
         data = request.get_json()
 
+        erro = verificar_if_match(agendamento.versao)
+        if erro:
+            return erro
+
         if not data.get('status'):
             return jsonify({'erro': 'Status é obrigatório'}), 400
 
-        status_validos = ['agendado', 'concluido', 'cancelado']
-        if data['status'] not in status_validos:
-            return jsonify({'erro': f'Status deve ser um dos: {", ".join(status_validos)}'}), 400
+        if data['status'] not in STATUS_VALIDOS:
+            return jsonify({'erro': f'Status deve ser um dos: {", ".join(STATUS_VALIDOS)}'}), 400
 
+        cancelado = agendamento.status == 'agendado' and data['status'] == 'cancelado'
         agendamento.status = data['status']
-        db.session.commit()
 
-        return jsonify(agendamento.to_dict()), 200
+        # O horário liberado vai para a lista de espera na mesma transação
+        with secao('lista_espera'):
+            vaga_preenchida = preencher_vaga(agendamento) if cancelado else None
+        with secao('gravacao'):
+            db.session.commit()
+
+        resposta = agendamento.to_dict()
+        if vaga_preenchida:
+            resposta['vaga_preenchida'] = vaga_preenchida.to_dict()
+        return com_etag(jsonify(resposta), etag_agendamento(agendamento)), 200
+    except StaleDataError:
+        db.session.rollback()
+        return precondicao_falhou()
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
 
 @agendamento_bp.route('/agendamentos/<int:agendamento_id>', methods=['DELETE'])
+@idempotente
 def deletar_agendamento(agendamento_id):
     """Deleta um agendamento"""
     try:
         agendamento = Agendamento.query.get_or_404(agendamento_id)
 
+        ativo = agendamento.status == 'agendado'
         db.session.delete(agendamento)
-        db.session.commit()
 
-        return jsonify({'mensagem': 'Agendamento deletado com sucesso'}), 200
+        with secao('lista_espera'):
+            vaga_preenchida = preencher_vaga(agendamento) if ativo else None
+        with secao('gravacao'):
+            db.session.commit()
+
+        resposta = {'mensagem': 'Agendamento deletado com sucesso'}
+        if vaga_preenchida:
+            resposta['vaga_preenchida'] = vaga_preenchida.to_dict()
+        return jsonify(resposta), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+
+def _ler_ids(data):
+    """Valida a lista de ids de uma operação em lote, removendo repetições"""
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        raise ValueError('Informe uma lista de ids de agendamentos')
+
+    ids = list(dict.fromkeys(ids))
+    maximo = current_app.config['LOTE_MAXIMO_AGENDAMENTOS']
+    if len(ids) > maximo:
+        raise ValueError(f'No máximo {maximo} agendamentos por operação')
+    return ids
+
+
+def _resposta_lote(sucesso, resultados):
+    return jsonify({'aplicado': sucesso, 'resultados': resultados}), 200 if sucesso else 409
+
+
+@agendamento_bp.route('/agendamentos/lote/deslocar', methods=['POST'])
+@idempotente
+def deslocar_agendamentos():
+    """Desloca todos os agendamentos ativos de um período
+    ---
+    tags:
+      - Agendamentos
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            inicio:
+              type: string
+              example: "2025-08-06T13:00:00"
+            fim:
+              type: string
+              example: "2025-08-06T18:00:00"
+            minutos:
+              type: integer
+              example: 30
+    responses:
+      200:
+        description: Todos os agendamentos foram deslocados
+      409:
+        description: Nenhuma alteração aplicada; veja o resultado por agendamento
+    """
+    try:
+        data = request.get_json()
+
+        if not data.get('inicio') or not data.get('fim') or not isinstance(data.get('minutos'), int):
+            return jsonify({'erro': 'Início, fim e minutos são obrigatórios'}), 400
+
+        try:
+            inicio = datetime.fromisoformat(data['inicio']).replace(tzinfo=None)
+            fim = datetime.fromisoformat(data['fim']).replace(tzinfo=None)
+        except ValueError:
+            return jsonify({'erro': 'Formato de data inválido. Use ISO format'}), 400
+
+        if fim <= inicio:
+            return jsonify({'erro': 'O fim do período deve ser posterior ao início'}), 400
+
+        return _resposta_lote(*deslocar_periodo(inicio, fim, data['minutos']))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+
+@agendamento_bp.route('/agendamentos/lote/mover', methods=['POST'])
+@idempotente
+def mover_agendamentos():
+    """Move um conjunto de agendamentos para outro dia, mantendo os horários
+    ---
+    tags:
+      - Agendamentos
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 3]
+            data:
+              type: string
+              example: "2025-08-07"
+    responses:
+      200:
+        description: Todos os agendamentos foram movidos
+      409:
+        description: Nenhuma alteração aplicada; veja o resultado por agendamento
+    """
+    try:
+        data = request.get_json()
+
+        try:
+            ids = _ler_ids(data)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        try:
+            dia = datetime.fromisoformat(data.get('data') or '').date()
+        except ValueError:
+            return jsonify({'erro': 'Formato de data inválido. Use ISO format'}), 400
+
+        return _resposta_lote(*mover_para_dia(ids, dia))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+
+@agendamento_bp.route('/agendamentos/lote/status', methods=['POST'])
+@idempotente
+def alterar_status_agendamentos():
+    """Altera o status de vários agendamentos
+    ---
+    tags:
+      - Agendamentos
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [1, 2, 3]
+            status:
+              type: string
+              example: cancelado
+    responses:
+      200:
+        description: Status alterado em todos os agendamentos
+      409:
+        description: Nenhuma alteração aplicada; veja o resultado por agendamento
+    """
+    try:
+        data = request.get_json()
+
+        try:
+            ids = _ler_ids(data)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        if data.get('status') not in STATUS_VALIDOS:
+            return jsonify({'erro': f'Status deve ser um dos: {", ".join(STATUS_VALIDOS)}'}), 400
+
+        return _resposta_lote(*alterar_status(ids, data['status']))
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -305,7 +645,7 @@ def verificar_disponibilidade():
             'data': data_str,
             'servico_id': servico_id,
             'motivo': 'Horário ocupado' if conflitos else (
-                'Data no passado' if data_agendamento < datetime.now() else 'Disponível')
+                'Data no passado' if data_agendamento < datetime.now(timezone.utc) else 'Disponível')
         }), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
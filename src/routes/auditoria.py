@@ -0,0 +1,97 @@
+from flask import Blueprint, request, jsonify
+from src.models.auditoria import RegistroAuditoria
+from src.services.auditoria import ENTIDADES
+from src.services.paginacao import ler_paginacao, pagina
+from datetime import datetime
+
+auditoria_bp = Blueprint('auditoria', __name__)
+
+# Página devolvida quando `limite` não é informado: o histórico só cresce
+LIMITE_PADRAO = 50
+
+ACOES = ('criacao', 'alteracao', 'remocao')
+
+
+@auditoria_bp.route('/auditoria', methods=['GET'])
+def listar_auditoria():
+    """Histórico de alterações de agendamentos, clientes e serviços, do mais recente para o mais antigo
+    ---
+    tags:
+      - Auditoria
+    parameters:
+      - name: entidade
+        in: query
+        type: string
+        required: false
+        description: agendamento, cliente ou servico
+      - name: entidade_id
+        in: query
+        type: integer
+        required: false
+      - name: acao
+        in: query
+        type: string
+        required: false
+        description: criacao, alteracao ou remocao
+      - name: autor
+        in: query
+        type: string
+        required: false
+      - name: desde
+        in: query
+        type: string
+        required: false
+        description: Data inicial (ISO 8601, UTC)
+      - name: ate
+        in: query
+        type: string
+        required: false
+        description: Data final (ISO 8601, UTC)
+      - name: limite
+        in: query
+        type: integer
+        required: false
+      - name: deslocamento
+        in: query
+        type: integer
+        required: false
+    responses:
+      200:
+        description: Página de registros (itens, total, limite, deslocamento)
+    """
+    try:
+        try:
+            limite, deslocamento = ler_paginacao() or (LIMITE_PADRAO, 0)
+            desde = request.args.get('desde')
+            ate = request.args.get('ate')
+            desde = datetime.fromisoformat(desde) if desde else None
+            ate = datetime.fromisoformat(ate) if ate else None
+            entidade_id = request.args.get('entidade_id', type=int)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        entidade = request.args.get('entidade')
+        acao = request.args.get('acao')
+        if entidade and entidade not in ENTIDADES.values():
+            return jsonify({'erro': f'Entidade deve ser uma das: {", ".join(ENTIDADES.values())}'}), 400
+        if acao and acao not in ACOES:
+            return jsonify({'erro': f'Ação deve ser uma das: {", ".join(ACOES)}'}), 400
+
+        query = RegistroAuditoria.query
+        if entidade:
+            query = query.filter(RegistroAuditoria.entidade == entidade)
+        if entidade_id is not None:
+            query = query.filter(RegistroAuditoria.entidade_id == entidade_id)
+        if acao:
+            query = query.filter(RegistroAuditoria.acao == acao)
+        if request.args.get('autor'):
+            query = query.filter(RegistroAuditoria.autor == request.args['autor'])
+        if desde:
+            query = query.filter(RegistroAuditoria.data >= desde)
+        if ate:
+            query = query.filter(RegistroAuditoria.data <= ate)
+
+        registros = query.order_by(RegistroAuditoria.id.desc()).limit(limite).offset(deslocamento).all()
+        return jsonify(pagina([registro.to_dict() for registro in registros], query.count(), limite, deslocamento)), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
@@ -0,0 +1,57 @@
+from flask import Blueprint, current_app, request, jsonify
+from src.models.user import db
+from src.services.batch import validar_requisicoes, executar_requisicoes
+
+batch_bp = Blueprint('batch', __name__)
+
+
+@batch_bp.route('/batch', methods=['POST'])
+def executar_batch():
+    """Executa várias chamadas da API em uma única requisição
+    ---
+    tags:
+      - Batch
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            requisicoes:
+              type: array
+              items:
+                properties:
+                  id:
+                    type: string
+                    example: estatisticas
+                  metodo:
+                    type: string
+                    example: GET
+                  caminho:
+                    type: string
+                    example: /api/dashboard/estatisticas
+                  corpo:
+                    type: object
+                  cabecalhos:
+                    type: object
+            paralelo:
+              type: boolean
+              example: true
+              description: Executa em paralelo quando todas as chamadas são GET
+    responses:
+      200:
+        description: Uma resposta (id, status, cabecalhos, corpo) por chamada, na ordem enviada
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        try:
+            itens = validar_requisicoes(data.get('requisicoes'), current_app.config['BATCH_MAXIMO_REQUISICOES'])
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        respostas = executar_requisicoes(itens, paralelo=bool(data.get('paralelo')))
+        return jsonify({'respostas': respostas}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
@@ -1,19 +1,38 @@
-from flask import Blueprint, request, jsonify
+import io
+from flask import Blueprint, current_app, request, jsonify
 from src.models.user import db
 from src.models.cliente import Cliente
+from src.services.idempotencia import idempotente
+from src.services.paginacao import ler_paginacao, pagina
+from src.services.sincronizacao import normalizar_email, sincronizar_clientes
+from src.services.concorrencia import (
+    com_etag, etag_cliente, etag_atual_cliente, nao_modificado, precondicao_falhou, verificar_if_match
+)
+from sqlalchemy.orm.exc import StaleDataError
 
 cliente_bp = Blueprint('cliente', __name__)
 
 @cliente_bp.route('/clientes', methods=['GET'])
 def listar_clientes():
-    """Lista todos os clientes"""
+    """Lista todos os clientes, ou uma página deles com ?limite=&deslocamento="""
     try:
-        clientes = Cliente.query.all()
-        return jsonify([cliente.to_dict() for cliente in clientes]), 200
+        try:
+            paginacao = ler_paginacao()
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        if paginacao is None:
+            clientes = Cliente.query.all()
+            return jsonify([cliente.to_dict() for cliente in clientes]), 200
+
+        limite, deslocamento = paginacao
+        clientes = Cliente.query.order_by(Cliente.id).limit(limite).offset(deslocamento).all()
+        return jsonify(pagina([cliente.to_dict() for cliente in clientes], Cliente.query.count(), limite, deslocamento)), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @cliente_bp.route('/clientes', methods=['POST'])
+@idempotente
 def criar_cliente():
     """Cria um novo cliente"""
     try:
@@ -23,16 +42,19 @@ def criar_cliente():
         if not data.get('nome') or not data.get('telefone'):
             return jsonify({'erro': 'Nome e telefone são obrigatórios'}), 400
         
+        # Mesmo formato de e-mail usado pela sincronização com o CRM
+        email = normalizar_email(data.get('email'))
+
         # Verifica se email já existe (se fornecido)
-        if data.get('email'):
-            cliente_existente = Cliente.query.filter_by(email=data['email']).first()
+        if email:
+            cliente_existente = Cliente.query.filter_by(email=email).first()
             if cliente_existente:
                 return jsonify({'erro': 'Email já cadastrado'}), 400
         
         cliente = Cliente(
             nome=data['nome'],
             telefone=data['telefone'],
-            email=data.get('email')
+            email=email
         )
         
         db.session.add(cliente)
@@ -43,51 +65,86 @@ def criar_cliente():
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
+@cliente_bp.route('/clientes/sync', methods=['POST'])
+def sincronizar():
+    """Sincroniza clientes a partir de um export do CRM (NDJSON: um objeto JSON por linha)
+
+    Cada linha traz nome, telefone e email; o e-mail (normalizado) identifica
+    o cliente. O corpo é lido em fluxo e gravado em lotes de
+    SINCRONIZACAO_TAMANHO_LOTE; a carga inteira é uma transação. Repetir o
+    envio é seguro: linhas iguais ao banco contam como inalteradas.
+    """
+    try:
+        # Sem buffer, cada linha do stream da requisição é lida em várias chamadas pequenas
+        linhas = io.BufferedReader(request.stream, 64 * 1024)
+        resultado = sincronizar_clientes(linhas, current_app.config['SINCRONIZACAO_TAMANHO_LOTE'])
+        db.session.commit()
+        return jsonify(resultado), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
 @cliente_bp.route('/clientes/<int:cliente_id>', methods=['GET'])
 def obter_cliente(cliente_id):
     """Obtém um cliente específico"""
     try:
+        # GET condicional: compara a ETag lendo só as colunas que a compõem
+        resposta = nao_modificado(lambda: etag_atual_cliente(cliente_id))
+        if resposta:
+            return resposta
+
         cliente = Cliente.query.get_or_404(cliente_id)
-        return jsonify(cliente.to_dict()), 200
+        return com_etag(jsonify(cliente.to_dict()), etag_cliente(cliente)), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @cliente_bp.route('/clientes/<int:cliente_id>', methods=['PUT'])
+@idempotente
 def atualizar_cliente(cliente_id):
     """Atualiza um cliente"""
     try:
         cliente = Cliente.query.get_or_404(cliente_id)
         data = request.get_json()
+
+        erro = verificar_if_match(cliente.versao)
+        if erro:
+            return erro
         
         # Validação básica
         if not data.get('nome') or not data.get('telefone'):
             return jsonify({'erro': 'Nome e telefone são obrigatórios'}), 400
         
+        email = normalizar_email(data.get('email'))
+
         # Verifica se email já existe em outro cliente (se fornecido)
-        if data.get('email') and data['email'] != cliente.email:
-            cliente_existente = Cliente.query.filter_by(email=data['email']).first()
+        if email and email != cliente.email:
+            cliente_existente = Cliente.query.filter_by(email=email).first()
             if cliente_existente:
                 return jsonify({'erro': 'Email já cadastrado'}), 400
         
         cliente.nome = data['nome']
         cliente.telefone = data['telefone']
-        cliente.email = data.get('email')
+        cliente.email = email
         
         db.session.commit()
         
-        return jsonify(cliente.to_dict()), 200
+        return com_etag(jsonify(cliente.to_dict()), etag_cliente(cliente)), 200
+    except StaleDataError:
+        db.session.rollback()
+        return precondicao_falhou()
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
 @cliente_bp.route('/clientes/<int:cliente_id>', methods=['DELETE'])
+@idempotente
 def deletar_cliente(cliente_id):
     """Deleta um cliente"""
     try:
         cliente = Cliente.query.get_or_404(cliente_id)
         
-        # Verifica se o cliente tem agendamentos
-        if cliente.agendamentos:
+        # Verifica se o cliente tem agendamentos (inclusive arquivados)
+        if cliente.total_agendamentos:
             return jsonify({'erro': 'Não é possível deletar cliente com agendamentos'}), 400
         
         db.session.delete(cliente)
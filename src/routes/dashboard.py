@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.models.user import db
-from src.models.agendamento import Agendamento
 from src.models.cliente import Cliente
 from src.models.servico import Servico
-from datetime import datetime, timedelta
-from sqlalchemy import func, and_
+from src.services.arquivamento import agendamentos_periodo
+from src.services.ocupacao import calcular_ocupacao
+from src.services.leitura import sessao_leitura
+from src.services.rastreamento import secao
+from src.services import consultas
+from datetime import datetime, timedelta, time
+from sqlalchemy import func
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -12,48 +16,44 @@ dashboard_bp = Blueprint('dashboard', __name__)
 def obter_estatisticas():
     """Obtém estatísticas gerais do salão"""
     try:
+        leitura = sessao_leitura()
         hoje = datetime.now().date()
         inicio_mes = hoje.replace(day=1)
         inicio_semana = hoje - timedelta(days=hoje.weekday())
         
-        # Estatísticas básicas
-        total_clientes = Cliente.query.count()
-        total_servicos = Servico.query.filter_by(ativo=True).count()
-        
-        # Agendamentos de hoje
-        agendamentos_hoje = Agendamento.query.filter(
-            func.date(Agendamento.data_agendamento) == hoje
-        ).count()
-        
-        # Agendamentos desta semana
-        agendamentos_semana = Agendamento.query.filter(
-            and_(
-                Agendamento.data_agendamento >= inicio_semana,
-                Agendamento.data_agendamento < inicio_semana + timedelta(days=7)
-            )
-        ).count()
-        
-        # Agendamentos deste mês
-        agendamentos_mes = Agendamento.query.filter(
-            Agendamento.data_agendamento >= inicio_mes
-        ).count()
-        
-        # Receita do mês (apenas agendamentos concluídos)
-        receita_mes = db.session.query(func.sum(Servico.preco)).join(
-            Agendamento, Servico.id == Agendamento.servico_id
-        ).filter(
-            and_(
-                Agendamento.data_agendamento >= inicio_mes,
-                Agendamento.status == 'concluido'
-            )
-        ).scalar() or 0
-        
-        # Agendamentos por status
-        agendamentos_por_status = db.session.query(
-            Agendamento.status,
-            func.count(Agendamento.id)
-        ).group_by(Agendamento.status).all()
+        with secao('contagens'):
+            # Estatísticas básicas
+            total_clientes = consultas.contar_clientes(leitura)
+            total_servicos = consultas.contar_servicos_ativos(leitura)
+        
+            # Agendamentos de hoje
+            agendamentos_hoje = consultas.contar_agendamentos_do_dia(leitura, hoje)
         
+            # Agendamentos desta semana
+            inicio_semana_dt = datetime.combine(inicio_semana, time.min)
+            semana = agendamentos_periodo(inicio_semana_dt, inicio_semana_dt + timedelta(days=7), leitura)
+            agendamentos_semana = leitura.query(func.count()).select_from(semana).scalar()
+        
+            # Agendamentos deste mês
+            mes = agendamentos_periodo(datetime.combine(inicio_mes, time.min), sessao=leitura)
+            agendamentos_mes = leitura.query(func.count()).select_from(mes).scalar()
+
+        with secao('receita_mes'):
+            # Receita do mês (apenas agendamentos concluídos)
+            receita_mes = leitura.query(func.sum(Servico.preco)).join(
+                mes, Servico.id == mes.c.servico_id
+            ).filter(
+                mes.c.status == 'concluido'
+            ).scalar() or 0
+
+        with secao('status'):
+            # Agendamentos por status
+            todos = agendamentos_periodo(sessao=leitura)
+            agendamentos_por_status = leitura.query(
+                todos.c.status,
+                func.count(todos.c.id)
+            ).group_by(todos.c.status).all()
+
         status_dict = {status: count for status, count in agendamentos_por_status}
         
         return jsonify({
@@ -72,11 +72,10 @@ def obter_estatisticas():
 def agendamentos_hoje():
     """Obtém agendamentos de hoje"""
     try:
+        leitura = sessao_leitura()
         hoje = datetime.now().date()
         
-        agendamentos = Agendamento.query.filter(
-            func.date(Agendamento.data_agendamento) == hoje
-        ).order_by(Agendamento.data_agendamento.asc()).all()
+        agendamentos = consultas.agendamentos_do_dia(leitura, hoje)
         
         return jsonify([agendamento.to_dict() for agendamento in agendamentos]), 200
     except Exception as e:
@@ -86,16 +85,11 @@ def agendamentos_hoje():
 def proximos_agendamentos():
     """Obtém próximos agendamentos (próximos 7 dias)"""
     try:
+        leitura = sessao_leitura()
         agora = datetime.now()
         limite = agora + timedelta(days=7)
         
-        agendamentos = Agendamento.query.filter(
-            and_(
-                Agendamento.data_agendamento >= agora,
-                Agendamento.data_agendamento <= limite,
-                Agendamento.status == 'agendado'
-            )
-        ).order_by(Agendamento.data_agendamento.asc()).limit(10).all()
+        agendamentos = consultas.proximos_agendamentos(leitura, agora, limite)
         
         return jsonify([agendamento.to_dict() for agendamento in agendamentos]), 200
     except Exception as e:
@@ -105,21 +99,21 @@ def proximos_agendamentos():
 def servicos_populares():
     """Obtém serviços mais populares do mês"""
     try:
-        inicio_mes = datetime.now().replace(day=1)
+        leitura = sessao_leitura()
+        inicio_mes = datetime.combine(datetime.now().date().replace(day=1), time.min)
+        mes = agendamentos_periodo(inicio_mes, sessao=leitura)
         
-        servicos_populares = db.session.query(
+        servicos_populares = leitura.query(
             Servico.nome,
             Servico.preco,
-            func.count(Agendamento.id).label('total_agendamentos'),
+            func.count(mes.c.id).label('total_agendamentos'),
             func.sum(Servico.preco).label('receita_total')
         ).join(
-            Agendamento, Servico.id == Agendamento.servico_id
-        ).filter(
-            Agendamento.data_agendamento >= inicio_mes
+            mes, Servico.id == mes.c.servico_id
         ).group_by(
             Servico.id, Servico.nome, Servico.preco
         ).order_by(
-            func.count(Agendamento.id).desc()
+            func.count(mes.c.id).desc()
         ).limit(5).all()
         
         resultado = []
@@ -139,22 +133,22 @@ def servicos_populares():
 def receita_diaria():
     """Obtém receita diária dos últimos 30 dias"""
     try:
+        leitura = sessao_leitura()
         inicio = datetime.now() - timedelta(days=30)
+        periodo = agendamentos_periodo(inicio, sessao=leitura)
+        dia = func.date(periodo.c.data_agendamento, type_=db.Date)
         
-        receita_diaria = db.session.query(
-            func.date(Agendamento.data_agendamento).label('data'),
+        receita_diaria = leitura.query(
+            dia.label('data'),
             func.sum(Servico.preco).label('receita')
         ).join(
-            Servico, Agendamento.servico_id == Servico.id
+            Servico, periodo.c.servico_id == Servico.id
         ).filter(
-            and_(
-                Agendamento.data_agendamento >= inicio,
-                Agendamento.status == 'concluido'
-            )
+            periodo.c.status == 'concluido'
         ).group_by(
-            func.date(Agendamento.data_agendamento)
+            dia
         ).order_by(
-            func.date(Agendamento.data_agendamento).asc()
+            dia.asc()
         ).all()
         
         resultado = []
@@ -172,17 +166,17 @@ def receita_diaria():
 def clientes_frequentes():
     """Obtém clientes mais frequentes"""
     try:
-        clientes_frequentes = db.session.query(
+        leitura = sessao_leitura()
+        # Contadores mantidos a cada escrita: ORDER BY indexado em vez de GROUP BY na tabela toda
+        clientes_frequentes = leitura.query(
             Cliente.nome,
             Cliente.telefone,
-            func.count(Agendamento.id).label('total_agendamentos'),
-            func.max(Agendamento.data_agendamento).label('ultimo_agendamento')
-        ).join(
-            Agendamento, Cliente.id == Agendamento.cliente_id
-        ).group_by(
-            Cliente.id, Cliente.nome, Cliente.telefone
+            Cliente.total_agendamentos,
+            Cliente.ultimo_agendamento
+        ).filter(
+            Cliente.total_agendamentos > 0
         ).order_by(
-            func.count(Agendamento.id).desc()
+            Cliente.total_agendamentos.desc()
         ).limit(10).all()
         
         resultado = []
@@ -198,3 +192,53 @@ def clientes_frequentes():
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+@dashboard_bp.route('/dashboard/ocupacao', methods=['GET'])
+def ocupacao():
+    """Mapa de ocupação por dia da semana e horário
+    ---
+    tags:
+      - Dashboard
+    parameters:
+      - name: inicio
+        in: query
+        type: string
+        required: false
+        description: Início do período (ISO 8601). Padrão, 4 semanas antes do fim
+      - name: fim
+        in: query
+        type: string
+        required: false
+        description: Fim do período, exclusivo (ISO 8601). Padrão, amanhã
+      - name: resolucao
+        in: query
+        type: integer
+        required: false
+        description: Tamanho da faixa de horário em minutos (15, 30 ou 60)
+    responses:
+      200:
+        description: Matriz 7 × faixas com a fração ocupada de cada faixa
+    """
+    try:
+        fim_str = request.args.get('fim')
+        inicio_str = request.args.get('inicio')
+        try:
+            fim = datetime.fromisoformat(fim_str) if fim_str else datetime.combine(datetime.now().date() + timedelta(days=1), time.min)
+            inicio = datetime.fromisoformat(inicio_str) if inicio_str else fim - timedelta(weeks=4)
+            resolucao = int(request.args.get('resolucao', 60))
+        except ValueError:
+            return jsonify({'erro': 'Parâmetros inválidos. Use datas ISO e resolução em minutos'}), 400
+
+        if resolucao not in (15, 30, 60):
+            return jsonify({'erro': 'Resolução deve ser 15, 30 ou 60 minutos'}), 400
+        if fim <= inicio:
+            return jsonify({'erro': 'O fim do período deve ser posterior ao início'}), 400
+
+        resultado = calcular_ocupacao(
+            inicio, fim, resolucao,
+            current_app.config['OCUPACAO_HORA_ABERTURA'],
+            current_app.config['OCUPACAO_HORA_FECHAMENTO'],
+            sessao_leitura()
+        )
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
@@ -0,0 +1,145 @@
+from flask import Blueprint, request, jsonify
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from src.models.lista_espera import ListaEspera, STATUS_LISTA_ESPERA
+from src.services.idempotencia import idempotente
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+lista_espera_bp = Blueprint('lista_espera', __name__)
+
+
+@lista_espera_bp.route('/lista-espera', methods=['GET'])
+def listar_lista_espera():
+    """Lista os pedidos da lista de espera
+    ---
+    tags:
+      - Lista de espera
+    parameters:
+      - name: status
+        in: query
+        type: string
+        required: false
+        description: Status do pedido (aguardando, atendido)
+      - name: cliente_id
+        in: query
+        type: integer
+        required: false
+    responses:
+      200:
+        description: Pedidos em ordem de inscrição
+    """
+    try:
+        consulta = select(ListaEspera).options(
+            joinedload(ListaEspera.cliente), joinedload(ListaEspera.servico)
+        ).order_by(ListaEspera.id.asc())
+
+        status = request.args.get('status')
+        if status:
+            if status not in STATUS_LISTA_ESPERA:
+                return jsonify({'erro': f'Status deve ser um dos: {", ".join(STATUS_LISTA_ESPERA)}'}), 400
+            consulta = consulta.where(ListaEspera.status == status)
+
+        cliente_id = request.args.get('cliente_id')
+        if cliente_id:
+            consulta = consulta.where(ListaEspera.cliente_id == cliente_id)
+
+        pedidos = db.session.execute(consulta).scalars().all()
+        return jsonify([pedido.to_dict() for pedido in pedidos]), 200
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+
+@lista_espera_bp.route('/lista-espera', methods=['POST'])
+@idempotente
+def criar_pedido_lista_espera():
+    """Inscreve um cliente na lista de espera de um serviço
+    ---
+    tags:
+      - Lista de espera
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            cliente_id:
+              type: integer
+              example: 1
+            servico_id:
+              type: integer
+              example: 2
+            janela_inicio:
+              type: string
+              example: "2025-08-06T13:00:00"
+            janela_fim:
+              type: string
+              example: "2025-08-06T18:00:00"
+            observacoes:
+              type: string
+    responses:
+      201:
+        description: Pedido registrado; é agendado automaticamente quando um horário compatível for liberado
+    """
+    try:
+        data = request.get_json()
+
+        if not data.get('cliente_id') or not data.get('servico_id') or not data.get('janela_inicio') or not data.get('janela_fim'):
+            return jsonify({'erro': 'Cliente, serviço, início e fim da janela são obrigatórios'}), 400
+
+        cliente = Cliente.query.get(data['cliente_id'])
+        if not cliente:
+            return jsonify({'erro': 'Cliente não encontrado'}), 404
+
+        servico = Servico.query.get(data['servico_id'])
+        if not servico:
+            return jsonify({'erro': 'Serviço não encontrado'}), 404
+        if not servico.ativo:
+            return jsonify({'erro': 'Serviço não está ativo'}), 400
+
+        try:
+            janela_inicio = datetime.fromisoformat(data['janela_inicio']).replace(tzinfo=None)
+            janela_fim = datetime.fromisoformat(data['janela_fim']).replace(tzinfo=None)
+        except ValueError:
+            return jsonify({'erro': 'Formato de data inválido. Use ISO format'}), 400
+
+        if janela_fim - janela_inicio < timedelta(minutes=servico.duracao_minutos):
+            return jsonify({'erro': 'A janela deve comportar a duração do serviço'}), 400
+
+        if janela_fim <= datetime.now(timezone.utc).replace(tzinfo=None):
+            return jsonify({'erro': 'A janela deve terminar no futuro'}), 400
+
+        pedido = ListaEspera(
+            cliente_id=cliente.id,
+            servico_id=servico.id,
+            duracao_minutos=servico.duracao_minutos,
+            janela_inicio=janela_inicio,
+            janela_fim=janela_fim,
+            observacoes=data.get('observacoes', '')
+        )
+
+        db.session.add(pedido)
+        db.session.commit()
+
+        return jsonify(pedido.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+
+@lista_espera_bp.route('/lista-espera/<int:pedido_id>', methods=['DELETE'])
+@idempotente
+def deletar_pedido_lista_espera(pedido_id):
+    """Remove um pedido da lista de espera"""
+    try:
+        pedido = ListaEspera.query.get_or_404(pedido_id)
+
+        db.session.delete(pedido)
+        db.session.commit()
+
+        return jsonify({'mensagem': 'Pedido removido da lista de espera'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
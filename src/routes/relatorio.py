@@ -0,0 +1,95 @@
+from flask import Blueprint, request, jsonify, url_for
+from src.models.user import db
+from src.models.relatorio import STATUS_ATIVOS
+from src.services.relatorios import solicitar_relatorio, obter_relatorio
+
+relatorio_bp = Blueprint('relatorio', __name__)
+
+# Intervalo sugerido (segundos) para consultar de novo um relatório em andamento
+INTERVALO_CONSULTA = 2
+
+
+def _resposta(relatorio, status_code):
+    resposta = jsonify(relatorio.to_dict())
+    resposta.status_code = status_code
+    resposta.headers['Location'] = url_for('relatorio.obter_relatorio_por_id', relatorio_id=relatorio.id)
+    if relatorio.status in STATUS_ATIVOS:
+        resposta.headers['Retry-After'] = str(INTERVALO_CONSULTA)
+    return resposta
+
+
+@relatorio_bp.route('/relatorios', methods=['POST'])
+def solicitar():
+    """Pede um relatório pesado, calculado em segundo plano
+    ---
+    tags:
+      - Relatórios
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          properties:
+            tipo:
+              type: string
+              example: receita
+              description: receita ou retencao
+            inicio:
+              type: string
+              example: "2024-08-01"
+            fim:
+              type: string
+              example: "2025-07-31"
+            agrupamento:
+              type: string
+              example: mes
+              description: dia, semana ou mes (apenas receita)
+    responses:
+      200:
+        description: Relatório idêntico já calculado e dentro do TTL
+      202:
+        description: Relatório na fila ou em cálculo; consulte a URL do cabeçalho Location
+    """
+    try:
+        data = request.get_json() or {}
+
+        if not data.get('tipo'):
+            return jsonify({'erro': 'Tipo do relatório é obrigatório'}), 400
+
+        try:
+            relatorio, _ = solicitar_relatorio(data['tipo'], data)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+
+        return _resposta(relatorio, 200 if relatorio.status == 'concluido' else 202)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+
+@relatorio_bp.route('/relatorios/<int:relatorio_id>', methods=['GET'])
+def obter_relatorio_por_id(relatorio_id):
+    """Situação e, quando concluído, resultado de um relatório
+    ---
+    tags:
+      - Relatórios
+    parameters:
+      - name: relatorio_id
+        in: path
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Relatório concluído (ou com erro)
+      202:
+        description: Relatório ainda em cálculo
+      404:
+        description: Relatório inexistente ou expirado
+    """
+    try:
+        relatorio = obter_relatorio(relatorio_id)
+        if not relatorio:
+            return jsonify({'erro': 'Relatório não encontrado ou expirado'}), 404
+        return _resposta(relatorio, 202 if relatorio.status in STATUS_ATIVOS else 200)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.servico import Servico
+from src.services.idempotencia import idempotente
+from src.services.lista_espera import sincronizar_duracao
+from src.services.concorrencia import (
+    com_etag, etag_servico, etag_atual_servico, nao_modificado, precondicao_falhou, verificar_if_match
+)
+from sqlalchemy.orm.exc import StaleDataError
 
 servico_bp = Blueprint('servico', __name__)
 
@@ -45,6 +51,7 @@ def listar_servicos():
 
 
 @servico_bp.route('/servicos', methods=['POST'])
+@idempotente
 def criar_servico():
     """
     Cria um novo serviço
@@ -144,15 +151,23 @@ def obter_servico(servico_id):
               type: integer
             ativo:
               type: boolean
+      304:
+        description: O If-None-Match já contém a ETag atual
     """
     try:
+        # GET condicional: compara a ETag lendo só as colunas que a compõem
+        resposta = nao_modificado(lambda: etag_atual_servico(servico_id))
+        if resposta:
+            return resposta
+
         servico = Servico.query.get_or_404(servico_id)
-        return jsonify(servico.to_dict()), 200
+        return com_etag(jsonify(servico.to_dict()), etag_servico(servico)), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 
 @servico_bp.route('/servicos/<int:servico_id>', methods=['PUT'])
+@idempotente
 def atualizar_servico(servico_id):
     """
     Atualiza um serviço existente
@@ -177,14 +192,25 @@ def atualizar_servico(servico_id):
               type: integer
             ativo:
               type: boolean
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: ETag (ou versão) obtida na leitura
     responses:
       200:
         description: Serviço atualizado com sucesso
+      412:
+        description: O serviço foi alterado desde a leitura
     """
     try:
         servico = Servico.query.get_or_404(servico_id)
         data = request.get_json()
 
+        erro = verificar_if_match(servico.versao)
+        if erro:
+            return erro
+
         if not data.get('nome') or not data.get('preco') or not data.get('duracao_minutos'):
             return jsonify({'erro': 'Nome, preço e duração são obrigatórios'}), 400
 
@@ -194,21 +220,28 @@ def atualizar_servico(servico_id):
         if data['duracao_minutos'] <= 0:
             return jsonify({'erro': 'Duração deve ser maior que zero'}), 400
 
+        duracao_alterada = servico.duracao_minutos != int(data['duracao_minutos'])
         servico.nome = data['nome']
         servico.descricao = data.get('descricao', '')
         servico.preco = float(data['preco'])
         servico.duracao_minutos = int(data['duracao_minutos'])
         servico.ativo = data.get('ativo', True)
 
+        if duracao_alterada:
+            sincronizar_duracao(servico)
         db.session.commit()
 
-        return jsonify(servico.to_dict()), 200
+        return com_etag(jsonify(servico.to_dict()), etag_servico(servico)), 200
+    except StaleDataError:
+        db.session.rollback()
+        return precondicao_falhou()
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
 
 @servico_bp.route('/servicos/<int:servico_id>', methods=['DELETE'])
+@idempotente
 def deletar_servico(servico_id):
     """
     Deleta um serviço
@@ -229,7 +262,7 @@ def deletar_servico(servico_id):
     try:
         servico = Servico.query.get_or_404(servico_id)
 
-        if servico.agendamentos:
+        if servico.total_agendamentos:
             return jsonify({'erro': 'Não é possível deletar serviço com agendamentos'}), 400
 
         db.session.delete(servico)
@@ -242,6 +275,7 @@ def deletar_servico(servico_id):
 
 
 @servico_bp.route('/servicos/<int:servico_id>/toggle', methods=['PATCH'])
+@idempotente
 def toggle_servico_ativo(servico_id):
     """
     Ativa ou desativa um serviço
@@ -251,6 +285,11 @@ def toggle_servico_ativo(servico_id):
         in: path
         type: integer
         required: true
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: ETag (ou versão) obtida na leitura
     responses:
       200:
         description: Serviço atualizado (ativo alternado)
@@ -260,14 +299,24 @@ def toggle_servico_ativo(servico_id):
               type: integer
             ativo:
               type: boolean
+      412:
+        description: O serviço foi alterado desde a leitura
     """
     try:
         servico = Servico.query.get_or_404(servico_id)
+
+        erro = verificar_if_match(servico.versao)
+        if erro:
+            return erro
+
         servico.ativo = not servico.ativo
 
         db.session.commit()
 
-        return jsonify(servico.to_dict()), 200
+        return com_etag(jsonify(servico.to_dict()), etag_servico(servico)), 200
+    except StaleDataError:
+        db.session.rollback()
+        return precondicao_falhou()
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -0,0 +1,132 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.agendamento_historico import AgendamentoHistorico
+from datetime import datetime, timedelta, timezone
+from src.services.consultas import ultima_data_arquivada
+from src.services.inquilinos import nomes_inquilinos, usar_inquilino
+from sqlalchemy import select, insert, delete, literal, union_all
+
+# Apenas agendamentos encerrados podem sair da tabela principal
+STATUS_ARQUIVAVEIS = ('concluido', 'cancelado', 'nao_compareceu')
+
+COLUNAS_ARQUIVADAS = ('id', 'cliente_id', 'servico_id', 'data_agendamento', 'data_criacao', 'status', 'observacoes')
+
+
+def _agora():
+    # Mesmo referencial das datas gravadas (UTC, sem fuso no banco)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def arquivar_agendamentos(horizonte_dias=None, tamanho_lote=None):
+    """Move agendamentos encerrados mais antigos que o horizonte para o histórico.
+
+    Cada lote é copiado e removido em uma transação própria, para que a
+    tabela principal nunca fique bloqueada por muito tempo.
+    """
+    if horizonte_dias is None:
+        horizonte_dias = current_app.config['ARQUIVAMENTO_HORIZONTE_DIAS']
+    if tamanho_lote is None:
+        tamanho_lote = current_app.config['ARQUIVAMENTO_TAMANHO_LOTE']
+
+    if horizonte_dias < 1:
+        raise ValueError('O horizonte de arquivamento deve ser de pelo menos 1 dia')
+    if tamanho_lote < 1:
+        raise ValueError('O tamanho do lote deve ser maior que zero')
+
+    agora = _agora()
+    limite = agora - timedelta(days=horizonte_dias)
+    tabela = Agendamento.__table__
+    historico = AgendamentoHistorico.__table__
+
+    total = 0
+    lotes = 0
+    while True:
+        ids = db.session.execute(
+            select(tabela.c.id).where(
+                tabela.c.data_agendamento < limite,
+                tabela.c.status.in_(STATUS_ARQUIVAVEIS)
+            ).order_by(tabela.c.id).limit(tamanho_lote)
+        ).scalars().all()
+
+        if not ids:
+            break
+
+        try:
+            db.session.execute(
+                insert(historico).from_select(
+                    list(COLUNAS_ARQUIVADAS) + ['data_arquivamento'],
+                    select(*[tabela.c[nome] for nome in COLUNAS_ARQUIVADAS], literal(agora)).where(tabela.c.id.in_(ids))
+                )
+            )
+            db.session.execute(delete(tabela).where(tabela.c.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        total += len(ids)
+        lotes += 1
+
+    return {
+        'arquivados': total,
+        'lotes': lotes,
+        'limite': limite.isoformat()
+    }
+
+
+def alcanca_arquivo(inicio=None, sessao=None):
+    """Indica se um período iniciado em `inicio` inclui dados já arquivados"""
+    sessao = sessao or db.session
+    ultimo_arquivado = ultima_data_arquivada(sessao)
+    if ultimo_arquivado is None:
+        return False
+    return inicio is None or inicio <= ultimo_arquivado
+
+
+def agendamentos_periodo(inicio=None, fim=None, sessao=None):
+    """Subquery com os agendamentos do período [inicio, fim).
+
+    O histórico só entra na consulta (via UNION ALL) quando o período
+    alcança datas já arquivadas; caso contrário apenas a tabela principal
+    é consultada.
+    """
+    def _selecionar(tabela):
+        consulta = select(*[tabela.c[nome] for nome in COLUNAS_ARQUIVADAS])
+        if inicio is not None:
+            consulta = consulta.where(tabela.c.data_agendamento >= inicio)
+        if fim is not None:
+            consulta = consulta.where(tabela.c.data_agendamento < fim)
+        return consulta
+
+    consulta = _selecionar(Agendamento.__table__)
+    if alcanca_arquivo(inicio, sessao):
+        consulta = union_all(consulta, _selecionar(AgendamentoHistorico.__table__))
+
+    return consulta.subquery('agendamentos')
+
+
+@click.command('arquivar-agendamentos')
+@click.option('--horizonte-dias', type=int, default=None, help='Idade mínima (em dias) dos agendamentos arquivados')
+@click.option('--tamanho-lote', type=int, default=None, help='Quantidade de agendamentos movidos por transação')
+@with_appcontext
+def comando_arquivar(horizonte_dias, tamanho_lote):
+    """Move agendamentos antigos para a tabela de histórico"""
+    # No modo multi-inquilino, cada salão é arquivado separadamente
+    inquilinos = nomes_inquilinos()
+    if not inquilinos:
+        _arquivar(horizonte_dias, tamanho_lote)
+    for nome in inquilinos:
+        click.echo(f'[{nome}]')
+        with usar_inquilino(nome):
+            _arquivar(horizonte_dias, tamanho_lote)
+
+
+def _arquivar(horizonte_dias, tamanho_lote):
+    resultado = arquivar_agendamentos(horizonte_dias, tamanho_lote)
+    click.echo(
+        f"{resultado['arquivados']} agendamento(s) arquivado(s) em {resultado['lotes']} lote(s) "
+        f"(anteriores a {resultado['limite']})"
+    )
@@ -0,0 +1,283 @@
+import atexit
+import json
+import queue
+import threading
+import time
+import click
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask import current_app, g, has_app_context, has_request_context, request
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.auditoria import RegistroAuditoria
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from src.services.inquilinos import usar_inquilino
+from sqlalchemy import event, insert, inspect
+
+# Histórico de alterações de agendamentos, clientes e serviços.
+#
+# As diferenças (campo -> [antes, depois]) são montadas no after_flush, quando
+# o histórico de atributos do ORM ainda está disponível, e ficam na sessão
+# até o commit; um rollback as descarta. Confirmadas, vão para uma fila em
+# memória e uma thread as grava em lotes na tabela `auditoria`, fora do
+# caminho da requisição. Com a fila cheia, quem confirmou grava os próprios
+# registros: a requisição fica mais lenta, mas nada se perde.
+
+CABECALHO_AUTOR = 'X-Usuario'
+
+ENTIDADES = {Agendamento: 'agendamento', Cliente: 'cliente', Servico: 'servico'}
+
+# Mantidos por outros mecanismos e alterados a cada escrita; não interessam ao histórico
+CAMPOS_IGNORADOS = {'versao', 'total_agendamentos', 'total_concluidos', 'ultimo_agendamento'}
+
+
+def _agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _sem_fuso(data):
+    if data.tzinfo is not None:
+        return data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+
+def _valor(valor):
+    # Datas com fuso (vindas da requisição) e sem fuso (lidas do banco) no mesmo formato: UTC, sem fuso
+    if isinstance(valor, datetime):
+        return _sem_fuso(valor).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def _contexto():
+    """Quem fez a alteração: requisição, comando da CLI ou tarefa em segundo plano"""
+    if has_request_context():
+        return {
+            'autor': (request.headers.get(CABECALHO_AUTOR) or '')[:100] or None,
+            'origem': request.remote_addr,
+            'requisicao': f'{request.method} {request.path}'[:200]
+        }
+    comando = click.get_current_context(silent=True)
+    if comando is not None:
+        return {'autor': None, 'origem': None, 'requisicao': comando.command_path[:200]}
+    return {'autor': None, 'origem': None, 'requisicao': f'tarefa {threading.current_thread().name}'[:200]}
+
+
+def _registro(entidade, entidade_id, acao, alteracoes, contexto):
+    return {
+        'inquilino': g.get('inquilino') if has_app_context() else None,
+        'entidade': entidade,
+        'entidade_id': entidade_id,
+        'acao': acao,
+        'alteracoes': json.dumps(alteracoes, ensure_ascii=False, default=str),
+        **contexto
+    }
+
+
+def _colunas(obj):
+    # A chave primária já vai em entidade_id
+    return [
+        atributo.key for atributo in inspect(type(obj)).column_attrs
+        if atributo.key not in CAMPOS_IGNORADOS and not atributo.columns[0].primary_key
+    ]
+
+
+def _diferencas(obj):
+    estado = inspect(obj)
+    alteracoes = {}
+    for campo in _colunas(obj):
+        historico = estado.attrs[campo].history
+        if not historico.has_changes():
+            continue
+        antes = _valor(historico.deleted[0]) if historico.deleted else None
+        depois = _valor(historico.added[0]) if historico.added else None
+        if antes != depois:
+            alteracoes[campo] = [antes, depois]
+    return alteracoes
+
+
+def _valores(obj, posicao):
+    """Valores carregados do objeto como diferenças de criação (posicao 1) ou remoção (posicao 0)"""
+    dados = inspect(obj).dict
+    alteracoes = {}
+    for campo in _colunas(obj):
+        par = [None, None]
+        par[posicao] = _valor(dados.get(campo))
+        alteracoes[campo] = par
+    return alteracoes
+
+
+def _coletar(session, flush_context):
+    contexto = None
+    registros = []
+    for colecao, acao in ((session.new, 'criacao'), (session.dirty, 'alteracao'), (session.deleted, 'remocao')):
+        for obj in colecao:
+            entidade = ENTIDADES.get(type(obj))
+            if entidade is None:
+                continue
+            if acao == 'criacao':
+                alteracoes = _valores(obj, 1)
+            elif acao == 'remocao':
+                alteracoes = _valores(obj, 0)
+            else:
+                alteracoes = _diferencas(obj)
+                if not alteracoes:
+                    continue
+            # Objetos novos só ganham a identidade depois do after_flush; o id já está no estado
+            estado = inspect(obj)
+            entidade_id = estado.identity[0] if estado.identity else estado.dict.get('id')
+            contexto = contexto or _contexto()
+            registros.append(_registro(entidade, entidade_id, acao, alteracoes, contexto))
+    if registros:
+        session.info.setdefault('auditoria', []).extend(registros)
+
+
+def registrar_auditoria(sessao, entidade, alteracoes, acao='alteracao'):
+    """Informa alterações feitas fora do ORM (UPDATEs e upserts em lote); gravadas no commit da sessão.
+
+    `alteracoes` mapeia o id de cada registro a {campo: (antes, depois)}.
+    """
+    contexto = _contexto()
+    sessao.info.setdefault('auditoria', []).extend(
+        _registro(entidade, entidade_id, acao, {campo: [_valor(a), _valor(d)] for campo, (a, d) in campos.items()}, contexto)
+        for entidade_id, campos in alteracoes.items()
+    )
+
+
+def _enviar_no_commit(session):
+    registros = session.info.pop('auditoria', None)
+    if not registros or not has_app_context():
+        return
+    escritor = current_app.extensions.get('auditoria')
+    if escritor is not None:
+        data = _agora()
+        for registro in registros:
+            registro['data'] = data
+        escritor.enfileirar(registros)
+
+
+def _descartar_no_rollback(session):
+    session.info.pop('auditoria', None)
+
+
+def registrar_eventos():
+    """Leva à fila de auditoria as alterações de agendamentos, clientes e serviços confirmadas"""
+    if not event.contains(db.session, 'after_commit', _enviar_no_commit):
+        event.listen(db.session, 'after_flush', _coletar)
+        event.listen(db.session, 'after_commit', _enviar_no_commit)
+        event.listen(db.session, 'after_rollback', _descartar_no_rollback)
+
+
+class EscritorAuditoria:
+    """Thread que grava em lotes os registros da fila de auditoria.
+
+    Cada lote reúne até AUDITORIA_TAMANHO_LOTE registros ou o que chegar em
+    AUDITORIA_INTERVALO_MS após o primeiro, e vira um INSERT por banco (o
+    principal ou o de cada salão). A parte de um banco que falha é tentada
+    de novo algumas vezes e, por fim, vai para o log da aplicação.
+    """
+
+    TENTATIVAS = 3
+
+    def __init__(self, app):
+        self.app = app
+        self.fila = queue.Queue(maxsize=app.config['AUDITORIA_TAMANHO_FILA'])
+        self.tamanho_lote = app.config['AUDITORIA_TAMANHO_LOTE']
+        self.intervalo = app.config['AUDITORIA_INTERVALO_MS'] / 1000
+        self._trava = threading.Lock()
+        self.iniciado = False
+
+    def iniciar(self):
+        with self._trava:
+            if self.iniciado:
+                return
+            self.iniciado = True
+        threading.Thread(target=self._executar, name='auditoria', daemon=True).start()
+        atexit.register(self.esvaziar)
+
+    def enfileirar(self, registros):
+        self.iniciar()
+        excedentes = []
+        for registro in registros:
+            try:
+                self.fila.put_nowait(registro)
+            except queue.Full:
+                excedentes.append(registro)
+        if excedentes:
+            self._gravar_com_tentativas(excedentes)
+
+    def esvaziar(self):
+        """Grava agora o que estiver na fila e espera o lote em andamento (encerramento e testes)"""
+        lote = []
+        while True:
+            try:
+                lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        if lote:
+            self._gravar_com_tentativas(lote)
+            for _ in lote:
+                self.fila.task_done()
+        if self.iniciado:
+            self.fila.join()
+
+    def _proximo_lote(self):
+        lote = [self.fila.get()]
+        prazo = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, inquilino, linhas):
+        with self.app.app_context():
+            with usar_inquilino(inquilino) if inquilino else nullcontext():
+                db.session.execute(insert(RegistroAuditoria), linhas)
+                db.session.commit()
+
+    def _gravar_com_tentativas(self, lote):
+        por_inquilino = defaultdict(list)
+        for registro in lote:
+            linha = dict(registro)
+            por_inquilino[linha.pop('inquilino')].append(linha)
+
+        for inquilino, linhas in por_inquilino.items():
+            for tentativa in range(self.TENTATIVAS):
+                try:
+                    self._gravar(inquilino, linhas)
+                    break
+                except Exception:
+                    self.app.logger.exception('Falha ao gravar %d registros de auditoria', len(linhas))
+                    if tentativa < self.TENTATIVAS - 1:
+                        time.sleep(2 ** tentativa)
+            else:
+                self.app.logger.error(
+                    'Registros de auditoria não gravados (%s): %s',
+                    inquilino or 'principal', json.dumps(linhas, default=str, ensure_ascii=False)
+                )
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            try:
+                self._gravar_com_tentativas(lote)
+            finally:
+                for _ in lote:
+                    self.fila.task_done()
+
+
+def init_app(app):
+    if app.config['AUDITORIA_ATIVO']:
+        # A thread só sobe com o primeiro registro confirmado
+        app.extensions['auditoria'] = EscritorAuditoria(app)
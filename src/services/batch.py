@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, request
+from werkzeug.test import EnvironBuilder
+from src.models.user import db
+from src.services.inquilinos import CABECALHO as CABECALHO_INQUILINO
+from src.services.rastreamento import secao
+
+# Várias requisições da API em uma só (POST /api/batch).
+#
+# Cada sub-requisição ganha o próprio contexto de requisição e passa pelo
+# despacho completo do Flask (before/after_request, autorização dos
+# blueprints, erros HTTP), mas reaproveita o contexto de aplicação da
+# requisição externa: mesmo `g`, mesma sessão do banco e mesmo salão.
+# Enquanto as sub-requisições rodam, `g.sub_requisicao` fica marcado para
+# que perfilamento e rastreamento continuem sendo os da requisição externa.
+#
+# Com `paralelo`, lotes só de GETs rodam no pool de threads; cada thread
+# tem o próprio contexto de aplicação (e, portanto, a própria sessão),
+# porque sessões do SQLAlchemy não podem ser compartilhadas entre threads.
+
+METODOS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Definidos pela requisição externa: a resposta do lote é JSON e o salão é um só
+CABECALHOS_FIXOS = {'host', 'accept', 'accept-encoding', 'content-type', 'content-length', CABECALHO_INQUILINO.lower()}
+
+# Cabeçalhos de cada sub-resposta devolvidos ao cliente (X-Dados-* vêm na resposta do lote)
+CABECALHOS_DEVOLVIDOS = ('ETag', 'Location', 'Retry-After', 'Idempotent-Replayed')
+
+
+def validar_requisicoes(itens, maximo):
+    """Normaliza a lista de sub-requisições; levanta ValueError se alguma for inválida"""
+    if not isinstance(itens, list) or not itens:
+        raise ValueError('Informe a lista "requisicoes"')
+    if len(itens) > maximo:
+        raise ValueError(f'Máximo de {maximo} requisições por lote')
+
+    normalizados = []
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict):
+            raise ValueError(f'Requisição {indice}: deve ser um objeto')
+        metodo = str(item.get('metodo', 'GET')).upper()
+        caminho = item.get('caminho')
+        cabecalhos = item.get('cabecalhos') or {}
+        if metodo not in METODOS:
+            raise ValueError(f'Requisição {indice}: método deve ser um dos: {", ".join(METODOS)}')
+        if not isinstance(caminho, str) or not caminho.startswith('/api/') or caminho.startswith('/api/batch'):
+            raise ValueError(f'Requisição {indice}: caminho deve ser uma rota da API (ex.: /api/clientes)')
+        if not isinstance(cabecalhos, dict) or not all(isinstance(valor, str) for valor in cabecalhos.values()):
+            raise ValueError(f'Requisição {indice}: cabeçalhos devem ser um objeto de textos')
+        normalizados.append({
+            'id': item.get('id', indice),
+            'metodo': metodo,
+            'caminho': caminho,
+            'corpo': item.get('corpo'),
+            'cabecalhos': cabecalhos
+        })
+    return normalizados
+
+
+def _ambiente(item):
+    """Ambiente WSGI da sub-requisição, herdando host, salão e endereço da requisição externa"""
+    cabecalhos = {
+        nome: valor for nome, valor in item['cabecalhos'].items() if nome.lower() not in CABECALHOS_FIXOS
+    }
+    cabecalhos['Accept'] = 'application/json'
+    inquilino = request.headers.get(CABECALHO_INQUILINO)
+    if inquilino:
+        cabecalhos[CABECALHO_INQUILINO] = inquilino
+
+    construtor = EnvironBuilder(
+        path=item['caminho'],
+        method=item['metodo'],
+        base_url=request.host_url,
+        headers=cabecalhos,
+        json=item['corpo'],
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        return construtor.get_environ()
+    finally:
+        construtor.close()
+
+
+def _resultado(item, resposta):
+    if resposta.direct_passthrough or resposta.is_streamed:
+        # Arquivos e respostas em partes (ex.: export.csv) teriam de ser lidos inteiros na memória
+        return _falha(item, 406, 'Rotas que respondem com arquivo ou em partes não podem ser chamadas no lote')
+    if resposta.is_json:
+        corpo = resposta.get_json(silent=True)
+    else:
+        corpo = resposta.get_data(as_text=True) or None
+    return {
+        'id': item['id'],
+        'status': resposta.status_code,
+        'cabecalhos': {nome: resposta.headers[nome] for nome in CABECALHOS_DEVOLVIDOS if nome in resposta.headers},
+        'corpo': corpo
+    }
+
+
+def _falha(item, status, mensagem):
+    return {'id': item['id'], 'status': status, 'cabecalhos': {}, 'corpo': {'erro': mensagem}}
+
+
+def _despachar(app, item, ambiente):
+    with app.request_context(ambiente):
+        with secao(f"{item['metodo']} {item['caminho']}", id=item['id']):
+            resposta = None
+            try:
+                resposta = app.full_dispatch_request()
+                # Lido ainda no contexto: respostas transmitidas em partes dependem dele
+                return _resultado(item, resposta)
+            except Exception as e:
+                # A falha fica só nesta sub-requisição; as anteriores já confirmadas seguem no resultado
+                db.session.rollback()
+                return _falha(item, 500, str(e))
+            finally:
+                if resposta is not None:
+                    resposta.close()
+
+
+def executar_requisicoes(itens, paralelo=False):
+    """Executa as sub-requisições validadas e devolve os resultados na mesma ordem"""
+    app = current_app._get_current_object()
+    ambientes = [_ambiente(item) for item in itens]
+
+    if paralelo and len(itens) > 1 and all(item['metodo'] == 'GET' for item in itens):
+        rastreio = g.get('rastreio')
+
+        def executar(par):
+            with app.app_context():
+                g.sub_requisicao = True
+                if rastreio is not None:
+                    # Os eventos das threads entram no rastro da requisição externa
+                    g.rastreio = rastreio
+                return _despachar(app, *par)
+
+        return list(app.extensions['batch'].map(executar, zip(itens, ambientes)))
+
+    g.sub_requisicao = True
+    try:
+        return [_despachar(app, item, ambiente) for item, ambiente in zip(itens, ambientes)]
+    finally:
+        g.pop('sub_requisicao', None)
+
+
+def init_app(app):
+    # As threads do pool só são criadas no primeiro lote paralelo
+    app.extensions['batch'] = ThreadPoolExecutor(
+        max_workers=app.config['BATCH_TRABALHADORES'], thread_name_prefix='batch'
+    )
@@ -0,0 +1,110 @@
+import hashlib
+from flask import current_app, request, jsonify
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from src.services.negociacao import etag_representacao
+from sqlalchemy import select
+
+# Controle de concorrência otimista para clientes, serviços e agendamentos.
+#
+# Cada linha tem uma coluna `versao` (version_id_col do mapper): o UPDATE
+# gerado pelo ORM é `... WHERE id = ? AND versao = <lida>` e incrementa a
+# versão no mesmo comando; se outra requisição gravou antes, nenhuma linha
+# é afetada e o SQLAlchemy levanta StaleDataError (respondido com 412).
+# UPDATEs em lote fora do ORM incrementam a versão explicitamente.
+#
+# A ETag é "<versao>-<resumo>": o resumo cobre o que a resposta mostra
+# além dos campos editáveis (contadores, nomes de cliente e serviço), para
+# que um GET condicional nunca devolva 304 com dados velhos. O If-Match
+# compara apenas a versão: contadores mudam a cada agendamento e não
+# devem invalidar a edição de um cadastro. Por isso o cliente também pode
+# enviar só a versão (`If-Match: "3"`), como faz a interface web.
+#
+# Na saída, src/services/negociacao.py acrescenta à ETag o formato e a
+# codificação negociados (ex.: "3-1a2b3c4d-msgpack-gzip").
+
+
+def etag(versao, *derivados):
+    resumo = hashlib.blake2s(repr(derivados).encode(), digest_size=4).hexdigest()
+    return f'{versao}-{resumo}'
+
+
+def etag_cliente(cliente):
+    return etag(cliente.versao, cliente.total_agendamentos, cliente.ultimo_agendamento)
+
+
+def etag_servico(servico):
+    return etag(servico.versao, servico.total_agendamentos)
+
+
+def etag_agendamento(agendamento):
+    return etag(agendamento.versao, agendamento.cliente.versao, agendamento.servico.versao)
+
+
+# ETag atual lida do banco com uma consulta só de colunas (sem montar o objeto)
+def etag_atual_cliente(cliente_id):
+    linha = db.session.execute(
+        select(Cliente.versao, Cliente.total_agendamentos, Cliente.ultimo_agendamento).where(Cliente.id == cliente_id)
+    ).first()
+    return etag(*linha) if linha else None
+
+
+def etag_atual_servico(servico_id):
+    linha = db.session.execute(
+        select(Servico.versao, Servico.total_agendamentos).where(Servico.id == servico_id)
+    ).first()
+    return etag(*linha) if linha else None
+
+
+def etag_atual_agendamento(agendamento_id):
+    linha = db.session.execute(
+        select(Agendamento.versao, Cliente.versao, Servico.versao).join(
+            Cliente, Cliente.id == Agendamento.cliente_id
+        ).join(
+            Servico, Servico.id == Agendamento.servico_id
+        ).where(Agendamento.id == agendamento_id)
+    ).first()
+    return etag(*linha) if linha else None
+
+
+def com_etag(resposta, tag):
+    resposta.set_etag(tag)
+    return resposta
+
+
+def nao_modificado(etag_atual):
+    """Resposta 304 quando o If-None-Match da requisição já contém `etag_atual` (consultada por id)"""
+    if not request.if_none_match:
+        return None
+    tag = etag_atual()
+    if tag is None or not request.if_none_match.contains_weak(etag_representacao(tag)):
+        return None
+    # A tag da representação é aplicada na saída, como nas respostas 200
+    return com_etag(current_app.response_class(status=304), tag)
+
+
+def _versao(tag):
+    try:
+        return int(tag.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def precondicao_falhou():
+    return jsonify({'erro': 'O registro foi alterado por outra requisição. Recarregue os dados e tente novamente'}), 412
+
+
+def verificar_if_match(versao_atual):
+    """Confere o If-Match com a versão lida; devolve a resposta de erro ou None se a escrita pode seguir"""
+    condicao = request.if_match
+    if not condicao:
+        if current_app.config['CONCORRENCIA_EXIGIR_IF_MATCH']:
+            return jsonify({'erro': 'Envie o cabeçalho If-Match com a ETag obtida na leitura'}), 428
+        return None
+    if condicao.star_tag:
+        return None
+    if versao_atual not in {_versao(tag) for tag in condicao.as_set()}:
+        return precondicao_falhou()
+    return None
@@ -0,0 +1,196 @@
+import time
+import click
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.agendamento_historico import AgendamentoHistorico
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from datetime import datetime, timedelta, time as hora
+from sqlalchemy import select, func, lambda_stmt
+from sqlalchemy.orm import joinedload
+
+# Consultas executadas a cada requisição do dashboard e dos agendamentos.
+#
+# Todas são lambda statements: o SQLAlchemy analisa cada lambda uma única
+# vez, guarda a construção e a chave de cache, e nas chamadas seguintes só
+# extrai os valores das variáveis usadas (que viram parâmetros). O SQL
+# compilado fica no cache da engine (query_cache_size em
+# SQLALCHEMY_ENGINE_OPTIONS). Filtros opcionais são acrescentados com `+=`;
+# cada combinação usada ganha sua própria entrada no cache.
+
+
+def _com_cliente_e_servico():
+    # to_dict usa cliente e serviço: vêm no mesmo SELECT
+    return select(Agendamento).options(joinedload(Agendamento.cliente), joinedload(Agendamento.servico))
+
+
+def _filtrar_listagem(consulta, data_inicio, data_fim, status, cliente_id):
+    if data_inicio:
+        consulta += lambda s: s.where(Agendamento.data_agendamento >= data_inicio)
+    if data_fim:
+        consulta += lambda s: s.where(Agendamento.data_agendamento <= data_fim)
+    if status:
+        consulta += lambda s: s.where(Agendamento.status == status)
+    if cliente_id:
+        consulta += lambda s: s.where(Agendamento.cliente_id == cliente_id)
+    return consulta
+
+
+def listar_agendamentos(sessao, data_inicio=None, data_fim=None, status=None, cliente_id=None, limite=None, deslocamento=0):
+    consulta = _filtrar_listagem(lambda_stmt(_com_cliente_e_servico), data_inicio, data_fim, status, cliente_id)
+    # O id desempata horários iguais: as páginas não repetem nem pulam linhas
+    consulta += lambda s: s.order_by(Agendamento.data_agendamento.asc(), Agendamento.id.asc())
+    if limite is not None:
+        consulta += lambda s: s.limit(limite).offset(deslocamento)
+    return sessao.execute(consulta).scalars().all()
+
+
+def contar_agendamentos(sessao, data_inicio=None, data_fim=None, status=None, cliente_id=None):
+    consulta = lambda_stmt(lambda: select(func.count(Agendamento.id)))
+    return sessao.execute(_filtrar_listagem(consulta, data_inicio, data_fim, status, cliente_id)).scalar()
+
+
+def agendamentos_do_dia(sessao, dia):
+    # Intervalo em vez de date(coluna) = dia: aproveita o índice de data_agendamento
+    inicio = datetime.combine(dia, hora.min)
+    fim = inicio + timedelta(days=1)
+    consulta = lambda_stmt(_com_cliente_e_servico)
+    consulta += lambda s: s.where(
+        Agendamento.data_agendamento >= inicio, Agendamento.data_agendamento < fim
+    ).order_by(Agendamento.data_agendamento.asc())
+    return sessao.execute(consulta).scalars().all()
+
+
+def contar_agendamentos_do_dia(sessao, dia):
+    inicio = datetime.combine(dia, hora.min)
+    fim = inicio + timedelta(days=1)
+    return sessao.execute(lambda_stmt(
+        lambda: select(func.count(Agendamento.id)).where(
+            Agendamento.data_agendamento >= inicio, Agendamento.data_agendamento < fim
+        )
+    )).scalar()
+
+
+def proximos_agendamentos(sessao, inicio, fim, limite=10):
+    consulta = lambda_stmt(_com_cliente_e_servico)
+    consulta += lambda s: s.where(
+        Agendamento.data_agendamento >= inicio,
+        Agendamento.data_agendamento <= fim,
+        Agendamento.status == 'agendado'
+    ).order_by(Agendamento.data_agendamento.asc()).limit(limite)
+    return sessao.execute(consulta).scalars().all()
+
+
+def contar_clientes(sessao):
+    return sessao.execute(lambda_stmt(lambda: select(func.count(Cliente.id)))).scalar()
+
+
+def contar_servicos_ativos(sessao):
+    return sessao.execute(lambda_stmt(
+        lambda: select(func.count(Servico.id)).where(Servico.ativo.is_(True))
+    )).scalar()
+
+
+def ultima_data_arquivada(sessao):
+    return sessao.execute(lambda_stmt(lambda: select(func.max(AgendamentoHistorico.data_agendamento)))).scalar()
+
+
+def maior_duracao_servico(sessao):
+    return sessao.execute(lambda_stmt(lambda: select(func.max(Servico.duracao_minutos)))).scalar()
+
+
+def agendamentos_ativos_entre(sessao, inicio, fim, ignorar=()):
+    """(id, data_agendamento, duracao_minutos) dos agendamentos ativos com início em [inicio, fim)
+
+    Os ids de `ignorar` são descartados em Python: a janela traz poucas
+    linhas, e uma lista de tamanho variável no NOT IN tornaria o SQL
+    diferente a cada chamada.
+    """
+    ignorar = set(ignorar)
+    linhas = sessao.execute(lambda_stmt(
+        lambda: select(Agendamento.id, Agendamento.data_agendamento, Servico.duracao_minutos).join(
+            Servico, Servico.id == Agendamento.servico_id
+        ).where(
+            Agendamento.status == 'agendado',
+            Agendamento.data_agendamento < fim,
+            Agendamento.data_agendamento >= inicio
+        )
+    )).all()
+    return [linha for linha in linhas if linha.id not in ignorar]
+
+
+# Mesmas consultas montadas a cada chamada, como eram antes; usadas só pelo benchmark
+def _referencias(sessao, hoje, agora):
+    return {
+        'listar_agendamentos': (
+            lambda: sessao.execute(_com_cliente_e_servico().where(
+                Agendamento.status == 'agendado', Agendamento.data_agendamento >= agora
+            ).order_by(Agendamento.data_agendamento.asc(), Agendamento.id.asc())).scalars().all(),
+            lambda: listar_agendamentos(sessao, data_inicio=agora, status='agendado')
+        ),
+        'agendamentos_do_dia': (
+            lambda: sessao.execute(_com_cliente_e_servico().where(
+                func.date(Agendamento.data_agendamento) == hoje
+            ).order_by(Agendamento.data_agendamento.asc())).scalars().all(),
+            lambda: agendamentos_do_dia(sessao, hoje)
+        ),
+        'proximos_agendamentos': (
+            lambda: sessao.execute(_com_cliente_e_servico().where(
+                Agendamento.data_agendamento >= agora,
+                Agendamento.data_agendamento <= agora + timedelta(days=7),
+                Agendamento.status == 'agendado'
+            ).order_by(Agendamento.data_agendamento.asc()).limit(10)).scalars().all(),
+            lambda: proximos_agendamentos(sessao, agora, agora + timedelta(days=7))
+        ),
+        'contar_clientes': (
+            lambda: sessao.query(Cliente).count(),
+            lambda: contar_clientes(sessao)
+        ),
+        'contar_servicos_ativos': (
+            lambda: sessao.query(Servico).filter_by(ativo=True).count(),
+            lambda: contar_servicos_ativos(sessao)
+        ),
+        'contar_agendamentos_do_dia': (
+            lambda: sessao.query(Agendamento).filter(func.date(Agendamento.data_agendamento) == hoje).count(),
+            lambda: contar_agendamentos_do_dia(sessao, hoje)
+        ),
+        'agendamentos_ativos_entre': (
+            lambda: sessao.execute(
+                select(Agendamento.id, Agendamento.data_agendamento, Servico.duracao_minutos).join(
+                    Servico, Servico.id == Agendamento.servico_id
+                ).where(
+                    Agendamento.status == 'agendado',
+                    Agendamento.data_agendamento < agora + timedelta(hours=2),
+                    Agendamento.data_agendamento >= agora,
+                    Agendamento.id.notin_([0])
+                )
+            ).all(),
+            lambda: agendamentos_ativos_entre(sessao, agora, agora + timedelta(hours=2), [0])
+        ),
+    }
+
+
+def _tempo_medio(funcao, repeticoes):
+    funcao()  # aquece caches
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+@click.command('benchmark-consultas')
+@click.option('--repeticoes', type=int, default=500, help='Execuções de cada consulta')
+@with_appcontext
+def comando_benchmark_consultas(repeticoes):
+    """Compara o custo por chamada das consultas cacheadas com a montagem a cada requisição"""
+    sessao = db.session
+    agora = datetime.now()
+    referencias = _referencias(sessao, agora.date(), agora)
+
+    click.echo(f"{'consulta':30} {'antes (µs)':>12} {'depois (µs)':>12} {'ganho':>7}")
+    for nome, (antes, depois) in referencias.items():
+        tempo_antes = _tempo_medio(antes, repeticoes)
+        tempo_depois = _tempo_medio(depois, repeticoes)
+        click.echo(f'{nome:30} {tempo_antes:>12.1f} {tempo_depois:>12.1f} {tempo_antes / tempo_depois:>6.2f}x')
+        sessao.expunge_all()
@@ -0,0 +1,173 @@
+import click
+from collections import defaultdict
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.agendamento_historico import AgendamentoHistorico
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from sqlalchemy import event, inspect, update, select, func, case, and_
+
+# Colunas cuja criação em um banco existente exige recalcular os contadores
+COLUNAS_CONTADORES = {
+    f'{modelo.__tablename__}.{coluna}'
+    for modelo in (Cliente, Servico)
+    for coluna in ('total_agendamentos', 'total_concluidos', 'ultimo_agendamento')
+}
+
+# Coluna de Agendamento que referencia cada modelo com contadores
+_CHAVES = {Cliente: 'cliente_id', Servico: 'servico_id'}
+
+
+def _estado_atual(agendamento):
+    return (agendamento.cliente_id, agendamento.servico_id, agendamento.status, agendamento.data_agendamento)
+
+
+def _ultimo_agendamento(modelo, chave):
+    """Expressão com a data mais recente entre agendamentos ativos e arquivados"""
+    ativo = select(func.max(Agendamento.data_agendamento)).where(
+        getattr(Agendamento, chave) == modelo.id
+    ).scalar_subquery()
+    arquivado = select(func.max(AgendamentoHistorico.data_agendamento)).where(
+        getattr(AgendamentoHistorico, chave) == modelo.id
+    ).scalar_subquery()
+    return case(
+        (ativo.is_(None), arquivado),
+        (arquivado.is_(None), ativo),
+        (ativo > arquivado, ativo),
+        else_=arquivado
+    )
+
+
+def _contagem(modelo, chave, status=None):
+    """Expressão com a quantidade de agendamentos ativos e arquivados"""
+    partes = []
+    for tabela in (Agendamento, AgendamentoHistorico):
+        condicao = getattr(tabela, chave) == modelo.id
+        if status:
+            condicao = and_(condicao, tabela.status == status)
+        partes.append(select(func.count()).select_from(tabela).where(condicao).scalar_subquery())
+    return partes[0] + partes[1]
+
+
+def _aplicar_deltas(conexao, modelo, deltas, recalcular_ultimo):
+    for entidade_id, (total, concluidos, data) in deltas.items():
+        valores = {
+            'total_agendamentos': modelo.total_agendamentos + total,
+            'total_concluidos': modelo.total_concluidos + concluidos,
+        }
+        if entidade_id in recalcular_ultimo:
+            valores['ultimo_agendamento'] = _ultimo_agendamento(modelo, _CHAVES[modelo])
+        elif data is not None:
+            valores['ultimo_agendamento'] = case(
+                (modelo.ultimo_agendamento.is_(None), data),
+                (modelo.ultimo_agendamento < data, data),
+                else_=modelo.ultimo_agendamento
+            )
+        conexao.execute(update(modelo).where(modelo.id == entidade_id).values(**valores))
+
+
+def _capturar_estado_anterior(session, flush_context, instances):
+    """Lê do banco, antes do flush, o estado dos agendamentos alterados ou removidos.
+
+    O histórico de atributos não serve aqui: após um commit os objetos estão
+    expirados e uma atribuição não carrega o valor antigo.
+    """
+    ids = {
+        inspect(obj).identity[0]
+        for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Agendamento) and inspect(obj).has_identity
+    }
+    if not ids:
+        return
+
+    linhas = session.connection().execute(
+        select(
+            Agendamento.id, Agendamento.cliente_id, Agendamento.servico_id,
+            Agendamento.status, Agendamento.data_agendamento
+        ).where(Agendamento.id.in_(ids))
+    )
+    session.info['contadores_anteriores'] = {linha[0]: tuple(linha[1:]) for linha in linhas}
+
+
+def _atualizar_contadores(session, flush_context):
+    """Converte as alterações de agendamentos do flush em UPDATEs incrementais dos contadores"""
+    anteriores = session.info.pop('contadores_anteriores', {})
+    deltas = {Cliente: defaultdict(lambda: [0, 0, None]), Servico: defaultdict(lambda: [0, 0, None])}
+    recalcular = {Cliente: set(), Servico: set()}
+
+    def somar(estado, sinal):
+        cliente_id, servico_id, status, data = estado
+        concluido = 1 if status == 'concluido' else 0
+        for modelo, entidade_id in ((Cliente, cliente_id), (Servico, servico_id)):
+            if entidade_id is None:
+                continue
+            delta = deltas[modelo][entidade_id]
+            delta[0] += sinal
+            delta[1] += sinal * concluido
+            if sinal > 0 and data is not None and (delta[2] is None or data > delta[2]):
+                delta[2] = data
+            if sinal < 0:
+                recalcular[modelo].add(entidade_id)
+
+    for obj in session.new:
+        if isinstance(obj, Agendamento):
+            somar(_estado_atual(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Agendamento):
+            anterior = anteriores.get(inspect(obj).identity[0])
+            if anterior:
+                somar(anterior, -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Agendamento):
+            anterior = anteriores.get(inspect(obj).identity[0])
+            atual = _estado_atual(obj)
+            if anterior and anterior != atual:
+                somar(anterior, -1)
+                somar(atual, 1)
+
+    if not deltas[Cliente] and not deltas[Servico]:
+        return
+
+    conexao = session.connection()
+    for modelo in (Cliente, Servico):
+        _aplicar_deltas(conexao, modelo, deltas[modelo], recalcular[modelo])
+
+
+def registrar_eventos():
+    """Mantém os contadores de Cliente e Servico na mesma transação das escritas de agendamento"""
+    if not event.contains(db.session, 'after_flush', _atualizar_contadores):
+        event.listen(db.session, 'before_flush', _capturar_estado_anterior)
+        event.listen(db.session, 'after_flush', _atualizar_contadores)
+
+
+def recalcular_contadores(cliente_ids=None, servico_ids=None):
+    """Recalcula os contadores a partir dos agendamentos (ativos e arquivados).
+
+    Sem argumentos recalcula todos; com listas de ids, apenas as entidades
+    informadas. Usado pelo comando de reparo e por escritas em lote que não
+    passam pelo flush do ORM.
+    """
+    for modelo, ids in ((Cliente, cliente_ids), (Servico, servico_ids)):
+        if ids is not None and not ids:
+            continue
+        chave = _CHAVES[modelo]
+        comando = update(modelo).values(
+            total_agendamentos=_contagem(modelo, chave),
+            total_concluidos=_contagem(modelo, chave, 'concluido'),
+            ultimo_agendamento=_ultimo_agendamento(modelo, chave)
+        )
+        if ids is not None:
+            comando = comando.where(modelo.id.in_(ids))
+        db.session.execute(comando.execution_options(synchronize_session=False))
+
+
+@click.command('recalcular-contadores')
+@with_appcontext
+def comando_recalcular():
+    """Reconstrói os contadores de agendamentos de clientes e serviços"""
+    recalcular_contadores()
+    db.session.commit()
+    click.echo('Contadores de clientes e serviços recalculados')
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from flask import current_app, g, request, jsonify
+from src.models.user import db
+from src.models.idempotencia import ChaveIdempotencia
+from src.services.negociacao import MIMETYPES_MSGPACK, msgpack
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+CABECALHO = 'Idempotency-Key'
+
+# Cabeçalhos da resposta original devolvidos na repetição
+CABECALHOS_GUARDADOS = ('ETag', 'Location', 'Content-Type', 'Vary')
+
+# Última limpeza de chaves vencidas em cada banco (None é o principal)
+_ultima_limpeza = {}
+
+
+def _agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _hash_requisicao():
+    """Impressão digital da requisição, para detectar reuso da chave com outro conteúdo"""
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(b'\0')
+    h.update(request.path.encode())
+    h.update(b'\0')
+    h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def _remover_expiradas(agora):
+    """Remove as chaves vencidas do banco atual, no máximo uma vez por intervalo configurado em cada banco"""
+    inquilino = g.get('inquilino')
+    intervalo = current_app.config['IDEMPOTENCIA_INTERVALO_LIMPEZA']
+    if time.monotonic() - _ultima_limpeza.get(inquilino, float('-inf')) < intervalo:
+        return
+    _ultima_limpeza[inquilino] = time.monotonic()
+
+    db.session.execute(delete(ChaveIdempotencia).where(ChaveIdempotencia.expira_em < agora))
+    db.session.commit()
+
+
+def _repetir(registro):
+    """Reconstrói a resposta armazenada sem executar a rota novamente"""
+    cabecalhos = json.loads(registro.cabecalhos or '{}')
+    if registro.corpo and (registro.mimetype == 'application/json' or registro.mimetype in MIMETYPES_MSGPACK):
+        # O corpo guardado está no formato negociado pela primeira requisição;
+        # a repetição recebe o formato que ela própria pede no Accept
+        if registro.mimetype in MIMETYPES_MSGPACK:
+            dados = msgpack.unpackb(registro.corpo)
+        else:
+            dados = json.loads(registro.corpo)
+        resposta = jsonify(dados)
+        resposta.status_code = registro.status_code
+        cabecalhos.pop('Content-Type', None)
+    else:
+        resposta = current_app.response_class(registro.corpo, status=registro.status_code, mimetype=registro.mimetype)
+    for nome, valor in cabecalhos.items():
+        resposta.headers[nome] = valor
+    resposta.headers['Idempotent-Replayed'] = 'true'
+    return resposta
+
+
+def _assumir(registro, agora):
+    """Assume a reserva de uma requisição que não respondeu dentro do prazo (ex.: processo encerrado no meio)"""
+    prazo = timedelta(seconds=current_app.config['IDEMPOTENCIA_PRAZO_PROCESSAMENTO'])
+    if registro.data_criacao + prazo > agora:
+        return False
+    # Entre várias repetições simultâneas, só a que renovar a reserva segue
+    assumida = db.session.execute(
+        update(ChaveIdempotencia).where(
+            ChaveIdempotencia.id == registro.id,
+            ChaveIdempotencia.status_code.is_(None),
+            ChaveIdempotencia.data_criacao == registro.data_criacao
+        ).values(data_criacao=agora)
+    ).rowcount
+    db.session.commit()
+    return bool(assumida)
+
+
+def idempotente(view):
+    """Permite repetir com segurança uma requisição de escrita enviando o cabeçalho Idempotency-Key.
+
+    A primeira requisição reserva a chave e guarda a resposta; repetições
+    dentro do TTL recebem a resposta armazenada. Apenas respostas de
+    sucesso são guardadas: após um erro o cliente pode corrigir os dados
+    e reenviar com a mesma chave. Uma reserva sem resposta após
+    IDEMPOTENCIA_PRAZO_PROCESSAMENTO segundos pode ser assumida por uma
+    repetição.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        chave = request.headers.get(CABECALHO)
+        if not chave:
+            return view(*args, **kwargs)
+
+        if len(chave) > 255:
+            return jsonify({'erro': f'{CABECALHO} deve ter no máximo 255 caracteres'}), 400
+
+        agora = _agora()
+        impressao = _hash_requisicao()
+
+        registro = ChaveIdempotencia.query.filter_by(chave=chave).first()
+        if registro and registro.expira_em <= agora:
+            db.session.delete(registro)
+            db.session.commit()
+            registro = None
+
+        if registro:
+            if registro.hash_requisicao != impressao:
+                return jsonify({'erro': f'{CABECALHO} já utilizada em outra requisição'}), 422
+            if registro.status_code is not None:
+                return _repetir(registro)
+            if not _assumir(registro, agora):
+                return jsonify({'erro': 'Requisição com esta chave ainda está em processamento'}), 409
+        else:
+            # Reserva a chave antes de executar a rota; uma repetição concorrente falha no UNIQUE
+            registro = ChaveIdempotencia(
+                chave=chave,
+                hash_requisicao=impressao,
+                data_criacao=agora,
+                expira_em=agora + timedelta(hours=current_app.config['IDEMPOTENCIA_TTL_HORAS'])
+            )
+            db.session.add(registro)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return jsonify({'erro': 'Requisição com esta chave ainda está em processamento'}), 409
+
+        _remover_expiradas(agora)
+
+        try:
+            resposta = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.delete(registro)
+            db.session.commit()
+            raise
+
+        if resposta.status_code >= 400 or resposta.is_streamed:
+            db.session.delete(registro)
+        else:
+            registro.status_code = resposta.status_code
+            registro.mimetype = resposta.mimetype
+            registro.corpo = resposta.get_data()
+            registro.cabecalhos = json.dumps(
+                {nome: resposta.headers[nome] for nome in CABECALHOS_GUARDADOS if nome in resposta.headers}
+            )
+        db.session.commit()
+
+        return resposta
+
+    return wrapper
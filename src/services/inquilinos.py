@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+import click
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import current_app, g, request, jsonify
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.esquema import atualizar_esquema
+from src.services.contadores import COLUNAS_CONTADORES, recalcular_contadores
+from sqlalchemy import create_engine
+
+CABECALHO = 'X-Inquilino'
+
+# Nomes de salões: viram nome de arquivo e subdomínio
+NOME_VALIDO = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+
+
+class PoolInquilinos:
+    """Engines dos bancos de cada salão, limitadas às INQUILINOS_MAXIMO_ENGINES usadas mais recentemente.
+
+    Cada salão tem o próprio arquivo SQLite: escritas de um salão nunca
+    esperam pelo lock de outro. Engines que saem do pool são descartadas;
+    conexões em uso continuam válidas até serem devolvidas.
+    """
+
+    def __init__(self, app):
+        self.diretorio = app.config['INQUILINOS_DIRETORIO']
+        self.maximo = app.config['INQUILINOS_MAXIMO_ENGINES']
+        self.opcoes_engine = {
+            chave: valor for chave, valor in app.config['SQLALCHEMY_ENGINE_OPTIONS'].items() if chave == 'query_cache_size'
+        }
+        self._engines = OrderedDict()
+        self._trava = threading.Lock()
+
+    def caminho(self, nome):
+        return os.path.join(self.diretorio, f'{nome}.db')
+
+    def existe(self, nome):
+        return bool(NOME_VALIDO.match(nome)) and os.path.exists(self.caminho(nome))
+
+    def listar(self):
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted(
+            arquivo[:-3] for arquivo in os.listdir(self.diretorio)
+            if arquivo.endswith('.db') and NOME_VALIDO.match(arquivo[:-3])
+        )
+
+    def engine(self, nome):
+        with self._trava:
+            engine = self._engines.get(nome)
+            if engine is not None:
+                self._engines.move_to_end(nome)
+                return engine
+
+            engine = create_engine(f'sqlite:///{self.caminho(nome)}', **self.opcoes_engine)
+            self._engines[nome] = engine
+            while len(self._engines) > self.maximo:
+                _, antiga = self._engines.popitem(last=False)
+                antiga.dispose()
+            return engine
+
+
+def _pool():
+    return current_app.extensions['inquilinos']
+
+
+@contextmanager
+def usar_inquilino(nome):
+    """Direciona `db.session` ao banco do salão `nome` dentro do bloco (comandos e threads)"""
+    anterior = g.get('inquilino'), g.get('inquilino_engine')
+    db.session.remove()
+    g.inquilino, g.inquilino_engine = nome, _pool().engine(nome)
+    try:
+        yield
+    finally:
+        db.session.remove()
+        g.inquilino, g.inquilino_engine = anterior
+
+
+def nomes_inquilinos():
+    """Salões provisionados; lista vazia fora do modo multi-inquilino"""
+    if not current_app.config['INQUILINOS_ATIVO']:
+        return []
+    return _pool().listar()
+
+
+def _resolver_nome():
+    nome = request.headers.get(CABECALHO)
+    if nome:
+        return nome.strip().lower()
+
+    dominio = current_app.config['INQUILINOS_DOMINIO']
+    host = request.host.split(':')[0].lower()
+    if dominio and host.endswith(f'.{dominio}'):
+        return host[:-len(dominio) - 1]
+    return None
+
+
+def _selecionar_inquilino():
+    """Liga a requisição ao banco do salão indicado pelo cabeçalho X-Inquilino ou pelo subdomínio"""
+    # A SPA, a documentação e a área administrativa não dependem de um salão
+    if not request.path.startswith('/api/') or request.path.startswith('/api/docs') or request.blueprint == 'admin':
+        return
+
+    nome = _resolver_nome()
+    if not nome:
+        return jsonify({'erro': f'Salão não informado (use o subdomínio ou o cabeçalho {CABECALHO})'}), 400
+
+    pool = _pool()
+    if not pool.existe(nome):
+        return jsonify({'erro': 'Salão não encontrado'}), 404
+
+    g.inquilino = nome
+    g.inquilino_engine = pool.engine(nome)
+
+
+def migrar_inquilino(nome):
+    """Cria as tabelas que faltam e completa as existentes no banco do salão; devolve as colunas adicionadas"""
+    with usar_inquilino(nome):
+        engine = g.inquilino_engine
+        db.metadata.create_all(engine)
+        adicionadas = atualizar_esquema(engine)
+        if COLUNAS_CONTADORES.intersection(adicionadas):
+            recalcular_contadores()
+            db.session.commit()
+        with engine.connect() as conexao:
+            conexao.exec_driver_sql('PRAGMA journal_mode=WAL')
+    return adicionadas
+
+
+def criar_inquilino(nome):
+    """Provisiona o banco de um novo salão"""
+    if not NOME_VALIDO.match(nome):
+        raise ValueError('Nome inválido: use letras minúsculas, números e hífens (até 63 caracteres)')
+    pool = _pool()
+    if os.path.exists(pool.caminho(nome)):
+        raise ValueError(f'O salão {nome} já existe')
+    os.makedirs(pool.diretorio, exist_ok=True)
+    migrar_inquilino(nome)
+
+
+@click.group('inquilinos')
+def comando_inquilinos():
+    """Provisionamento e migração dos bancos de cada salão"""
+
+
+@comando_inquilinos.command('criar')
+@click.argument('nome')
+@with_appcontext
+def comando_criar(nome):
+    """Cria o banco de um novo salão"""
+    try:
+        criar_inquilino(nome)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Salão {nome} criado em {_pool().caminho(nome)}')
+
+
+@comando_inquilinos.command('migrar')
+@click.argument('nomes', nargs=-1)
+@with_appcontext
+def comando_migrar(nomes):
+    """Atualiza o esquema dos salões informados (padrão: todos)"""
+    pool = _pool()
+    for nome in nomes or pool.listar():
+        if not pool.existe(nome):
+            raise click.ClickException(f'Salão {nome} não encontrado')
+        adicionadas = migrar_inquilino(nome)
+        click.echo(f"{nome}: {', '.join(adicionadas) if adicionadas else 'esquema atualizado'}")
+
+
+@comando_inquilinos.command('listar')
+@with_appcontext
+def comando_listar():
+    """Lista os salões provisionados"""
+    for nome in _pool().listar():
+        click.echo(nome)
+
+
+def init_app(app):
+    app.extensions['inquilinos'] = PoolInquilinos(app)
+    if app.config['INQUILINOS_ATIVO']:
+        app.before_request(_selecionar_inquilino)
@@ -0,0 +1,74 @@
+import hmac
+import os
+import random
+import re
+import time
+from datetime import datetime
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Peças comuns ao perfilamento (src/services/perfilamento.py) e ao
+# rastreamento (src/services/rastreamento.py): a decisão de coletar uma
+# requisição, o nome e a rotação dos arquivos gravados e a medição do SQL.
+
+# Funções (ativo, registrar) que recebem a duração dos comandos SQL
+_consumidores_sql = []
+
+
+def deve_coletar(cabecalho, segredo, taxa):
+    """Coleta se o cabeçalho trouxer o segredo ou se a requisição cair na amostragem (`taxa` entre 0 e 1).
+
+    A área administrativa e as sub-requisições de /api/batch nunca são coletadas
+    separadamente: estas entram na coleta da requisição externa.
+    """
+    if request.blueprint == 'admin' or g.get('sub_requisicao'):
+        return False
+
+    valor = request.headers.get(cabecalho)
+    if segredo and valor and hmac.compare_digest(valor, segredo):
+        return True
+    return taxa > 0 and random.random() < taxa
+
+
+def nome_arquivo():
+    """Nome, sem extensão, do arquivo da requisição atual: data, método e caminho"""
+    rota = re.sub(r'[^\w]+', '_', request.path).strip('_') or 'raiz'
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{request.method}-{rota}"[:150]
+
+
+def rotacionar(diretorio, maximo, extensoes=('.json',)):
+    """Mantém apenas as `maximo` coletas mais recentes; cada uma é um .json e os arquivos irmãos em `extensoes`"""
+    nomes = sorted(arquivo[:-5] for arquivo in os.listdir(diretorio) if arquivo.endswith('.json'))
+    for nome in nomes[:-maximo] if maximo > 0 else nomes:
+        for extensao in extensoes:
+            try:
+                os.remove(os.path.join(diretorio, nome + extensao))
+            except FileNotFoundError:
+                pass
+
+
+def ao_executar_sql(ativo, registrar):
+    """Inscreve `registrar(statement, executemany, inicio, fim)` para os comandos SQL executados enquanto `ativo()`.
+
+    Tempos em segundos de time.perf_counter.
+    """
+    _consumidores_sql.append((ativo, registrar))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if any(ativo() for ativo, _ in _consumidores_sql):
+        conn.info.setdefault('instrumentacao_inicio_sql', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    pilha = conn.info.get('instrumentacao_inicio_sql')
+    if not pilha:
+        return
+    inicio = pilha.pop()
+    fim = time.perf_counter()
+    for ativo, registrar in _consumidores_sql:
+        if ativo():
+            registrar(statement, executemany, inicio, fim)
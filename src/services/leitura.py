@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, g
+from src.models.user import db
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Modos de leitura:
+#   'wal'       - pool de conexões somente leitura no mesmo arquivo, em modo WAL
+#                 (leitores não bloqueiam escritas; sem defasagem)
+#   'replica'   - cópia local do banco renovada pela API de backup do SQLite
+#                 a cada LEITURA_DEFASAGEM_MAXIMA segundos
+#   'principal' - sem separação; leituras usam a engine principal
+MODOS = ('wal', 'replica', 'principal')
+
+
+class RoteadorLeitura:
+    """Engine separada para consultas analíticas (dashboard e relatórios)"""
+
+    def __init__(self, app):
+        self.modo = app.config['LEITURA_MODO']
+        if self.modo not in MODOS:
+            raise ValueError(f'LEITURA_MODO deve ser um dos: {", ".join(MODOS)}')
+
+        self.intervalo = app.config['LEITURA_DEFASAGEM_MAXIMA']
+        self.opcoes_engine = {
+            chave: valor for chave, valor in app.config['SQLALCHEMY_ENGINE_OPTIONS'].items() if chave == 'query_cache_size'
+        }
+        self.ultima_atualizacao = time.time()
+        self._trava = threading.Lock()
+
+        with app.app_context():
+            self.escrita = db.engine
+
+        caminho = self.escrita.url.database
+        if self.escrita.dialect.name != 'sqlite' or not caminho or caminho == ':memory:':
+            self.modo = 'principal'
+
+        if self.modo == 'principal':
+            self.engine = self.escrita
+            return
+
+        # WAL é persistente no arquivo: leitores deixam de bloquear o escritor
+        with self.escrita.connect() as conexao:
+            conexao.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+        if self.modo == 'wal':
+            self.engine = self._engine_somente_leitura(caminho)
+        else:
+            self.caminho_replica = app.config['LEITURA_REPLICA_CAMINHO'] or f'{caminho}.replica'
+            self.atualizar_replica()
+            self.engine = self._engine_somente_leitura(self.caminho_replica)
+            threading.Thread(target=self._renovar_periodicamente, name='replica-leitura', daemon=True).start()
+
+    def _engine_somente_leitura(self, caminho):
+        return create_engine(f'sqlite:///file:{caminho}?mode=ro&uri=true', **self.opcoes_engine)
+
+    def atualizar_replica(self):
+        """Copia o banco principal para um arquivo temporário e troca a réplica de uma vez.
+
+        Os leitores nunca veem uma cópia pela metade; conexões antigas
+        continuam lendo o arquivo anterior até serem devolvidas ao pool.
+        """
+        with self._trava:
+            temporario = f'{self.caminho_replica}.tmp'
+            origem = self.escrita.raw_connection()
+            try:
+                destino = sqlite3.connect(temporario)
+                try:
+                    origem.driver_connection.backup(destino, pages=256)
+                    # A cópia herda o modo WAL; somente leitura dispensa os arquivos -wal/-shm
+                    destino.execute('PRAGMA journal_mode=DELETE')
+                finally:
+                    destino.close()
+            finally:
+                origem.close()
+
+            os.replace(temporario, self.caminho_replica)
+            self.ultima_atualizacao = time.time()
+            if getattr(self, 'engine', None) is not None:
+                self.engine.dispose()
+
+    def _renovar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.atualizar_replica()
+            except Exception:
+                # Mantém a réplica anterior; a defasagem informada cresce até a próxima tentativa
+                pass
+
+    def defasagem(self):
+        """Idade, em segundos, dos dados servidos pela engine de leitura"""
+        if self.modo == 'replica':
+            return max(0.0, time.time() - self.ultima_atualizacao)
+        return 0.0
+
+
+def sessao_leitura():
+    """Sessão da requisição atual ligada à engine de leitura (ou ao banco do salão, no modo multi-inquilino)"""
+    if 'sessao_leitura' not in g:
+        engine = g.get('inquilino_engine') or current_app.extensions['leitura'].engine
+        g.sessao_leitura = Session(bind=engine)
+    return g.sessao_leitura
+
+
+def _fechar_sessao(exc):
+    sessao = g.pop('sessao_leitura', None)
+    if sessao is not None:
+        sessao.close()
+
+
+def _anotar_resposta(resposta):
+    """Informa a origem e a defasagem dos dados nas respostas que usaram a engine de leitura"""
+    if 'sessao_leitura' in g:
+        if g.get('inquilino_engine') is not None:
+            # Bancos de salão já usam WAL; não há réplica
+            resposta.headers['X-Dados-Fonte'] = 'inquilino'
+            resposta.headers['X-Dados-Defasagem'] = '0.0'
+            return resposta
+        roteador = current_app.extensions['leitura']
+        resposta.headers['X-Dados-Fonte'] = roteador.modo
+        resposta.headers['X-Dados-Defasagem'] = f'{roteador.defasagem():.1f}'
+    return resposta
+
+
+def init_app(app):
+    app.extensions['leitura'] = RoteadorLeitura(app)
+    app.after_request(_anotar_resposta)
+    app.teardown_appcontext(_fechar_sessao)
@@ -0,0 +1,285 @@
+import heapq
+import itertools
+import threading
+from contextlib import nullcontext
+from flask import current_app, g, has_app_context
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from src.models.lembrete import Lembrete
+from src.services.inquilinos import nomes_inquilinos, usar_inquilino
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+
+# Lembretes gerados para cada agendamento e com quanta antecedência
+ANTECEDENCIAS = {
+    '24h': timedelta(hours=24),
+    '2h': timedelta(hours=2)
+}
+
+_MAIOR_ANTECEDENCIA = max(ANTECEDENCIAS.values())
+
+
+def _agora():
+    # Mesmo referencial do banco (UTC, sem fuso)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _sem_fuso(data):
+    if data is not None and data.tzinfo is not None:
+        return data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+
+class AgendadorLembretes:
+    """Thread que grava lembretes na caixa de saída no momento certo.
+
+    Os lembretes pendentes ficam em um heap ordenado pelo horário de envio
+    e a thread dorme até o primeiro vencer. Alterações de agendamentos
+    chegam pelos hooks de sessão (`aplicar`) e não removem nada do heap:
+    cada item guarda a data do agendamento que o originou e é descartado
+    ao sair do heap se ela não for mais a data atual (invalidação
+    preguiçosa). Só a janela de LEMBRETES_HORIZONTE_HORAS fica em memória;
+    ela é recarregada do banco na metade desse intervalo.
+
+    No modo multi-inquilino um único heap atende todos os salões: os
+    agendamentos são identificados por (inquilino, id) e cada salão é lido
+    e gravado no próprio banco.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.horizonte = timedelta(hours=app.config['LEMBRETES_HORIZONTE_HORAS'])
+        self.tolerancia = timedelta(minutes=app.config['LEMBRETES_TOLERANCIA_MINUTOS'])
+        self.tamanho_lote = app.config['LEMBRETES_TAMANHO_LOTE']
+
+        self._condicao = threading.Condition()
+        self._heap = []
+        self._sequencia = itertools.count()
+        self._atuais = {}  # (inquilino, agendamento_id) -> data_agendamento dos agendamentos ativos na janela
+        self._fim_janela = None
+        self._proxima_recarga = None
+        self._durante_recarga = None
+        self.iniciado = False
+
+    def iniciar(self):
+        with self._condicao:
+            if self.iniciado:
+                return
+            self.iniciado = True
+        threading.Thread(target=self._executar, name='lembretes', daemon=True).start()
+
+    def aplicar(self, alteracoes, inquilino=None):
+        """Atualiza o heap com (agendamento_id, data_agendamento, status) já confirmados no banco do salão"""
+        alteracoes = [((inquilino, ag_id), data, status) for ag_id, data, status in alteracoes]
+        with self._condicao:
+            if not self.iniciado:
+                return
+            if self._durante_recarga is not None:
+                self._durante_recarga.extend(alteracoes)
+
+            primeiro = self._heap[0][0] if self._heap else None
+            for chave, data, status in alteracoes:
+                self._atualizar(chave, _sem_fuso(data), status)
+
+            if self._heap and (primeiro is None or self._heap[0][0] < primeiro):
+                self._condicao.notify()
+
+    def _atualizar(self, chave, data, status):
+        if status != 'agendado' or data is None or self._fim_janela is None or data - _MAIOR_ANTECEDENCIA > self._fim_janela:
+            # Itens antigos deste agendamento ficam no heap e são descartados ao vencer
+            self._atuais.pop(chave, None)
+            return
+        if self._atuais.get(chave) == data:
+            return
+
+        self._atuais[chave] = data
+        limite = _agora() - self.tolerancia
+        for tipo, antecedencia in ANTECEDENCIAS.items():
+            momento = data - antecedencia
+            if limite <= momento <= self._fim_janela:
+                heapq.heappush(self._heap, (momento, next(self._sequencia), chave, tipo, data))
+
+    def _valido(self, item):
+        _, _, chave, _, data = item
+        return self._atuais.get(chave) == data
+
+    def _recarregar(self):
+        """Reconstrói o heap com os agendamentos ativos cujos lembretes vencem na próxima janela"""
+        with self._condicao:
+            self._durante_recarga = []
+
+        agora = _agora()
+        fim_janela = agora + self.horizonte
+        linhas = []
+        with self.app.app_context():
+            for inquilino in nomes_inquilinos() or [None]:
+                with usar_inquilino(inquilino) if inquilino else nullcontext():
+                    linhas.extend(((inquilino, ag_id), data) for ag_id, data in db.session.execute(
+                        select(Agendamento.id, Agendamento.data_agendamento).where(
+                            Agendamento.status == 'agendado',
+                            Agendamento.data_agendamento > agora,
+                            Agendamento.data_agendamento <= fim_janela + _MAIOR_ANTECEDENCIA
+                        )
+                    ))
+
+        with self._condicao:
+            self._heap = []
+            self._atuais = {}
+            self._fim_janela = fim_janela
+            for chave, data in linhas:
+                self._atualizar(chave, data, 'agendado')
+            # Commits ocorridos durante a consulta podem não estar nas linhas lidas
+            for chave, data, status in self._durante_recarga:
+                self._atualizar(chave, _sem_fuso(data), status)
+            self._durante_recarga = None
+            self._proxima_recarga = agora + self.horizonte / 2
+
+    def _aguardar_vencidos(self):
+        """Dorme até haver lembretes vencidos (ou a hora da recarga) e devolve um lote deles"""
+        with self._condicao:
+            while True:
+                while self._heap and not self._valido(self._heap[0]):
+                    heapq.heappop(self._heap)
+
+                agora = _agora()
+                if self._heap and self._heap[0][0] <= agora:
+                    break
+                if agora >= self._proxima_recarga:
+                    return []
+
+                despertar = min(self._heap[0][0], self._proxima_recarga) if self._heap else self._proxima_recarga
+                self._condicao.wait((despertar - agora).total_seconds())
+
+            vencidos = []
+            while self._heap and self._heap[0][0] <= agora and len(vencidos) < self.tamanho_lote:
+                item = heapq.heappop(self._heap)
+                if self._valido(item):
+                    vencidos.append(item)
+            return vencidos
+
+    def _gravar(self, vencidos):
+        """Grava um lote de lembretes com um INSERT por banco, conferindo o estado atual de cada agendamento"""
+        por_inquilino = {}
+        for _, _, (inquilino, ag_id), tipo, data in vencidos:
+            por_inquilino.setdefault(inquilino, []).append((ag_id, tipo, data))
+
+        gravados = 0
+        with self.app.app_context():
+            for inquilino, itens in por_inquilino.items():
+                with usar_inquilino(inquilino) if inquilino else nullcontext():
+                    gravados += self._gravar_banco(itens)
+        return gravados
+
+    def _gravar_banco(self, itens):
+        agora = _agora()
+        atuais = {
+            linha.id: linha for linha in db.session.execute(
+                select(
+                    Agendamento.id, Agendamento.data_agendamento, Agendamento.status,
+                    Cliente.nome, Cliente.telefone, Servico.nome.label('servico_nome')
+                ).join(
+                    Cliente, Cliente.id == Agendamento.cliente_id
+                ).join(
+                    Servico, Servico.id == Agendamento.servico_id
+                ).where(Agendamento.id.in_({ag_id for ag_id, _, _ in itens}))
+            )
+        }
+
+        linhas = []
+        for ag_id, tipo, data in itens:
+            atual = atuais.get(ag_id)
+            # Alterações feitas fora dos hooks (outro processo, SQL direto) também são respeitadas
+            if atual is None or atual.status != 'agendado' or atual.data_agendamento != data:
+                continue
+            linhas.append({
+                'agendamento_id': ag_id,
+                'tipo': tipo,
+                'data_agendamento': data,
+                'cliente_nome': atual.nome,
+                'cliente_telefone': atual.telefone,
+                'mensagem': f"Olá, {atual.nome}! Lembrete: {atual.servico_nome} em {data.strftime('%d/%m/%Y às %H:%M')}.",
+                'data_criacao': agora
+            })
+
+        if linhas:
+            db.session.execute(
+                insert(Lembrete).on_conflict_do_nothing(
+                    index_elements=['agendamento_id', 'tipo', 'data_agendamento']
+                ),
+                linhas
+            )
+            db.session.commit()
+        return len(linhas)
+
+    def _executar(self):
+        while True:
+            try:
+                if self._proxima_recarga is None or _agora() >= self._proxima_recarga:
+                    self._recarregar()
+                vencidos = self._aguardar_vencidos()
+                if vencidos:
+                    try:
+                        self._gravar(vencidos)
+                    except Exception:
+                        # Devolve o lote ao heap; nova tentativa em um minuto
+                        with self._condicao:
+                            nova_tentativa = _agora() + timedelta(minutes=1)
+                            for _, _, chave, tipo, data in vencidos:
+                                heapq.heappush(self._heap, (nova_tentativa, next(self._sequencia), chave, tipo, data))
+                        raise
+            except Exception:
+                # Banco indisponível: espera um pouco antes de tentar de novo
+                with self._condicao:
+                    self._condicao.wait(60)
+
+
+def registrar_alteracoes(sessao, alteracoes):
+    """Informa alterações feitas fora do ORM (UPDATEs em lote); aplicadas no commit da sessão"""
+    sessao.info.setdefault('lembretes', []).extend(alteracoes)
+
+
+def _coletar_alteracoes(session, flush_context):
+    alteracoes = [
+        (agendamento.id, agendamento.data_agendamento, agendamento.status)
+        for agendamento in itertools.chain(session.new, session.dirty)
+        if isinstance(agendamento, Agendamento)
+    ]
+    alteracoes.extend(
+        (agendamento.id, None, None)
+        for agendamento in session.deleted
+        if isinstance(agendamento, Agendamento)
+    )
+    if alteracoes:
+        registrar_alteracoes(session, alteracoes)
+
+
+def _aplicar_no_commit(session):
+    alteracoes = session.info.pop('lembretes', None)
+    if alteracoes and has_app_context():
+        agendador = current_app.extensions.get('lembretes')
+        if agendador is not None:
+            agendador.aplicar(alteracoes, g.get('inquilino'))
+
+
+def _descartar_no_rollback(session):
+    session.info.pop('lembretes', None)
+
+
+def registrar_eventos():
+    """Leva ao agendador as alterações de agendamentos assim que são confirmadas"""
+    if not event.contains(db.session, 'after_commit', _aplicar_no_commit):
+        event.listen(db.session, 'after_flush', _coletar_alteracoes)
+        event.listen(db.session, 'after_commit', _aplicar_no_commit)
+        event.listen(db.session, 'after_rollback', _descartar_no_rollback)
+
+
+def init_app(app):
+    if not app.config['LEMBRETES_ATIVO']:
+        return
+    agendador = AgendadorLembretes(app)
+    app.extensions['lembretes'] = agendador
+    # A thread só sobe no primeiro request: comandos do Flask CLI não a iniciam
+    app.before_request(agendador.iniciar)
@@ -0,0 +1,92 @@
+from flask import current_app
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.lista_espera import ListaEspera
+from src.services.lote import verificar_conflitos
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+
+
+def _agora():
+    # Mesmo referencial usado na criação de agendamentos (UTC, sem fuso no banco)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _sem_fuso(data):
+    if data.tzinfo is not None:
+        return data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+
+def _candidatos(inicio, fim):
+    """Pedidos aguardando cujo serviço cabe na vaga e cuja janela a alcança.
+
+    Só lê colunas do índice (status, duracao_minutos, janela_inicio,
+    janela_fim): com milhares de pedidos na lista a consulta não toca a
+    tabela. Os mais longos vêm primeiro (ocupam mais da vaga) e, entre
+    durações iguais, os mais antigos.
+    """
+    minutos = int((fim - inicio).total_seconds() // 60)
+    return db.session.execute(
+        select(ListaEspera.id, ListaEspera.duracao_minutos, ListaEspera.janela_inicio, ListaEspera.janela_fim).where(
+            ListaEspera.status == 'aguardando',
+            ListaEspera.duracao_minutos <= minutos,
+            ListaEspera.janela_inicio < fim,
+            ListaEspera.janela_fim > inicio
+        ).order_by(ListaEspera.duracao_minutos.desc(), ListaEspera.id.asc())
+    ).all()
+
+
+def preencher_vaga(agendamento):
+    """Agenda no horário liberado por `agendamento` o melhor pedido da lista de espera.
+
+    Deve ser chamada depois de cancelar ou remover o agendamento e antes
+    do commit: o novo agendamento entra na mesma transação. Retorna o
+    agendamento criado ou None.
+    """
+    return preencher_horario(agendamento.data_agendamento, agendamento.servico.duracao_minutos)
+
+
+def preencher_horario(data_agendamento, duracao_minutos):
+    """Como `preencher_vaga`, para o horário [data_agendamento, + duracao_minutos) já liberado no banco"""
+    if not current_app.config['LISTA_ESPERA_PREENCHIMENTO_AUTOMATICO']:
+        return None
+
+    inicio = max(_sem_fuso(data_agendamento), _agora())
+    fim = _sem_fuso(data_agendamento) + timedelta(minutes=duracao_minutos)
+    if fim <= inicio:
+        return None
+
+    for pedido_id, duracao_minutos, janela_inicio, janela_fim in _candidatos(inicio, fim):
+        horario = max(inicio, janela_inicio)
+        termino = horario + timedelta(minutes=duracao_minutos)
+        if termino > min(fim, janela_fim):
+            continue
+
+        pedido = db.session.get(ListaEspera, pedido_id)
+        if not pedido.servico.ativo or verificar_conflitos({None: (horario, termino)}):
+            continue
+
+        novo = Agendamento(
+            cliente_id=pedido.cliente_id,
+            servico_id=pedido.servico_id,
+            data_agendamento=horario,
+            observacoes=pedido.observacoes or 'Agendado pela lista de espera'
+        )
+        db.session.add(novo)
+        db.session.flush()
+        pedido.status = 'atendido'
+        pedido.agendamento_id = novo.id
+        return novo
+
+    return None
+
+
+def sincronizar_duracao(servico):
+    """Atualiza a duração copiada nos pedidos aguardando quando o serviço muda de duração"""
+    db.session.execute(
+        update(ListaEspera).where(
+            ListaEspera.servico_id == servico.id,
+            ListaEspera.status == 'aguardando'
+        ).values(duracao_minutos=servico.duracao_minutos).execution_options(synchronize_session=False)
+    )
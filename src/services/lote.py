@@ -0,0 +1,226 @@
+import heapq
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.servico import Servico
+from src.services.contadores import recalcular_contadores
+from src.services.lembretes import registrar_alteracoes
+from src.services.auditoria import registrar_auditoria
+from src.services import consultas
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, bindparam
+
+
+def _agora():
+    # Mesmo referencial usado na criação de agendamentos (UTC, sem fuso no banco)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _carregar(condicao):
+    """Agendamentos que atendem a `condicao`, com a duração do serviço, indexados por id"""
+    linhas = db.session.execute(
+        select(
+            Agendamento.id, Agendamento.cliente_id, Agendamento.servico_id,
+            Agendamento.data_agendamento, Agendamento.status, Servico.duracao_minutos
+        ).join(
+            Servico, Servico.id == Agendamento.servico_id
+        ).where(condicao)
+    ).all()
+    return {linha.id: linha for linha in linhas}
+
+
+def verificar_conflitos(intervalos):
+    """Encontra sobreposições entre os intervalos informados e os agendamentos ativos.
+
+    `intervalos` mapeia id -> (inicio, fim) das posições pretendidas. Os
+    agendamentos fixos da janela afetada são lidos em uma única consulta e
+    todos os intervalos são percorridos em ordem de início, mantendo em um
+    heap (por fim) os que ainda estão em andamento. Conflitos pré-existentes
+    entre agendamentos fixos são ignorados. Um agendamento ainda não gravado
+    pode ser verificado com a chave `None`.
+
+    Retorna id -> id do agendamento com que conflita.
+    """
+    if not intervalos:
+        return {}
+
+    janela_inicio = min(inicio for inicio, _ in intervalos.values())
+    janela_fim = max(fim for _, fim in intervalos.values())
+    maior_duracao = consultas.maior_duracao_servico(db.session) or 0
+
+    fixos = consultas.agendamentos_ativos_entre(
+        db.session,
+        janela_inicio - timedelta(minutes=maior_duracao),
+        janela_fim,
+        [ag_id for ag_id in intervalos if ag_id is not None]
+    )
+
+    todos = [(inicio, fim, ag_id, True) for ag_id, (inicio, fim) in intervalos.items()]
+    for ag_id, data, duracao in fixos:
+        fim = data + timedelta(minutes=duracao)
+        if fim > janela_inicio:
+            todos.append((data, fim, ag_id, False))
+    todos.sort(key=lambda intervalo: (intervalo[0], intervalo[1]))
+
+    conflitos = {}
+    em_andamento = []
+    for posicao, (inicio, fim, ag_id, alterado) in enumerate(todos):
+        while em_andamento and em_andamento[0][0] <= inicio:
+            heapq.heappop(em_andamento)
+        for _, _, outro_id, outro_alterado in em_andamento:
+            if alterado:
+                conflitos.setdefault(ag_id, outro_id)
+            if outro_alterado:
+                conflitos.setdefault(outro_id, ag_id)
+        # A posição desempata fins iguais sem comparar ids (que podem ser None)
+        heapq.heappush(em_andamento, (fim, posicao, ag_id, alterado))
+
+    return conflitos
+
+
+def _resultado(ag_id, erro=None, **dados):
+    if erro:
+        return {'id': ag_id, 'sucesso': False, 'erro': erro}
+    return {'id': ag_id, 'sucesso': True, **dados}
+
+
+def _mover(agendamentos, novas_datas):
+    """Valida e aplica as novas datas; tudo ou nada.
+
+    `agendamentos` vem de `_carregar` e `novas_datas` mapeia id -> nova data
+    (ids ausentes de `agendamentos` são reportados como não encontrados).
+    """
+    agora = _agora()
+    resultados = {}
+    intervalos = {}
+
+    for ag_id, nova_data in novas_datas.items():
+        linha = agendamentos.get(ag_id)
+        if linha is None:
+            resultados[ag_id] = _resultado(ag_id, 'Agendamento não encontrado')
+        elif linha.status != 'agendado':
+            resultados[ag_id] = _resultado(ag_id, 'Apenas agendamentos com status agendado podem ser movidos')
+        elif nova_data < agora:
+            resultados[ag_id] = _resultado(ag_id, 'Não é possível agendar para datas passadas')
+        else:
+            intervalos[ag_id] = (nova_data, nova_data + timedelta(minutes=linha.duracao_minutos))
+
+    for ag_id, outro_id in verificar_conflitos(intervalos).items():
+        if ag_id in intervalos:
+            resultados[ag_id] = _resultado(ag_id, f'Conflito de horário com o agendamento {outro_id}')
+
+    for ag_id, (inicio, _) in intervalos.items():
+        resultados.setdefault(ag_id, _resultado(ag_id, data_agendamento=inicio.isoformat()))
+
+    lista = [resultados[ag_id] for ag_id in novas_datas]
+    if not all(r['sucesso'] for r in lista):
+        return False, lista
+
+    if intervalos:
+        tabela = Agendamento.__table__
+        db.session.execute(
+            update(tabela).where(tabela.c.id == bindparam('b_id')).values(
+                data_agendamento=bindparam('b_data'),
+                # UPDATE fora do ORM: a versão é incrementada aqui (ver src/services/concorrencia.py)
+                versao=tabela.c.versao + 1
+            ),
+            [{'b_id': ag_id, 'b_data': inicio} for ag_id, (inicio, _) in intervalos.items()]
+        )
+        recalcular_contadores(
+            {agendamentos[ag_id].cliente_id for ag_id in intervalos},
+            {agendamentos[ag_id].servico_id for ag_id in intervalos}
+        )
+        registrar_alteracoes(db.session, [(ag_id, inicio, 'agendado') for ag_id, (inicio, _) in intervalos.items()])
+        registrar_auditoria(db.session, 'agendamento', {
+            ag_id: {'data_agendamento': (agendamentos[ag_id].data_agendamento, inicio)}
+            for ag_id, (inicio, _) in intervalos.items()
+        })
+    db.session.commit()
+    return True, lista
+
+
+def deslocar_periodo(inicio, fim, minutos):
+    """Desloca em `minutos` todos os agendamentos ativos com início em [inicio, fim)"""
+    agendamentos = _carregar(
+        (Agendamento.status == 'agendado') &
+        (Agendamento.data_agendamento >= inicio) &
+        (Agendamento.data_agendamento < fim)
+    )
+    delta = timedelta(minutes=minutos)
+    novas_datas = {
+        ag_id: linha.data_agendamento + delta
+        for ag_id, linha in sorted(agendamentos.items(), key=lambda item: item[1].data_agendamento)
+    }
+    return _mover(agendamentos, novas_datas)
+
+
+def mover_para_dia(ids, dia):
+    """Move os agendamentos informados para `dia`, mantendo o horário de cada um"""
+    agendamentos = _carregar(Agendamento.id.in_(ids))
+    novas_datas = {}
+    for ag_id in ids:
+        linha = agendamentos.get(ag_id)
+        novas_datas[ag_id] = datetime.combine(dia, linha.data_agendamento.time()) if linha else None
+    return _mover(agendamentos, novas_datas)
+
+
+def alterar_status(ids, status):
+    """Altera o status dos agendamentos informados com um único UPDATE; tudo ou nada.
+
+    Agendamentos que voltam a `agendado` passam pela verificação de conflitos.
+    Os horários liberados por cancelamentos vão para a lista de espera na
+    mesma transação, como no cancelamento individual.
+    """
+    agendamentos = _carregar(Agendamento.id.in_(ids))
+    agora = _agora()
+    resultados = {}
+    reativados = {}
+
+    for ag_id in ids:
+        linha = agendamentos.get(ag_id)
+        if linha is None:
+            resultados[ag_id] = _resultado(ag_id, 'Agendamento não encontrado')
+        elif status == 'agendado' and linha.status != 'agendado':
+            if linha.data_agendamento < agora:
+                resultados[ag_id] = _resultado(ag_id, 'Não é possível reativar agendamentos no passado')
+            else:
+                reativados[ag_id] = (
+                    linha.data_agendamento,
+                    linha.data_agendamento + timedelta(minutes=linha.duracao_minutos)
+                )
+
+    for ag_id, outro_id in verificar_conflitos(reativados).items():
+        if ag_id in reativados:
+            resultados[ag_id] = _resultado(ag_id, f'Conflito de horário com o agendamento {outro_id}')
+
+    lista = [resultados.get(ag_id) or _resultado(ag_id, status=status) for ag_id in ids]
+    if not all(r['sucesso'] for r in lista):
+        return False, lista
+
+    alterados = [ag_id for ag_id in ids if agendamentos[ag_id].status != status]
+    if alterados:
+        tabela = Agendamento.__table__
+        db.session.execute(update(tabela).where(tabela.c.id.in_(alterados)).values(status=status, versao=tabela.c.versao + 1))
+        recalcular_contadores(
+            {agendamentos[ag_id].cliente_id for ag_id in alterados},
+            {agendamentos[ag_id].servico_id for ag_id in alterados}
+        )
+        registrar_alteracoes(db.session, [(ag_id, agendamentos[ag_id].data_agendamento, status) for ag_id in alterados])
+        registrar_auditoria(db.session, 'agendamento', {
+            ag_id: {'status': (agendamentos[ag_id].status, status)} for ag_id in alterados
+        })
+
+        if status == 'cancelado':
+            # Importado aqui: a lista de espera usa verificar_conflitos deste módulo
+            from src.services.lista_espera import preencher_horario
+            por_id = {resultado['id']: resultado for resultado in lista}
+            liberados = sorted(
+                (ag_id for ag_id in alterados if agendamentos[ag_id].status == 'agendado'),
+                key=lambda ag_id: agendamentos[ag_id].data_agendamento
+            )
+            for ag_id in liberados:
+                linha = agendamentos[ag_id]
+                novo = preencher_horario(linha.data_agendamento, linha.duracao_minutos)
+                if novo:
+                    por_id[ag_id]['vaga_preenchida'] = novo.to_dict()
+    db.session.commit()
+    return True, lista
@@ -0,0 +1,193 @@
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.agendamento import Agendamento, STATUS_VALIDOS
+from src.services.auditoria import registrar_auditoria
+from src.services.contadores import recalcular_contadores
+from src.services.inquilinos import nomes_inquilinos, usar_inquilino
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+
+
+def _agora():
+    # Mesmo referencial usado na criação de agendamentos (UTC, sem fuso no banco)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def encerrar_vencidos(status=None, tolerancia_minutos=None, tamanho_lote=None):
+    """Muda para `status` os agendamentos ainda 'agendado' cuja data já passou.
+
+    Cada lote é um UPDATE por ids, em uma transação própria, junto com o
+    recálculo dos contadores dos clientes e serviços afetados.
+    """
+    if status is None:
+        status = current_app.config['MANUTENCAO_STATUS_VENCIDO']
+    if tolerancia_minutos is None:
+        tolerancia_minutos = current_app.config['MANUTENCAO_TOLERANCIA_MINUTOS']
+    if tamanho_lote is None:
+        tamanho_lote = current_app.config['MANUTENCAO_TAMANHO_LOTE']
+
+    if status not in STATUS_VALIDOS or status == 'agendado':
+        raise ValueError(f'Status final deve ser um dos: {", ".join(s for s in STATUS_VALIDOS if s != "agendado")}')
+    if tamanho_lote < 1:
+        raise ValueError('O tamanho do lote deve ser maior que zero')
+
+    limite = _agora() - timedelta(minutes=tolerancia_minutos)
+    tabela = Agendamento.__table__
+
+    total = 0
+    lotes = 0
+    while True:
+        # Percorre o índice (status, data_agendamento)
+        linhas = db.session.execute(
+            select(tabela.c.id, tabela.c.cliente_id, tabela.c.servico_id).where(
+                tabela.c.status == 'agendado',
+                tabela.c.data_agendamento < limite
+            ).limit(tamanho_lote)
+        ).all()
+
+        if not linhas:
+            break
+
+        try:
+            db.session.execute(
+                update(tabela).where(
+                    tabela.c.id.in_([linha.id for linha in linhas]),
+                    tabela.c.status == 'agendado'
+                ).values(status=status, versao=tabela.c.versao + 1)
+            )
+            recalcular_contadores(
+                {linha.cliente_id for linha in linhas},
+                {linha.servico_id for linha in linhas}
+            )
+            registrar_auditoria(db.session, 'agendamento', {linha.id: {'status': ('agendado', status)} for linha in linhas})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        total += len(linhas)
+        lotes += 1
+
+    return {
+        'atualizados': total,
+        'lotes': lotes,
+        'status': status,
+        'limite': limite.isoformat()
+    }
+
+
+def otimizar_banco():
+    """Atualiza as estatísticas do planejador (ANALYZE) e devolve páginas livres ao sistema.
+
+    O `incremental_vacuum` só tem efeito em bancos com auto_vacuum=INCREMENTAL
+    (ver `flask manutencao-agendamentos --habilitar-vacuum-incremental`).
+    """
+    # Banco da sessão atual: o principal ou o do salão selecionado
+    with db.session.get_bind().connect() as conexao:
+        conexao.exec_driver_sql('ANALYZE')
+        modo_vacuum = conexao.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+        paginas_livres = conexao.exec_driver_sql('PRAGMA freelist_count').scalar()
+        if modo_vacuum == 2:
+            # Pelo execute() do sqlite3 o pragma libera uma página por passo; executescript vai até o fim
+            conexao.connection.driver_connection.executescript('PRAGMA incremental_vacuum')
+            paginas_liberadas = paginas_livres - conexao.exec_driver_sql('PRAGMA freelist_count').scalar()
+        else:
+            paginas_liberadas = 0
+        conexao.commit()
+
+    return {
+        'vacuum_incremental': modo_vacuum == 2,
+        'paginas_livres': paginas_livres,
+        'paginas_liberadas': paginas_liberadas
+    }
+
+
+def habilitar_vacuum_incremental():
+    """Passa o banco para auto_vacuum=INCREMENTAL (exige um VACUUM completo, uma única vez)"""
+    with db.session.get_bind().connect().execution_options(isolation_level='AUTOCOMMIT') as conexao:
+        conexao.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+        conexao.exec_driver_sql('VACUUM')
+
+
+def executar_manutencao(**opcoes):
+    """Encerra agendamentos vencidos e otimiza o banco; devolve linhas alteradas e tempos gastos"""
+    inicio = time.perf_counter()
+    resultado = encerrar_vencidos(**opcoes)
+    meio = time.perf_counter()
+    resultado.update(otimizar_banco())
+    fim = time.perf_counter()
+
+    resultado['tempo_atualizacao_ms'] = round((meio - inicio) * 1000, 1)
+    resultado['tempo_otimizacao_ms'] = round((fim - meio) * 1000, 1)
+    return resultado
+
+
+@click.command('manutencao-agendamentos')
+@click.option('--status', default=None, help='Status final dos agendamentos vencidos (padrão: MANUTENCAO_STATUS_VENCIDO)')
+@click.option('--tolerancia-minutos', type=int, default=None, help='Minutos após o horário antes de considerar o agendamento vencido')
+@click.option('--tamanho-lote', type=int, default=None, help='Quantidade de agendamentos alterados por transação')
+@click.option('--habilitar-vacuum-incremental', 'habilitar_vacuum', is_flag=True, help='Converte o banco para auto_vacuum=INCREMENTAL antes (executa VACUUM)')
+@with_appcontext
+def comando_manutencao(status, tolerancia_minutos, tamanho_lote, habilitar_vacuum):
+    """Encerra agendamentos vencidos e executa ANALYZE/vacuum incremental"""
+    # No modo multi-inquilino, cada salão é mantido separadamente
+    inquilinos = nomes_inquilinos()
+    if not inquilinos:
+        _manter(status, tolerancia_minutos, tamanho_lote, habilitar_vacuum)
+    for nome in inquilinos:
+        click.echo(f'[{nome}]')
+        with usar_inquilino(nome):
+            _manter(status, tolerancia_minutos, tamanho_lote, habilitar_vacuum)
+
+
+def _manter(status, tolerancia_minutos, tamanho_lote, habilitar_vacuum):
+    if habilitar_vacuum:
+        habilitar_vacuum_incremental()
+
+    resultado = executar_manutencao(status=status, tolerancia_minutos=tolerancia_minutos, tamanho_lote=tamanho_lote)
+    click.echo(
+        f"{resultado['atualizados']} agendamento(s) marcado(s) como {resultado['status']} em {resultado['lotes']} lote(s) "
+        f"(anteriores a {resultado['limite']}) em {resultado['tempo_atualizacao_ms']} ms"
+    )
+    if resultado['vacuum_incremental']:
+        vacuum = f"{resultado['paginas_liberadas']} página(s) liberada(s)"
+    else:
+        vacuum = f"vacuum incremental desabilitado, {resultado['paginas_livres']} página(s) livre(s)"
+    click.echo(f"ANALYZE concluído, {vacuum}, em {resultado['tempo_otimizacao_ms']} ms")
+
+
+def _executar_periodicamente(app, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            with app.app_context():
+                inquilinos = nomes_inquilinos()
+                if not inquilinos:
+                    executar_manutencao()
+                for nome in inquilinos:
+                    with usar_inquilino(nome):
+                        executar_manutencao()
+        except Exception:
+            # Tenta de novo no próximo intervalo
+            pass
+
+
+def init_app(app):
+    intervalo = app.config['MANUTENCAO_INTERVALO_MINUTOS']
+    if not intervalo:
+        return
+
+    iniciado = threading.Lock()
+
+    def iniciar():
+        # Só sobe no primeiro request: comandos do Flask CLI não iniciam a thread
+        if iniciado.acquire(blocking=False):
+            threading.Thread(
+                target=_executar_periodicamente, args=(app, intervalo * 60), name='manutencao', daemon=True
+            ).start()
+
+    app.before_request(iniciar)
@@ -0,0 +1,166 @@
+import gzip
+import time
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import with_appcontext
+from flask.json.provider import DefaultJSONProvider
+
+# Listadas em requirements.txt; se faltarem na instalação, a API responde apenas JSON e gzip
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIMETYPES_MSGPACK = ('application/msgpack', 'application/x-msgpack')
+
+# Respostas que valem a pena comprimir
+MIMETYPES_COMPRIMIVEIS = ('application/json', 'application/msgpack', 'text/csv', 'text/plain', 'text/html')
+
+
+def _adicionar_vary(resposta, cabecalho):
+    valores = [valor.strip() for valor in resposta.headers.get('Vary', '').split(',') if valor.strip()]
+    if cabecalho.lower() not in (valor.lower() for valor in valores):
+        resposta.headers['Vary'] = ', '.join(valores + [cabecalho])
+
+
+def _prefere_msgpack():
+    """Indica se o Accept da requisição prefere MessagePack a JSON (empate fica com JSON)"""
+    return request.accept_mimetypes.best_match(('application/json',) + MIMETYPES_MSGPACK) in MIMETYPES_MSGPACK
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Serializa as respostas de `jsonify` em MessagePack quando o cliente pede via Accept"""
+
+    def response(self, *args, **kwargs):
+        if msgpack is None or not has_request_context() or not request.path.startswith('/api/'):
+            return super().response(*args, **kwargs)
+
+        if _prefere_msgpack():
+            dados = self._prepare_response_obj(args, kwargs)
+            resposta = self._app.response_class(
+                msgpack.packb(dados, default=self.default), mimetype='application/msgpack'
+            )
+        else:
+            resposta = super().response(*args, **kwargs)
+        _adicionar_vary(resposta, 'Accept')
+        return resposta
+
+
+def comprimir(corpo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=current_app.config['COMPRESSAO_QUALIDADE_BROTLI'])
+    return gzip.compress(corpo, compresslevel=current_app.config['COMPRESSAO_NIVEL_GZIP'], mtime=0)
+
+
+def _escolher_codificacao():
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+
+def etag_representacao(tag):
+    """ETag forte da representação negociada para a requisição: `tag` seguida do formato e da codificação.
+
+    JSON, MessagePack e suas versões comprimidas têm bytes diferentes e não
+    podem compartilhar uma ETag forte. A codificação entra mesmo quando a
+    resposta sai sem compressão (pequena demais): depende só da requisição,
+    então o 304 de um GET condicional chega à mesma tag.
+    """
+    partes = [tag]
+    if msgpack is not None and _prefere_msgpack():
+        partes.append('msgpack')
+    codificacao = _escolher_codificacao()
+    if codificacao:
+        partes.append(codificacao)
+    return '-'.join(partes)
+
+
+def _comprimir_resposta(resposta):
+    """Comprime com brotli ou gzip as respostas da API acima de COMPRESSAO_TAMANHO_MINIMO bytes"""
+    if not request.path.startswith('/api/'):
+        return resposta
+
+    tag, fraca = resposta.get_etag()
+    if tag and not fraca:
+        resposta.set_etag(etag_representacao(tag))
+
+    if resposta.mimetype not in MIMETYPES_COMPRIMIVEIS:
+        return resposta
+
+    # A resposta depende do Accept-Encoding mesmo quando sai sem compressão (ex.: pequena demais)
+    _adicionar_vary(resposta, 'Accept-Encoding')
+
+    # Respostas transmitidas em partes (exportação CSV) seguem sem compressão
+    if (resposta.direct_passthrough or resposta.is_streamed or 'Content-Encoding' in resposta.headers
+            or resposta.status_code < 200 or resposta.status_code in (204, 304)):
+        return resposta
+
+    codificacao = _escolher_codificacao()
+    if codificacao is None:
+        return resposta
+
+    corpo = resposta.get_data()
+    if len(corpo) < current_app.config['COMPRESSAO_TAMANHO_MINIMO']:
+        return resposta
+
+    resposta.set_data(comprimir(corpo, codificacao))
+    resposta.headers['Content-Encoding'] = codificacao
+    return resposta
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, min(tempos) * 1000
+
+
+@click.command('benchmark-respostas')
+@click.option('--rota', default='/api/agendamentos', help='Rota da API cujos dados são usados no teste')
+@click.option('--repeticoes', type=int, default=20, help='Execuções de cada codificação (vale o menor tempo)')
+@click.option('--inquilino', default=None, help='Salão usado na requisição (modo multi-inquilino)')
+@with_appcontext
+def comando_benchmark(rota, repeticoes, inquilino):
+    """Compara tamanho e tempo de codificação de JSON, MessagePack, gzip e brotli"""
+    cabecalhos = {'Accept': 'application/json'}
+    if inquilino:
+        cabecalhos['X-Inquilino'] = inquilino
+    resposta = current_app.test_client().get(rota, headers=cabecalhos)
+    if resposta.status_code != 200:
+        raise click.ClickException(f'{rota} respondeu {resposta.status_code}')
+    dados = resposta.get_json()
+
+    provedor = current_app.json
+    formatos = [('json', lambda: provedor.dumps(dados, separators=(',', ':')).encode())]
+    if msgpack is not None:
+        formatos.append(('msgpack', lambda: msgpack.packb(dados, default=provedor.default)))
+
+    click.echo(f'{rota}: {len(dados) if isinstance(dados, list) else 1} item(ns), menor tempo de {repeticoes} execuções')
+    click.echo(f"{'formato':16} {'bytes':>10} {'ms':>9}")
+    for nome, codificar in formatos:
+        corpo, tempo = _medir(codificar, repeticoes)
+        click.echo(f'{nome:16} {len(corpo):>10} {tempo:>9.3f}')
+        for codificacao in ('gzip', 'br'):
+            if codificacao == 'br' and brotli is None:
+                continue
+            comprimido, tempo_compressao = _medir(lambda: comprimir(corpo, codificacao), repeticoes)
+            click.echo(f'{nome + "+" + codificacao:16} {len(comprimido):>10} {tempo + tempo_compressao:>9.3f}')
+
+    ausentes = [nome for nome, modulo in (('msgpack', msgpack), ('brotli', brotli)) if modulo is None]
+    if ausentes:
+        click.echo(f"Não instalados: {', '.join(ausentes)} (ver requirements.txt); formatos correspondentes omitidos")
+
+
+def init_app(app):
+    app.json = ProvedorJSON(app)
+    app.after_request(_comprimir_resposta)
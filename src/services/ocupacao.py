@@ -0,0 +1,105 @@
+import numpy as np
+from src.models.user import db
+from src.models.servico import Servico
+from src.services.arquivamento import agendamentos_periodo
+from datetime import timedelta
+from sqlalchemy import select, func, cast, Integer
+
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+
+# 1970-01-01 (época do datetime64) foi uma quinta-feira: desloca para a semana começar na segunda
+_DESLOCAMENTO_EPOCA = 3 * MINUTOS_DIA
+
+DIAS_SEMANA = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+
+
+def _minutos_epoca(data):
+    return int(np.datetime64(data, 'm').astype(np.int64))
+
+
+def _cobertura_semanal(inicios, fins):
+    """Quantas vezes cada minuto da semana (segunda 00:00 = 0) é coberto pelos intervalos [inicio, fim).
+
+    Os intervalos (em minutos desde a época) são acumulados num vetor de
+    diferenças com `np.bincount` e integrados com `np.cumsum`, sem laços
+    em Python. Intervalos maiores que uma semana contribuem com voltas
+    completas mais o resto.
+    """
+    duracoes = fins - inicios
+    voltas = int((duracoes // MINUTOS_SEMANA).sum())
+    restos = duracoes % MINUTOS_SEMANA
+    posicoes = (inicios + _DESLOCAMENTO_EPOCA) % MINUTOS_SEMANA
+    finais = posicoes + restos
+
+    # Intervalos que passam de domingo para segunda são divididos em dois
+    passa = finais > MINUTOS_SEMANA
+    entradas = np.concatenate([posicoes, np.zeros(passa.sum(), dtype=np.int64)])
+    saidas = np.concatenate([np.minimum(finais, MINUTOS_SEMANA), finais[passa] - MINUTOS_SEMANA])
+
+    diferencas = np.bincount(entradas, minlength=MINUTOS_SEMANA + 1) - np.bincount(saidas, minlength=MINUTOS_SEMANA + 1)
+    return np.cumsum(diferencas[:MINUTOS_SEMANA]) + voltas
+
+
+def calcular_ocupacao(inicio, fim, resolucao=60, hora_abertura=0, hora_fechamento=24, sessao=None):
+    """Matriz dia da semana × faixa de horário com a fração do tempo ocupada por agendamentos.
+
+    A capacidade considera um atendimento por vez (a mesma regra de
+    conflito usada na criação de agendamentos): cada faixa é comparada
+    com o total de minutos daquele dia/horário dentro de [inicio, fim).
+    """
+    if MINUTOS_DIA % resolucao:
+        raise ValueError('A resolução deve dividir o dia em partes iguais (ex.: 15, 30 ou 60)')
+    if fim <= inicio:
+        raise ValueError('O fim do período deve ser posterior ao início')
+
+    sessao = sessao or db.session
+
+    # Uma única consulta colunar: início em minutos desde a época e duração
+    periodo = agendamentos_periodo(inicio - timedelta(days=1), fim, sessao)
+    minuto_inicio = cast(func.round((func.julianday(periodo.c.data_agendamento) - 2440587.5) * MINUTOS_DIA), Integer)
+    linhas = sessao.execute(
+        select(minuto_inicio, Servico.duracao_minutos).join(
+            Servico, Servico.id == periodo.c.servico_id
+        ).where(
+            periodo.c.status != 'cancelado'
+        )
+    ).all()
+
+    limite_inicio = _minutos_epoca(inicio)
+    limite_fim = _minutos_epoca(fim)
+
+    if linhas:
+        colunas = np.array(linhas, dtype=np.int64)
+        inicios = np.maximum(colunas[:, 0], limite_inicio)
+        fins = np.minimum(colunas[:, 0] + colunas[:, 1], limite_fim)
+        validos = fins > inicios
+        inicios, fins = inicios[validos], fins[validos]
+    else:
+        inicios = fins = np.zeros(0, dtype=np.int64)
+
+    ocupado = _cobertura_semanal(inicios, fins)
+    capacidade = _cobertura_semanal(np.array([limite_inicio]), np.array([limite_fim]))
+
+    faixas = MINUTOS_DIA // resolucao
+    ocupado = ocupado.reshape(7, faixas, resolucao).sum(axis=2)
+    capacidade = capacidade.reshape(7, faixas, resolucao).sum(axis=2)
+
+    primeira = hora_abertura * 60 // resolucao
+    ultima = hora_fechamento * 60 // resolucao
+    ocupado = ocupado[:, primeira:ultima]
+    capacidade = capacidade[:, primeira:ultima]
+
+    taxa = np.divide(ocupado, capacidade, out=np.zeros(ocupado.shape), where=capacidade > 0)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'resolucao_minutos': resolucao,
+        'dias_semana': DIAS_SEMANA,
+        'horarios': [f'{m // 60:02d}:{m % 60:02d}' for m in range(primeira * resolucao, ultima * resolucao, resolucao)],
+        'ocupacao': np.round(taxa, 4).tolist(),
+        'minutos_ocupados': ocupado.tolist(),
+        'minutos_disponiveis': capacidade.tolist(),
+        'total_agendamentos': int(len(inicios))
+    }
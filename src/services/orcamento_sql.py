@@ -0,0 +1,296 @@
+import os
+import tempfile
+import click
+from contextlib import contextmanager
+from src.models.user import db
+from src.models.agendamento import Agendamento
+from src.models.cliente import Cliente
+from src.models.servico import Servico
+from src.models.lista_espera import ListaEspera
+from src.services.contadores import recalcular_contadores
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, insert
+
+# Blueprints cujas rotas precisam ter um orçamento declarado
+BLUEPRINTS_VERIFICADOS = ('cliente', 'servico', 'agendamento', 'dashboard', 'lista_espera', 'batch', 'auditoria')
+
+# Quantidade de clientes semeados em cada rodada (cada cliente recebe 4 agendamentos)
+ESCALAS_PADRAO = (10, 100)
+
+# Cenários executados em ordem, sobre o mesmo banco: leituras primeiro,
+# depois escritas, e remoções por último. Os campos entre chaves são ids
+# criados por `_semear`. Um endpoint pode ter mais de um cenário (ex.: a
+# listagem completa e a paginada).
+#   (endpoint, método, url, corpo json, máximo de consultas SQL)
+CENARIOS = [
+    ('cliente.listar_clientes', 'GET', '/api/clientes', None, 1),
+    ('cliente.listar_clientes', 'GET', '/api/clientes?limite=50&deslocamento=0', None, 2),
+    ('cliente.obter_cliente', 'GET', '/api/clientes/{cliente}', None, 1),
+    ('servico.listar_servicos', 'GET', '/api/servicos', None, 1),
+    ('servico.obter_servico', 'GET', '/api/servicos/{servico}', None, 1),
+    ('agendamento.listar_agendamentos', 'GET', '/api/agendamentos', None, 1),
+    ('agendamento.listar_agendamentos', 'GET', '/api/agendamentos?status=agendado&limite=50&deslocamento=0', None, 2),
+    ('agendamento.exportar_agendamentos_csv', 'GET', '/api/agendamentos/export.csv', None, 2),
+    ('agendamento.obter_agendamento', 'GET', '/api/agendamentos/{agendamento}', None, 3),
+    ('agendamento.verificar_disponibilidade', 'GET',
+     '/api/agendamentos/disponibilidade?data=2100-04-01T10:00:00&servico_id={servico}', None, 2),
+    ('dashboard.obter_estatisticas', 'GET', '/api/dashboard/estatisticas', None, 10),
+    ('dashboard.agendamentos_hoje', 'GET', '/api/dashboard/agendamentos-hoje', None, 1),
+    ('dashboard.proximos_agendamentos', 'GET', '/api/dashboard/proximos-agendamentos', None, 1),
+    ('dashboard.servicos_populares', 'GET', '/api/dashboard/servicos-populares', None, 2),
+    ('dashboard.receita_diaria', 'GET', '/api/dashboard/receita-diaria', None, 2),
+    ('dashboard.clientes_frequentes', 'GET', '/api/dashboard/clientes-frequentes', None, 1),
+    ('dashboard.ocupacao', 'GET', '/api/dashboard/ocupacao', None, 2),
+    ('lista_espera.listar_lista_espera', 'GET', '/api/lista-espera', None, 1),
+    ('auditoria.listar_auditoria', 'GET', '/api/auditoria?entidade=agendamento&entidade_id={agendamento}', None, 2),
+    # Carga do dashboard pela SPA: o lote não acrescenta consultas às das rotas chamadas
+    ('batch.executar_batch', 'POST', '/api/batch', {'requisicoes': [
+        {'caminho': '/api/dashboard/estatisticas'},
+        {'caminho': '/api/dashboard/agendamentos-hoje'},
+        {'caminho': '/api/dashboard/proximos-agendamentos'}
+    ]}, 12),
+
+    ('cliente.criar_cliente', 'POST', '/api/clientes',
+     {'nome': 'Cliente novo', 'telefone': '11900000000', 'email': 'novo@exemplo.com'}, 3),
+    ('cliente.sincronizar', 'POST', '/api/clientes/sync',
+     {'nome': 'Cliente do CRM', 'telefone': '(11) 90000-0002', 'email': 'CRM@exemplo.com'}, 1),
+    ('cliente.atualizar_cliente', 'PUT', '/api/clientes/{cliente_livre}',
+     {'nome': 'Cliente livre', 'telefone': '11900000001', 'email': 'livre@exemplo.com'}, 4),
+    ('servico.criar_servico', 'POST', '/api/servicos',
+     {'nome': 'Serviço novo', 'preco': 50.0, 'duracao_minutos': 30}, 2),
+    ('servico.atualizar_servico', 'PUT', '/api/servicos/{servico_livre}',
+     {'nome': 'Serviço livre', 'preco': 60.0, 'duracao_minutos': 45}, 3),
+    ('servico.toggle_servico_ativo', 'PATCH', '/api/servicos/{servico_livre}/toggle', None, 3),
+    ('agendamento.criar_agendamento', 'POST', '/api/agendamentos',
+     {'cliente_id': '{cliente}', 'servico_id': '{servico}', 'data_agendamento': '2100-03-01T10:00:00'}, 10),
+    ('agendamento.atualizar_agendamento', 'PUT', '/api/agendamentos/{alvo_atualizar}',
+     {'cliente_id': '{cliente}', 'servico_id': '{servico}', 'data_agendamento': '2100-02-01T10:00:00'}, 10),
+    ('agendamento.atualizar_status_agendamento', 'PATCH', '/api/agendamentos/{alvo_status}/status',
+     {'status': 'cancelado'}, 19),
+    ('agendamento.deslocar_agendamentos', 'POST', '/api/agendamentos/lote/deslocar',
+     {'inicio': '2100-01-01T00:00:00', 'fim': '2100-01-02T00:00:00', 'minutos': 30}, 6),
+    ('agendamento.mover_agendamentos', 'POST', '/api/agendamentos/lote/mover',
+     {'ids': '{alvos_lote}', 'data': '2100-01-05'}, 6),
+    ('agendamento.alterar_status_agendamentos', 'POST', '/api/agendamentos/lote/status',
+     {'ids': '{alvos_lote}', 'status': 'concluido'}, 4),
+    ('agendamento.deletar_agendamento', 'DELETE', '/api/agendamentos/{alvo_remover}', None, 17),
+    ('lista_espera.criar_pedido_lista_espera', 'POST', '/api/lista-espera',
+     {'cliente_id': '{cliente}', 'servico_id': '{servico}',
+      'janela_inicio': '2100-07-01T09:00:00', 'janela_fim': '2100-07-01T12:00:00'}, 6),
+    ('lista_espera.deletar_pedido_lista_espera', 'DELETE', '/api/lista-espera/{pedido_remover}', None, 2),
+    ('cliente.deletar_cliente', 'DELETE', '/api/clientes/{cliente_livre}', None, 4),
+    ('servico.deletar_servico', 'DELETE', '/api/servicos/{servico_livre}', None, 4),
+]
+
+
+def _semear(escala):
+    """Popula o banco com `escala` clientes e 4 agendamentos por cliente; devolve os ids usados nos cenários"""
+    servicos = [Servico(nome=f'Serviço {i}', preco=30.0 + 10 * i, duracao_minutos=30 + 15 * (i % 3)) for i in range(5)]
+    servico_livre = Servico(nome='Serviço livre', preco=60.0, duracao_minutos=45)
+    clientes = [Cliente(nome=f'Cliente {i}', telefone=f'1190000{i:04d}', email=f'cliente{i}@exemplo.com') for i in range(escala)]
+    cliente_livre = Cliente(nome='Cliente livre', telefone='11900000001')
+    db.session.add_all(servicos + [servico_livre] + clientes + [cliente_livre])
+    db.session.flush()
+
+    # Metade no passado (encerrados) e metade no futuro, um a cada 2 horas, sem sobreposição
+    agora = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    total = 4 * escala
+    linhas = []
+    for i in range(total):
+        data = agora + timedelta(hours=2 * (i - total // 2))
+        if data < agora:
+            status = ('concluido', 'concluido', 'cancelado')[i % 3]
+        else:
+            status = 'agendado'
+        linhas.append({
+            'cliente_id': clientes[i % escala].id,
+            'servico_id': servicos[i % len(servicos)].id,
+            'data_agendamento': data,
+            'data_criacao': agora,
+            'status': status
+        })
+
+    # Alvos das escritas, longe dos demais para não gerar conflitos
+    alvos = [datetime(2100, 1, 1, 9), datetime(2100, 1, 1, 11), datetime(2100, 1, 1, 13),
+             datetime(2100, 1, 10, 9), datetime(2100, 1, 10, 11), datetime(2100, 1, 10, 13)]
+    for data in alvos:
+        linhas.append({
+            'cliente_id': clientes[0].id,
+            'servico_id': servicos[0].id,
+            'data_agendamento': data,
+            'data_criacao': agora,
+            'status': 'agendado'
+        })
+
+    db.session.execute(insert(Agendamento), linhas)
+
+    # Um pedido da lista de espera por cliente, fora dos horários liberados,
+    # e um para cada vaga aberta pelos cenários de cancelamento e remoção
+    pedidos = [
+        {
+            'cliente_id': cliente.id,
+            'servico_id': servicos[0].id,
+            'duracao_minutos': servicos[0].duracao_minutos,
+            'janela_inicio': datetime(2100, 6, 1, 9) + timedelta(days=i),
+            'janela_fim': datetime(2100, 6, 1, 18) + timedelta(days=i),
+            'status': 'aguardando'
+        }
+        for i, cliente in enumerate(clientes)
+    ]
+    for inicio in (datetime(2100, 1, 10, 10), datetime(2100, 1, 10, 12)):
+        pedidos.append({
+            'cliente_id': clientes[-1].id,
+            'servico_id': servicos[0].id,
+            'duracao_minutos': servicos[0].duracao_minutos,
+            'janela_inicio': inicio,
+            'janela_fim': inicio + timedelta(hours=2),
+            'status': 'aguardando'
+        })
+    db.session.execute(insert(ListaEspera), pedidos)
+    recalcular_contadores()
+    db.session.commit()
+
+    ids_alvos = [
+        ag_id for (ag_id,) in db.session.query(Agendamento.id).filter(
+            Agendamento.data_agendamento >= datetime(2100, 1, 1)
+        ).order_by(Agendamento.data_agendamento)
+    ]
+    return {
+        'cliente': clientes[0].id,
+        'cliente_livre': cliente_livre.id,
+        'servico': servicos[0].id,
+        'servico_livre': servico_livre.id,
+        'agendamento': db.session.query(Agendamento.id).order_by(Agendamento.id).first()[0],
+        'alvos_lote': ids_alvos[:3],
+        'alvo_atualizar': ids_alvos[3],
+        'alvo_status': ids_alvos[4],
+        'alvo_remover': ids_alvos[5],
+        'pedido_remover': db.session.query(ListaEspera.id).order_by(ListaEspera.id).first()[0]
+    }
+
+
+def _preencher(valor, ids):
+    """Substitui os marcadores '{nome}' de urls e corpos pelos ids semeados"""
+    if isinstance(valor, dict):
+        return {chave: _preencher(item, ids) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_preencher(item, ids) for item in valor]
+    if isinstance(valor, str):
+        if valor.startswith('{') and valor.endswith('}') and valor[1:-1] in ids:
+            return ids[valor[1:-1]]
+        return valor.format(**ids)
+    return valor
+
+
+@contextmanager
+def _contar_sql(engines):
+    """Conta os comandos SQL enviados às engines dentro do bloco"""
+    contagem = [0]
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contagem[0] += 1
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _contar)
+    try:
+        yield contagem
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', _contar)
+
+
+def rotas_sem_orcamento(app):
+    """Rotas dos blueprints verificados que não aparecem em CENARIOS"""
+    declarados = {(endpoint, metodo) for endpoint, metodo, _, _, _ in CENARIOS}
+    faltando = []
+    for regra in app.url_map.iter_rules():
+        if regra.endpoint.split('.')[0] not in BLUEPRINTS_VERIFICADOS:
+            continue
+        for metodo in sorted(regra.methods - {'HEAD', 'OPTIONS'}):
+            if (regra.endpoint, metodo) not in declarados:
+                faltando.append(f'{metodo} {regra.rule} ({regra.endpoint})')
+    return faltando
+
+
+def _medir(escala):
+    """Executa todos os cenários em um banco novo com a escala informada; devolve (status, consultas) na ordem de CENARIOS"""
+    from src.main import criar_app
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        app = criar_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(diretorio, 'orcamento.db')}",
+            'PERFIL_SEGREDO': None,
+            'PERFIL_TAXA_AMOSTRAGEM': 0.0,
+            'LEMBRETES_ATIVO': False,
+            # A thread de auditoria gravaria no meio de outros cenários; a coleta no flush continua ativa
+            'AUDITORIA_ATIVO': False
+        })
+        with app.app_context():
+            ids = _semear(escala)
+            engines = {db.engine, app.extensions['leitura'].engine}
+        # A retomada de relatórios pendentes consultaria o banco em paralelo ao primeiro cenário
+        app.extensions['relatorios'].retomar_pendentes().result()
+
+        cliente = app.test_client()
+        medicoes = []
+        try:
+            for _, metodo, url, corpo, _ in CENARIOS:
+                with _contar_sql(engines) as contagem:
+                    resposta = cliente.open(_preencher(url, ids), method=metodo, json=_preencher(corpo, ids))
+                    # Respostas transmitidas em partes só consultam o banco ao serem lidas
+                    resposta.get_data()
+                medicoes.append((resposta.status_code, contagem[0]))
+        finally:
+            for engine in engines:
+                engine.dispose()
+        return medicoes, app
+
+
+def verificar_orcamentos(escalas=ESCALAS_PADRAO):
+    """Mede as consultas de cada cenário nas escalas informadas.
+
+    Retorna (linhas do relatório, falhas). Um cenário falha se responder
+    com erro, passar do máximo declarado ou fizer mais consultas na escala
+    maior do que na menor (sinal de N+1).
+    """
+    menor, maior = sorted(escalas)
+    medicoes_menor, app = _medir(menor)
+    medicoes_maior, _ = _medir(maior)
+
+    falhas = [f'{rota}: sem orçamento declarado' for rota in rotas_sem_orcamento(app)]
+    linhas = []
+    for (endpoint, metodo, url, _, maximo), (status_menor, consultas_menor), (status_maior, consultas_maior) in zip(
+            CENARIOS, medicoes_menor, medicoes_maior):
+        problemas = []
+        if status_menor >= 400 or status_maior >= 400:
+            problemas.append(f'status {status_menor}/{status_maior}')
+        if max(consultas_menor, consultas_maior) > maximo:
+            problemas.append(f'acima do máximo de {maximo}')
+        if consultas_maior > consultas_menor:
+            problemas.append('cresce com o volume de dados')
+
+        linhas.append(f"{metodo:6} {url:80} {consultas_menor:3} {consultas_maior:3}  (máx {maximo})"
+                      + (f"  <- {', '.join(problemas)}" if problemas else ''))
+        falhas.extend(f'{metodo} {endpoint} ({url}): {problema}' for problema in problemas)
+
+    return linhas, falhas
+
+
+@click.command('verificar-orcamento-sql')
+@click.option('--escala-menor', type=int, default=ESCALAS_PADRAO[0], help='Clientes semeados na primeira rodada')
+@click.option('--escala-maior', type=int, default=ESCALAS_PADRAO[1], help='Clientes semeados na segunda rodada')
+def comando_orcamento_sql(escala_menor, escala_maior):
+    """Confere o número de consultas SQL de cada endpoint em duas escalas de dados"""
+    if not 0 < escala_menor < escala_maior:
+        raise click.BadParameter('A escala maior deve ser maior que a menor (e ambas positivas)')
+
+    linhas, falhas = verificar_orcamentos((escala_menor, escala_maior))
+    click.echo(f"{'':6} {'rota':80} {escala_menor:>3} {escala_maior:>3}")
+    for linha in linhas:
+        click.echo(linha)
+
+    if falhas:
+        for falha in falhas:
+            click.echo(f'FALHA {falha}', err=True)
+        raise click.ClickException(f'{len(falhas)} problema(s) de orçamento de consultas')
+    click.echo('Todos os endpoints dentro do orçamento')
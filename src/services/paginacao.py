@@ -0,0 +1,31 @@
+from flask import current_app, request
+
+# Listagens paginadas por deslocamento (?limite=&deslocamento=), usadas pela
+# tabela virtual do frontend: ela pede só a faixa de linhas visível e, como a
+# barra de rolagem pode saltar para qualquer ponto, precisa de acesso direto
+# a uma posição, não só à próxima página. Sem `limite` as rotas mantêm a
+# resposta antiga, com a lista completa.
+
+
+def ler_paginacao():
+    """(limite, deslocamento) da query string, ou None sem `limite`; levanta ValueError se inválidos"""
+    limite = request.args.get('limite')
+    if limite is None:
+        return None
+
+    maximo = current_app.config['LISTAGEM_LIMITE_MAXIMO']
+    try:
+        limite = int(limite)
+        deslocamento = int(request.args.get('deslocamento', 0))
+    except ValueError:
+        raise ValueError('limite e deslocamento devem ser números inteiros')
+    if not 1 <= limite <= maximo:
+        raise ValueError(f'limite deve estar entre 1 e {maximo}')
+    if deslocamento < 0:
+        raise ValueError('deslocamento não pode ser negativo')
+    return limite, deslocamento
+
+
+def pagina(itens, total, limite, deslocamento):
+    """Corpo da resposta paginada"""
+    return {'itens': itens, 'total': total, 'limite': limite, 'deslocamento': deslocamento}
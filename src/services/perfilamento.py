@@ -0,0 +1,144 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from flask import current_app, g, has_request_context, request
+from src.services.instrumentacao import ao_executar_sql, deve_coletar, nome_arquivo, rotacionar
+
+CABECALHO = 'X-Perfil'
+
+# Nomes de perfis gerados por este módulo (usados também para validar downloads)
+NOME_VALIDO = re.compile(r'^[\w.-]+$')
+
+# O cProfile não admite dois perfis ativos ao mesmo tempo no processo
+_trava = threading.Lock()
+
+
+def _iniciar():
+    configuracao = current_app.config
+    if not deve_coletar(CABECALHO, configuracao['PERFIL_SEGREDO'], configuracao['PERFIL_TAXA_AMOSTRAGEM']):
+        return
+    if not _trava.acquire(blocking=False):
+        return
+
+    iniciou_tracemalloc = not tracemalloc.is_tracing()
+    if iniciou_tracemalloc:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    perfil = cProfile.Profile()
+    g.perfil = {
+        'perfil': perfil,
+        'sql': [],
+        'inicio': time.perf_counter(),
+        'iniciou_tracemalloc': iniciou_tracemalloc
+    }
+    perfil.enable()
+
+
+def _encerrar():
+    """Para a coleta e libera a trava; devolve os dados coletados"""
+    # Sub-requisições de /api/batch compartilham o `g` da requisição externa, dona do perfil
+    if g.get('sub_requisicao'):
+        return None
+    dados = g.pop('perfil', None)
+    if dados is None:
+        return None
+
+    dados['perfil'].disable()
+    dados['duracao'] = time.perf_counter() - dados['inicio']
+    dados['pico_memoria'] = tracemalloc.get_traced_memory()[1]
+    if dados['iniciou_tracemalloc']:
+        tracemalloc.stop()
+    _trava.release()
+    return dados
+
+
+def _finalizar(resposta):
+    dados = _encerrar()
+    if dados is None:
+        return resposta
+
+    diretorio = current_app.config['PERFIL_DIRETORIO']
+    os.makedirs(diretorio, exist_ok=True)
+
+    nome = nome_arquivo()
+
+    dados['perfil'].dump_stats(os.path.join(diretorio, f'{nome}.prof'))
+
+    texto = io.StringIO()
+    pstats.Stats(dados['perfil'], stream=texto).sort_stats('cumulative').print_stats(25)
+
+    resumo = {
+        'nome': nome,
+        'metodo': request.method,
+        'caminho': request.full_path.rstrip('?'),
+        'status': resposta.status_code,
+        'data': datetime.now().isoformat(),
+        'duracao_ms': round(dados['duracao'] * 1000, 3),
+        'pico_memoria_bytes': dados['pico_memoria'],
+        'total_sql': len(dados['sql']),
+        'tempo_sql_ms': round(sum(item['duracao_ms'] for item in dados['sql']), 3),
+        'sql': dados['sql'],
+        'funcoes': texto.getvalue()
+    }
+    with open(os.path.join(diretorio, f'{nome}.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+
+    rotacionar(diretorio, current_app.config['PERFIL_MAXIMO_ARQUIVOS'], ('.json', '.prof'))
+
+    resposta.headers['X-Perfil-Id'] = nome
+    return resposta
+
+
+def _descartar(exc):
+    # Se a requisição falhou antes do after_request, a trava precisa ser liberada mesmo assim
+    _encerrar()
+
+
+def listar_perfis(diretorio):
+    """Resumos dos perfis gravados, do mais recente para o mais antigo (sem SQL e funções)"""
+    if not os.path.isdir(diretorio):
+        return []
+
+    perfis = []
+    for arquivo in sorted(os.listdir(diretorio), reverse=True):
+        if not arquivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(diretorio, arquivo), encoding='utf-8') as entrada:
+                resumo = json.load(entrada)
+        except (OSError, ValueError):
+            continue
+        resumo.pop('sql', None)
+        resumo.pop('funcoes', None)
+        perfis.append(resumo)
+    return perfis
+
+
+def _ativo():
+    return has_request_context() and 'perfil' in g
+
+
+def _registrar_sql(statement, executemany, inicio, fim):
+    dados = g.perfil
+    dados['sql'].append({
+        'inicio_ms': round((inicio - dados['inicio']) * 1000, 3),
+        'duracao_ms': round((fim - inicio) * 1000, 3),
+        'sql': statement[:1000]
+    })
+
+
+ao_executar_sql(_ativo, _registrar_sql)
+
+
+def init_app(app):
+    app.before_request(_iniciar)
+    app.after_request(_finalizar)
+    app.teardown_request(_descartar)
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, g, has_request_context, request
+from src.services.instrumentacao import ao_executar_sql, deve_coletar, nome_arquivo, rotacionar
+
+CABECALHO = 'X-Rastreio'
+
+# Rastros de requisições no formato "trace event" do Chrome: um evento completo
+# (ph 'X') para a requisição, um para cada seção nomeada (`secao`) e um para
+# cada comando SQL. O visualizador aninha os eventos pelo horário, então as
+# seções e o SQL aparecem dentro da requisição. Abra os arquivos em
+# chrome://tracing, https://ui.perfetto.dev ou https://www.speedscope.app.
+
+
+def _ativo():
+    return has_request_context() and 'rastreio' in g
+
+
+def _evento(rastreio, nome, categoria, inicio, fim, args=None):
+    """Evento completo; tempos em segundos de perf_counter, convertidos para µs desde o início do rastro"""
+    evento = {
+        'name': nome,
+        'cat': categoria,
+        'ph': 'X',
+        'ts': round((inicio - rastreio['inicio']) * 1e6, 1),
+        'dur': round((fim - inicio) * 1e6, 1),
+        'pid': os.getpid(),
+        'tid': threading.get_ident()
+    }
+    if args:
+        evento['args'] = args
+    return evento
+
+
+@contextmanager
+def secao(nome, **args):
+    """Marca um trecho de uma rota como seção do rastro; sem rastro ativo, não faz nada"""
+    if not _ativo():
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.rastreio['eventos'].append(_evento(g.rastreio, nome, 'secao', inicio, time.perf_counter(), args))
+
+
+def _iniciar():
+    configuracao = current_app.config
+    if deve_coletar(CABECALHO, configuracao['RASTREAMENTO_SEGREDO'], configuracao['RASTREAMENTO_TAXA_AMOSTRAGEM']):
+        g.rastreio = {'inicio': time.perf_counter(), 'eventos': []}
+
+
+def _finalizar(resposta):
+    # Sub-requisições de /api/batch entram como seções no rastro da requisição externa
+    if g.get('sub_requisicao'):
+        return resposta
+    rastreio = g.pop('rastreio', None)
+    if rastreio is None:
+        return resposta
+
+    fim = time.perf_counter()
+    # O evento da requisição vem primeiro para abrir a linha do tempo
+    eventos = [_evento(rastreio, f'{request.method} {request.path}', 'requisicao', rastreio['inicio'], fim, {
+        'endpoint': request.endpoint,
+        'status': resposta.status_code,
+        'sql': sum(1 for evento in rastreio['eventos'] if evento['cat'] == 'sql')
+    })] + rastreio['eventos']
+
+    diretorio = current_app.config['RASTREAMENTO_DIRETORIO']
+    os.makedirs(diretorio, exist_ok=True)
+    nome = nome_arquivo()
+
+    with open(os.path.join(diretorio, f'{nome}.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'traceEvents': eventos,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'metodo': request.method,
+                'caminho': request.full_path.rstrip('?'),
+                'status': resposta.status_code,
+                'data': datetime.now().isoformat(),
+                'duracao_ms': round((fim - rastreio['inicio']) * 1000, 3)
+            }
+        }, arquivo, ensure_ascii=False)
+
+    rotacionar(diretorio, current_app.config['RASTREAMENTO_MAXIMO_ARQUIVOS'])
+
+    resposta.headers['X-Rastreio-Id'] = nome
+    return resposta
+
+
+def _descartar(exc):
+    if not g.get('sub_requisicao'):
+        g.pop('rastreio', None)
+
+
+def _registrar_sql(statement, executemany, inicio, fim):
+    comando = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'SQL'
+    g.rastreio['eventos'].append(
+        _evento(g.rastreio, comando, 'sql', inicio, fim, {'sql': statement[:1000], 'executemany': executemany})
+    )
+
+
+ao_executar_sql(_ativo, _registrar_sql)
+
+
+def init_app(app):
+    app.before_request(_iniciar)
+    app.after_request(_finalizar)
+    app.teardown_request(_descartar)
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from flask import current_app, g
+from src.models.user import db
+from src.models.servico import Servico
+from src.models.relatorio import Relatorio, STATUS_ATIVOS
+from src.services.arquivamento import agendamentos_periodo
+from src.services.inquilinos import nomes_inquilinos, usar_inquilino
+from src.services.leitura import sessao_leitura
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Relatórios pesados (receita e retenção de um ano inteiro) rodam fora da
+# requisição: o POST grava o pedido e devolve 202, um pool de threads faz o
+# cálculo na engine de leitura e o resultado fica na tabela `relatorio` até
+# expirar. Pedidos com os mesmos parâmetros compartilham a mesma linha: o
+# índice único parcial em `chave` garante um só cálculo em andamento mesmo
+# com vários processos servindo a API.
+
+AGRUPAMENTOS = {'dia': '%Y-%m-%d', 'semana': '%Y-%W', 'mes': '%Y-%m'}
+
+
+def _agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _data(valor, padrao):
+    if not valor:
+        return padrao
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _periodo(dados):
+    """Normaliza o intervalo [inicio, fim] em datas; o padrão são os últimos 12 meses"""
+    hoje = _agora().date()
+    try:
+        fim = _data(dados.get('fim'), hoje)
+        inicio = _data(dados.get('inicio'), fim - timedelta(days=365))
+    except ValueError:
+        raise ValueError('Formato de data inválido. Use ISO format (AAAA-MM-DD)')
+    if inicio > fim:
+        raise ValueError('A data de início deve ser anterior à data de fim')
+    if (fim - inicio).days > 366 * 5:
+        raise ValueError('O período máximo é de 5 anos')
+    return {'inicio': inicio.isoformat(), 'fim': fim.isoformat()}
+
+
+def _limites(parametros):
+    inicio = datetime.fromisoformat(parametros['inicio'])
+    fim = datetime.fromisoformat(parametros['fim']) + timedelta(days=1)
+    return inicio, fim
+
+
+def _parametros_receita(dados):
+    parametros = _periodo(dados)
+    agrupamento = dados.get('agrupamento', 'mes')
+    if agrupamento not in AGRUPAMENTOS:
+        raise ValueError(f'Agrupamento deve ser um dos: {", ".join(AGRUPAMENTOS)}')
+    parametros['agrupamento'] = agrupamento
+    return parametros
+
+
+def _relatorio_receita(sessao, parametros):
+    """Receita e atendimentos concluídos por período e por serviço"""
+    inicio, fim = _limites(parametros)
+    periodo = agendamentos_periodo(inicio, fim, sessao)
+    chave = func.strftime(AGRUPAMENTOS[parametros['agrupamento']], periodo.c.data_agendamento)
+    concluidos = periodo.c.status == 'concluido'
+
+    por_periodo = sessao.execute(
+        select(chave, func.count(), func.sum(Servico.preco))
+        .join(Servico, periodo.c.servico_id == Servico.id)
+        .where(concluidos).group_by(chave).order_by(chave)
+    ).all()
+
+    por_servico = sessao.execute(
+        select(Servico.id, Servico.nome, func.count(), func.sum(Servico.preco))
+        .join(periodo, periodo.c.servico_id == Servico.id)
+        .where(concluidos).group_by(Servico.id, Servico.nome)
+        .order_by(func.sum(Servico.preco).desc())
+    ).all()
+
+    return {
+        'periodos': [
+            {'periodo': rotulo, 'atendimentos': total, 'receita': float(receita or 0)}
+            for rotulo, total, receita in por_periodo
+        ],
+        'servicos': [
+            {'servico_id': servico_id, 'nome': nome, 'atendimentos': total, 'receita': float(receita or 0)}
+            for servico_id, nome, total, receita in por_servico
+        ],
+        'atendimentos': sum(linha[1] for linha in por_periodo),
+        'receita_total': float(sum(linha[2] or 0 for linha in por_periodo))
+    }
+
+
+def _relatorio_retencao(sessao, parametros):
+    """Coortes mensais: clientes agrupados pelo mês do primeiro atendimento no período
+    e quantos deles voltaram em cada mês seguinte"""
+    inicio, fim = _limites(parametros)
+    periodo = agendamentos_periodo(inicio, fim, sessao)
+    mes = func.strftime('%Y-%m', periodo.c.data_agendamento)
+
+    # Um par (cliente, mês) por linha, já ordenado: a coorte é o primeiro mês de cada cliente
+    linhas = sessao.execute(
+        select(periodo.c.cliente_id, mes).where(periodo.c.status == 'concluido')
+        .group_by(periodo.c.cliente_id, mes).order_by(periodo.c.cliente_id, mes)
+    ).all()
+
+    def indice(rotulo):
+        ano, numero = rotulo.split('-')
+        return int(ano) * 12 + int(numero) - 1
+
+    coortes = {}
+    meses_por_cliente = {}
+    cliente_atual = None
+    for cliente_id, rotulo in linhas:
+        if cliente_id != cliente_atual:
+            cliente_atual, coorte = cliente_id, rotulo
+            coortes.setdefault(coorte, {'clientes': 0, 'retidos': []})['clientes'] += 1
+        meses_por_cliente[cliente_id] = meses_por_cliente.get(cliente_id, 0) + 1
+        deslocamento = indice(rotulo) - indice(coorte)
+        retidos = coortes[coorte]['retidos']
+        retidos.extend([0] * (deslocamento + 1 - len(retidos)))
+        retidos[deslocamento] += 1
+
+    total_clientes = len(meses_por_cliente)
+    recorrentes = sum(1 for quantidade in meses_por_cliente.values() if quantidade > 1)
+    return {
+        'coortes': [
+            {
+                'coorte': rotulo,
+                'clientes': dados['clientes'],
+                'retidos': dados['retidos'],
+                'taxas': [round(retidos / dados['clientes'], 4) for retidos in dados['retidos']]
+            }
+            for rotulo, dados in sorted(coortes.items())
+        ],
+        'clientes': total_clientes,
+        'clientes_recorrentes': recorrentes,
+        'taxa_recorrencia': round(recorrentes / total_clientes, 4) if total_clientes else 0.0
+    }
+
+
+# tipo -> (normalização dos parâmetros, cálculo)
+TIPOS = {
+    'receita': (_parametros_receita, _relatorio_receita),
+    'retencao': (_periodo, _relatorio_retencao)
+}
+
+
+def _chave(tipo, parametros):
+    canonico = json.dumps({'tipo': tipo, 'parametros': parametros}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode()).hexdigest()
+
+
+def _reaproveitavel(chave, agora):
+    """Pedido com os mesmos parâmetros ainda em andamento ou concluído e dentro do TTL"""
+    return db.session.execute(
+        select(Relatorio).where(
+            Relatorio.chave == chave,
+            or_(
+                Relatorio.status.in_(STATUS_ATIVOS),
+                and_(Relatorio.status == 'concluido', Relatorio.expira_em > agora)
+            )
+        ).order_by(Relatorio.id.desc()).limit(1)
+    ).scalar()
+
+
+def _liberar_abandonados(agora):
+    """Remove relatórios vencidos e encerra cálculos interrompidos (ex.: processo reiniciado)"""
+    db.session.execute(delete(Relatorio).where(Relatorio.expira_em < agora))
+    limite = agora - timedelta(minutes=current_app.config['RELATORIOS_TEMPO_MAXIMO_MINUTOS'])
+    db.session.execute(
+        update(Relatorio).where(Relatorio.status.in_(STATUS_ATIVOS), Relatorio.data_criacao < limite)
+        .values(status='erro', erro='Cálculo interrompido antes de concluir', concluido_em=agora)
+    )
+
+
+def solicitar_relatorio(tipo, dados):
+    """Reaproveita ou cria o pedido de relatório; devolve (relatorio, criado).
+
+    Levanta ValueError para tipo ou parâmetros inválidos.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo deve ser um dos: {", ".join(TIPOS)}')
+    normalizar, _ = TIPOS[tipo]
+    parametros = normalizar(dados)
+    chave = _chave(tipo, parametros)
+    agora = _agora()
+
+    _liberar_abandonados(agora)
+    existente = _reaproveitavel(chave, agora)
+    if existente:
+        db.session.commit()
+        return existente, False
+
+    relatorio = Relatorio(
+        tipo=tipo,
+        parametros=json.dumps(parametros, sort_keys=True),
+        chave=chave,
+        status='pendente',
+        data_criacao=agora,
+        expira_em=agora + timedelta(hours=current_app.config['RELATORIOS_TTL_HORAS'])
+    )
+    db.session.add(relatorio)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição criou o mesmo pedido entre a consulta e o INSERT
+        db.session.rollback()
+        return _reaproveitavel(chave, agora), False
+
+    current_app.extensions['relatorios'].enviar(relatorio.id, g.get('inquilino'))
+    return relatorio, True
+
+
+def obter_relatorio(relatorio_id):
+    """Relatório ainda dentro do TTL, ou None"""
+    return db.session.execute(
+        select(Relatorio).where(Relatorio.id == relatorio_id, Relatorio.expira_em > _agora())
+    ).scalar()
+
+
+class ExecutorRelatorios:
+    """Pool de threads que calcula os relatórios pedidos fora da requisição"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pool = ThreadPoolExecutor(
+            max_workers=app.config['RELATORIOS_TRABALHADORES'], thread_name_prefix='relatorio'
+        )
+        self._retomada = threading.Lock()
+
+    def enviar(self, relatorio_id, inquilino=None):
+        return self.pool.submit(self._executar, relatorio_id, inquilino)
+
+    def retomar_pendentes(self):
+        """Reenvia, uma vez por processo, os pedidos pendentes de todos os bancos.
+
+        O pool só recebe um pedido quando ele é criado: os que ficaram
+        pendentes quando o processo parou não seriam calculados e, pelo
+        índice único, prenderiam os pedidos iguais até serem liberados por
+        abandono. Reenviar é seguro com vários processos: só um trabalhador
+        assume cada pedido. Os que estavam `executando` seguem para a
+        liberação por abandono, pois podem estar com outro processo.
+        Devolve o Future da retomada, ou None se ela já foi iniciada.
+        """
+        if self._retomada.acquire(blocking=False):
+            return self.pool.submit(self._retomar)
+        return None
+
+    def _retomar(self):
+        with self.app.app_context():
+            for inquilino in nomes_inquilinos() or [None]:
+                try:
+                    with usar_inquilino(inquilino) if inquilino else nullcontext():
+                        pendentes = db.session.execute(
+                            select(Relatorio.id).where(Relatorio.status == 'pendente').order_by(Relatorio.id)
+                        ).scalars().all()
+                except Exception:
+                    self.app.logger.exception('Falha ao retomar relatórios pendentes (%s)', inquilino or 'principal')
+                    continue
+                for relatorio_id in pendentes:
+                    self.enviar(relatorio_id, inquilino)
+
+    def _executar(self, relatorio_id, inquilino):
+        with self.app.app_context():
+            with usar_inquilino(inquilino) if inquilino else nullcontext():
+                try:
+                    self._calcular(relatorio_id)
+                except Exception as e:
+                    # Sem isto a exceção ficaria presa no Future e o pedido, parado até ser liberado por abandono
+                    self.app.logger.exception('Falha ao calcular o relatório %s', relatorio_id)
+                    self._marcar_erro(relatorio_id, e)
+
+    def _marcar_erro(self, relatorio_id, erro):
+        db.session.rollback()
+        agora = _agora()
+        try:
+            db.session.execute(
+                update(Relatorio).where(Relatorio.id == relatorio_id, Relatorio.status.in_(STATUS_ATIVOS))
+                .values(status='erro', erro=str(erro), concluido_em=agora,
+                        expira_em=agora + timedelta(hours=current_app.config['RELATORIOS_TTL_HORAS']))
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Não foi possível marcar o relatório %s com erro', relatorio_id)
+
+    def _calcular(self, relatorio_id):
+        # Só um trabalhador assume o pedido, mesmo que ele seja enviado duas vezes
+        assumido = db.session.execute(
+            update(Relatorio).where(Relatorio.id == relatorio_id, Relatorio.status == 'pendente')
+            .values(status='executando', iniciado_em=_agora())
+        ).rowcount
+        db.session.commit()
+        if not assumido:
+            return
+
+        relatorio = db.session.get(Relatorio, relatorio_id)
+        try:
+            _, calcular = TIPOS[relatorio.tipo]
+            resultado = calcular(sessao_leitura(), json.loads(relatorio.parametros))
+            relatorio.resultado = json.dumps(resultado, ensure_ascii=False)
+            relatorio.status = 'concluido'
+        except Exception as e:
+            db.session.rollback()
+            relatorio.status = 'erro'
+            relatorio.erro = str(e)
+
+        agora = _agora()
+        relatorio.concluido_em = agora
+        relatorio.expira_em = agora + timedelta(hours=current_app.config['RELATORIOS_TTL_HORAS'])
+        db.session.commit()
+
+
+def init_app(app):
+    # As threads do pool só são criadas no primeiro envio; a retomada dos
+    # pendentes espera o primeiro request, para que comandos do Flask CLI não a iniciem
+    executor = ExecutorRelatorios(app)
+    app.extensions['relatorios'] = executor
+
+    @app.before_request
+    def retomar():
+        executor.retomar_pendentes()
@@ -0,0 +1,115 @@
+import json
+import re
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.services.auditoria import registrar_auditoria
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert
+
+# Erros de linha devolvidos na resposta; os demais só entram na contagem
+MAXIMO_ERROS_REPORTADOS = 100
+
+
+def normalizar_email(email):
+    email = (email or '').strip().lower()
+    return email or None
+
+
+def normalizar_telefone(telefone):
+    return re.sub(r'\D', '', str(telefone or ''))
+
+
+def _registro(dados):
+    """Valida e normaliza um registro do CRM; a chave de sincronização é o e-mail"""
+    if not isinstance(dados, dict):
+        raise ValueError('Cada linha deve ser um objeto JSON')
+    email = normalizar_email(dados.get('email'))
+    telefone = normalizar_telefone(dados.get('telefone'))
+    nome = (dados.get('nome') or '').strip()
+    if not email or '@' not in email:
+        raise ValueError('E-mail ausente ou inválido')
+    if not nome or not telefone:
+        raise ValueError('Nome e telefone são obrigatórios')
+    return {'email': email, 'nome': nome[:100], 'telefone': telefone[:20]}
+
+
+def _gravar_lote(registros):
+    """Um único INSERT ... ON CONFLICT(email) DO UPDATE para o lote; devolve (inseridos, atualizados)
+
+    Linhas idênticas às do banco não são tocadas (WHERE do DO UPDATE) e
+    não aparecem no RETURNING. Inserções saem com versao 1 e atualizações
+    incrementam a versão, o que separa as duas contagens. O upsert não lê
+    os valores anteriores: a auditoria registra só os novos.
+    """
+    tabela = Cliente.__table__
+    comando = insert(tabela)
+    comando = comando.on_conflict_do_update(
+        index_elements=[tabela.c.email],
+        set_={
+            'nome': comando.excluded.nome,
+            'telefone': comando.excluded.telefone,
+            'versao': tabela.c.versao + 1
+        },
+        where=or_(
+            tabela.c.nome.is_distinct_from(comando.excluded.nome),
+            tabela.c.telefone.is_distinct_from(comando.excluded.telefone)
+        )
+    ).returning(tabela.c.id, tabela.c.email, tabela.c.versao)
+
+    # executemany com RETURNING: o SQLAlchemy agrupa as linhas em INSERTs de vários VALUES
+    # ("insertmanyvalues") reaproveitando o SQL compilado entre lotes
+    gravados = db.session.execute(comando, list(registros.values())).all()
+
+    alteracoes = {'criacao': {}, 'alteracao': {}}
+    for cliente_id, email, versao in gravados:
+        campos = registros[email] if versao == 1 else {'nome': registros[email]['nome'], 'telefone': registros[email]['telefone']}
+        alteracoes['criacao' if versao == 1 else 'alteracao'][cliente_id] = {
+            campo: (None, valor) for campo, valor in campos.items()
+        }
+    for acao, por_id in alteracoes.items():
+        registrar_auditoria(db.session, 'cliente', por_id, acao)
+
+    inseridos = len(alteracoes['criacao'])
+    return inseridos, len(gravados) - inseridos
+
+
+def sincronizar_clientes(linhas, tamanho_lote):
+    """Aplica um fluxo NDJSON de clientes em lotes de `tamanho_lote`, em uma única transação.
+
+    `linhas` é lido sob demanda: só um lote fica em memória. Linhas
+    inválidas são contadas como rejeitadas e não interrompem a carga.
+    O commit fica com o chamador.
+    """
+    resultado = {'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'rejeitados': 0, 'erros': []}
+    lote = {}
+
+    def gravar():
+        inseridos, atualizados = _gravar_lote(lote)
+        resultado['inseridos'] += inseridos
+        resultado['atualizados'] += atualizados
+        resultado['inalterados'] += len(lote) - inseridos - atualizados
+        lote.clear()
+
+    for numero, linha in enumerate(linhas, start=1):
+        if isinstance(linha, bytes):
+            linha = linha.decode('utf-8-sig' if numero == 1 else 'utf-8', errors='replace')
+        if not linha.strip():
+            continue
+        try:
+            registro = _registro(json.loads(linha))
+        except ValueError as e:  # inclui JSONDecodeError
+            resultado['rejeitados'] += 1
+            if len(resultado['erros']) < MAXIMO_ERROS_REPORTADOS:
+                resultado['erros'].append({'linha': numero, 'erro': str(e)})
+            continue
+
+        # E-mail repetido no mesmo lote: vale a última ocorrência (a anterior conta como inalterada)
+        if registro['email'] in lote:
+            resultado['inalterados'] += 1
+        lote[registro['email']] = registro
+        if len(lote) >= tamanho_lote:
+            gravar()
+
+    if lote:
+        gravar()
+    return resultado
@@ -0,0 +1,252 @@
+import os
+import re
+import sqlite3
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.services.inquilinos import nomes_inquilinos
+from datetime import datetime, timezone
+
+# Cópias consistentes do banco com a aplicação no ar, pela API de backup do SQLite.
+#
+# A cópia anda em passos de SNAPSHOTS_PAGINAS_POR_PASSO páginas com uma pausa
+# de SNAPSHOTS_PAUSA_MS entre eles. Em WAL (o modo usado pela aplicação) a
+# conexão de origem mantém uma transação de leitura aberta durante toda a
+# cópia: o snapshot reflete um único instante e as escritas seguem sem
+# esperar, já que leitores não bloqueiam o escritor. Sem isso, cada commit
+# de outra conexão faria a cópia recomeçar do zero. Nos demais modos cada
+# passo segura o lock de leitura só enquanto copia suas páginas; commits
+# concorrentes reiniciam a cópia, até SNAPSHOTS_MAXIMO_REINICIOS vezes.
+
+NOME_SNAPSHOT = re.compile(r'^snapshot-\d{8}T\d{12}\.db$')
+
+
+def _pool_validado(inquilino):
+    """Pool de salões, depois de conferir que `inquilino` é um salão provisionado (nome válido e banco existente)"""
+    pool = current_app.extensions['inquilinos']
+    if not pool.existe(inquilino):
+        raise ValueError(f'Salão {inquilino} não encontrado')
+    return pool
+
+
+def _caminho_banco(inquilino=None):
+    if inquilino:
+        return _pool_validado(inquilino).caminho(inquilino)
+
+    caminho = db.engine.url.database
+    if db.engine.dialect.name != 'sqlite' or not caminho or caminho == ':memory:':
+        raise ValueError('Snapshots exigem um banco SQLite em arquivo')
+    return caminho
+
+
+def _diretorio(inquilino=None):
+    base = current_app.config['SNAPSHOTS_DIRETORIO']
+    if inquilino:
+        # O nome entra no caminho: só salões existentes, nunca algo como '../..'
+        _pool_validado(inquilino)
+        return os.path.join(base, 'inquilinos', inquilino)
+    return os.path.join(base, 'principal')
+
+
+def listar_snapshots(inquilino=None):
+    """Snapshots guardados, do mais recente para o mais antigo"""
+    diretorio = _diretorio(inquilino)
+    if not os.path.isdir(diretorio):
+        return []
+    snapshots = []
+    for arquivo in sorted(os.listdir(diretorio), reverse=True):
+        if not NOME_SNAPSHOT.match(arquivo):
+            continue
+        info = os.stat(os.path.join(diretorio, arquivo))
+        snapshots.append({
+            'arquivo': arquivo,
+            'tamanho_bytes': info.st_size,
+            'criado_em': datetime.fromtimestamp(info.st_mtime, timezone.utc).replace(tzinfo=None).isoformat()
+        })
+    return snapshots
+
+
+def _aplicar_retencao(diretorio, manter):
+    """Remove os snapshots além dos `manter` mais recentes; devolve os nomes removidos"""
+    antigos = sorted((arquivo for arquivo in os.listdir(diretorio) if NOME_SNAPSHOT.match(arquivo)), reverse=True)[manter:]
+    for arquivo in antigos:
+        os.remove(os.path.join(diretorio, arquivo))
+    return antigos
+
+
+def criar_snapshot(inquilino=None, retencao=None):
+    """Copia o banco principal (ou o do salão `inquilino`) sem parar a aplicação; devolve as métricas da cópia"""
+    config = current_app.config
+    retencao = config['SNAPSHOTS_RETENCAO'] if retencao is None else retencao
+    paginas_por_passo = config['SNAPSHOTS_PAGINAS_POR_PASSO']
+    pausa = config['SNAPSHOTS_PAUSA_MS'] / 1000
+    maximo_reinicios = config['SNAPSHOTS_MAXIMO_REINICIOS']
+
+    origem_caminho = _caminho_banco(inquilino)
+    diretorio = _diretorio(inquilino)
+    os.makedirs(diretorio, exist_ok=True)
+    arquivo = f"snapshot-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}.db"
+    destino_caminho = os.path.join(diretorio, arquivo)
+    temporario = f'{destino_caminho}.tmp'
+
+    metricas = {'passos': 0, 'reinicios': 0, 'maior_pausa_ms': 0.0}
+    restantes_anterior = None
+    inicio = fim_passo = time.perf_counter()
+
+    def progresso(status, restantes, total):
+        nonlocal restantes_anterior, fim_passo
+        # Duração do passo = tempo em que a cópia segurou o banco de origem
+        metricas['maior_pausa_ms'] = max(metricas['maior_pausa_ms'], (time.perf_counter() - fim_passo) * 1000)
+        metricas['passos'] += 1
+        metricas['paginas'] = total
+        if restantes_anterior is not None and restantes > restantes_anterior:
+            metricas['reinicios'] += 1
+            if metricas['reinicios'] > maximo_reinicios:
+                raise RuntimeError('Cópia reiniciada muitas vezes por escritas concorrentes; tente novamente')
+        restantes_anterior = restantes
+        if restantes:
+            time.sleep(pausa)
+        fim_passo = time.perf_counter()
+
+    origem = sqlite3.connect(origem_caminho, isolation_level=None, timeout=30)
+    try:
+        modo = origem.execute('PRAGMA journal_mode').fetchone()[0]
+        if modo == 'wal':
+            origem.execute('BEGIN')
+            origem.execute('SELECT count(*) FROM sqlite_master').fetchone()
+
+        destino = sqlite3.connect(temporario)
+        try:
+            origem.backup(destino, pages=paginas_por_passo, progress=progresso)
+            # O arquivo guardado dispensa os arquivos -wal/-shm
+            destino.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            destino.close()
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    finally:
+        origem.close()
+
+    os.replace(temporario, destino_caminho)
+    return {
+        'banco': inquilino or 'principal',
+        'arquivo': arquivo,
+        'modo_journal': modo,
+        'tamanho_bytes': os.path.getsize(destino_caminho),
+        'paginas': metricas.get('paginas', 0),
+        'passos': metricas['passos'],
+        'reinicios': metricas['reinicios'],
+        'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1),
+        'maior_pausa_ms': round(metricas['maior_pausa_ms'], 1),
+        'removidos': _aplicar_retencao(diretorio, retencao) if retencao else []
+    }
+
+
+def criar_snapshots(inquilino=None, retencao=None):
+    """Snapshot do salão informado ou, sem ele, do banco principal e de todos os salões"""
+    if inquilino:
+        return [criar_snapshot(inquilino, retencao)]
+    return [criar_snapshot(None, retencao)] + [criar_snapshot(nome, retencao) for nome in nomes_inquilinos()]
+
+
+def restaurar_snapshot(arquivo, inquilino=None):
+    """Substitui o conteúdo do banco pelo snapshot `arquivo`, guardando antes uma cópia do estado atual.
+
+    A restauração é feita pela API de backup em um único passo: as
+    conexões abertas passam a ver o conteúdo restaurado na próxima
+    transação, sem estado intermediário.
+    """
+    if not NOME_SNAPSHOT.match(arquivo):
+        raise ValueError('Nome de snapshot inválido')
+    origem_caminho = os.path.join(_diretorio(inquilino), arquivo)
+    if not os.path.exists(origem_caminho):
+        raise ValueError(f'Snapshot {arquivo} não encontrado')
+
+    # A cópia de segurança não conta na retenção: o snapshot restaurado nunca é removido por ela
+    anterior = criar_snapshot(inquilino, retencao=0)
+
+    inicio = time.perf_counter()
+    origem = sqlite3.connect(f'file:{origem_caminho}?mode=ro', uri=True)
+    try:
+        destino = sqlite3.connect(_caminho_banco(inquilino), timeout=30)
+        try:
+            modo = destino.execute('PRAGMA journal_mode').fetchone()[0]
+            origem.backup(destino)
+            destino.execute(f'PRAGMA journal_mode={modo}')
+        finally:
+            destino.close()
+    finally:
+        origem.close()
+
+    if not inquilino and current_app.extensions['leitura'].modo == 'replica':
+        current_app.extensions['leitura'].atualizar_replica()
+
+    return {
+        'banco': inquilino or 'principal',
+        'arquivo': arquivo,
+        'copia_anterior': anterior['arquivo'],
+        'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1)
+    }
+
+
+def _descrever(resultado):
+    return (
+        f"{resultado['banco']}: {resultado['arquivo']} ({resultado['tamanho_bytes']} bytes, {resultado['paginas']} páginas) "
+        f"em {resultado['duracao_ms']} ms, {resultado['passos']} passo(s), maior pausa {resultado['maior_pausa_ms']} ms, "
+        f"{resultado['reinicios']} reinício(s)"
+    )
+
+
+@click.group('snapshots')
+def comando_snapshots():
+    """Cópias consistentes do banco sem parar a aplicação"""
+
+
+@comando_snapshots.command('criar')
+@click.option('--inquilino', default=None, help='Salão copiado (padrão: banco principal e todos os salões)')
+@click.option('--retencao', type=int, default=None, help='Quantidade de snapshots mantidos por banco (0 mantém todos)')
+@with_appcontext
+def comando_criar(inquilino, retencao):
+    """Cria um snapshot e remove os excedentes da retenção"""
+    try:
+        resultados = criar_snapshots(inquilino, retencao)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    for resultado in resultados:
+        click.echo(_descrever(resultado))
+        for removido in resultado['removidos']:
+            click.echo(f'  removido {removido}')
+
+
+@comando_snapshots.command('listar')
+@click.option('--inquilino', default=None, help='Salão (padrão: banco principal)')
+@with_appcontext
+def comando_listar(inquilino):
+    """Lista os snapshots guardados"""
+    try:
+        snapshots = listar_snapshots(inquilino)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for snapshot in snapshots:
+        click.echo(f"{snapshot['arquivo']}  {snapshot['tamanho_bytes']} bytes  {snapshot['criado_em']}")
+
+
+@comando_snapshots.command('restaurar')
+@click.argument('arquivo')
+@click.option('--inquilino', default=None, help='Salão restaurado (padrão: banco principal)')
+@click.confirmation_option(prompt='O conteúdo atual do banco será substituído. Continuar?')
+@with_appcontext
+def comando_restaurar(arquivo, inquilino):
+    """Restaura um snapshot sobre o banco em uso"""
+    try:
+        resultado = restaurar_snapshot(arquivo, inquilino)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"{resultado['banco']}: {resultado['arquivo']} restaurado em {resultado['duracao_ms']} ms "
+        f"(estado anterior guardado em {resultado['copia_anterior']})"
+    )
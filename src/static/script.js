@@ -4,9 +4,12 @@ const API_BASE = '/api';
 // Estado da aplicação
 let currentPage = 'dashboard';
 let editingItem = null;
-let clientes = [];
+let clientes = null;  // lista completa, só para o select do agendamento (carregada ao abrir o modal)
 let servicos = [];
-let agendamentos = [];
+let chaveIdempotencia = null;
+let itemEmEdicao = null;
+let tabelaAgendamentos = null;
+let tabelaClientes = null;
 
 // Inicialização
 document.addEventListener('DOMContentLoaded', function() {
@@ -14,11 +17,46 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 function initializeApp() {
+    tabelaAgendamentos = new TabelaVirtual({
+        tabela: '#tabela-agendamentos',
+        endpoint: '/agendamentos',
+        colunas: 6,
+        renderLinha: linhaAgendamento,
+        vazio: 'Nenhum agendamento encontrado',
+        parametros: filtrosAgendamentos()
+    });
+    tabelaClientes = new TabelaVirtual({
+        tabela: '#tabela-clientes',
+        endpoint: '/clientes',
+        colunas: 5,
+        renderLinha: linhaCliente,
+        vazio: 'Nenhum cliente cadastrado'
+    });
     setupEventListeners();
-    loadDashboard();
-    loadClientes();
-    loadServicos();
-    loadAgendamentos();
+    carregarDadosIniciais();
+}
+
+// Dashboard, serviços e a primeira página de clientes e de agendamentos em uma única requisição
+async function carregarDadosIniciais() {
+    try {
+        const [stats, agendamentosHoje, proximosAgendamentos, paginaClientes, listaServicos, paginaAgendamentos] = await apiBatch([
+            '/api/dashboard/estatisticas',
+            '/api/dashboard/agendamentos-hoje',
+            '/api/dashboard/proximos-agendamentos',
+            API_BASE + tabelaClientes.caminhoPagina(0),
+            '/api/servicos?apenas_ativos=false',
+            API_BASE + tabelaAgendamentos.caminhoPagina(0)
+        ]);
+
+        renderDashboard(stats, agendamentosHoje, proximosAgendamentos);
+        tabelaClientes.definirPrimeiraPagina(paginaClientes);
+        servicos = listaServicos;
+        renderServicos();
+        updateServicoSelects();
+        tabelaAgendamentos.definirPrimeiraPagina(paginaAgendamentos);
+    } catch (error) {
+        console.error('Erro ao carregar dados iniciais:', error);
+    }
 }
 
 // Event Listeners
@@ -41,6 +79,14 @@ function setupEventListeners() {
     document.getElementById('form-servico').addEventListener('submit', handleServicoSubmit);
     document.getElementById('form-agendamento').addEventListener('submit', handleAgendamentoSubmit);
 
+    // Filtros aplicados enquanto o usuário escolhe, sem esperar o botão
+    const filtrarAdiado = adiar(aplicarFiltros, 300);
+    ['filtro-data', 'filtro-status'].forEach(id => {
+        const campo = document.getElementById(id);
+        campo.addEventListener('input', filtrarAdiado);
+        campo.addEventListener('change', filtrarAdiado);
+    });
+
     // Fechar modais clicando fora
     document.querySelectorAll('.modal').forEach(modal => {
         modal.addEventListener('click', function(e) {
@@ -138,22 +184,61 @@ function formatCurrency(value) {
     }).format(value);
 }
 
+const ROTULOS_STATUS = {
+    agendado: 'Agendado',
+    concluido: 'Concluído',
+    cancelado: 'Cancelado',
+    nao_compareceu: 'Não compareceu'
+};
+
+function formatStatus(status) {
+    return ROTULOS_STATUS[status] || status;
+}
+
+// Gera uma chave nova por formulário aberto; reenvios do mesmo formulário reutilizam a chave
+function novaChaveIdempotencia() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+// Envia a versão lida junto com a alteração; o servidor responde 412 se o registro mudou desde então
+function cabecalhoVersao(item) {
+    return item && item.versao ? { 'If-Match': `"${item.versao}"` } : {};
+}
+
+// Executa `funcao` só depois de `esperaMs` sem novas chamadas
+function adiar(funcao, esperaMs) {
+    let temporizador = null;
+    return (...args) => {
+        clearTimeout(temporizador);
+        temporizador = setTimeout(() => funcao(...args), esperaMs);
+    };
+}
+
 // API Calls
+// `silencioso` dispensa o indicador de carregamento (páginas buscadas durante a rolagem)
 async function apiCall(endpoint, options = {}) {
+    const { headers = {}, silencioso = false, ...outrasOpcoes } = options;
     try {
-        showLoading();
+        if (!silencioso) {
+            showLoading();
+        }
         const response = await fetch(`${API_BASE}${endpoint}`, {
+            ...outrasOpcoes,
             headers: {
                 'Content-Type': 'application/json',
-                ...options.headers
-            },
-            ...options
+                ...headers
+            }
         });
 
         const data = await response.json();
         
         if (!response.ok) {
-            throw new Error(data.erro || 'Erro na requisição');
+            const erro = new Error(data.erro || 'Erro na requisição');
+            erro.status = response.status;
+            throw erro;
         }
         
         return data;
@@ -161,33 +246,284 @@ async function apiCall(endpoint, options = {}) {
         showNotification(error.message, 'error');
         throw error;
     } finally {
-        hideLoading();
+        if (!silencioso) {
+            hideLoading();
+        }
+    }
+}
+
+// Várias chamadas GET em uma requisição (POST /api/batch); devolve os corpos na mesma ordem
+async function apiBatch(caminhos) {
+    const { respostas } = await apiCall('/batch', {
+        method: 'POST',
+        body: JSON.stringify({
+            requisicoes: caminhos.map(caminho => ({ metodo: 'GET', caminho })),
+            paralelo: true
+        })
+    });
+
+    const falha = respostas.find(resposta => resposta.status >= 400);
+    if (falha) {
+        const erro = new Error((falha.corpo && falha.corpo.erro) || 'Erro na requisição');
+        erro.status = falha.status;
+        showNotification(erro.message, 'error');
+        throw erro;
+    }
+    return respostas.map(resposta => resposta.corpo);
+}
+
+// Tabela com rolagem virtual
+//
+// Só as linhas na área visível (mais `margem` acima e abaixo) ficam no DOM;
+// duas linhas espaçadoras ocupam a altura das demais, de modo que a barra de
+// rolagem representa a lista inteira. As linhas vêm do servidor em páginas
+// (?limite=&deslocamento=), pedidas conforme a rolagem chega a faixas ainda
+// não carregadas. Cada <tr> é guardado pelo id do registro e só é recriado
+// quando o registro muda; ao rolar, as linhas existentes são reaproveitadas.
+const ALTURA_LINHA_PADRAO = 56;  // px, até a primeira linha ser medida
+
+class TabelaVirtual {
+    constructor({ tabela, endpoint, colunas, renderLinha, vazio, parametros = '', tamanhoPagina = 100, margem = 10 }) {
+        this.tbody = document.querySelector(`${tabela} tbody`);
+        this.container = this.tbody.closest('.table-container');
+        this.endpoint = endpoint;
+        this.colunas = colunas;
+        this.renderLinha = renderLinha;
+        this.vazio = vazio;
+        this.parametros = parametros;
+        this.tamanhoPagina = tamanhoPagina;
+        this.margem = margem;
+
+        this.alturaLinha = null;
+        this.total = null;
+        this.paginas = new Map();    // número da página -> registros
+        this.pendentes = new Map();  // número da página -> requisição em andamento
+        this.linhas = new Map();     // id do registro -> { tr, conteudo }
+        this.geracao = 0;            // muda a cada recarga; descarta respostas antigas
+        this.desenhoAgendado = false;
+
+        this.espacoAcima = this.criarEspaco();
+        this.espacoAbaixo = this.criarEspaco();
+        this.container.addEventListener('scroll', () => this.agendarDesenho(), { passive: true });
+        window.addEventListener('resize', () => this.agendarDesenho());
+    }
+
+    criarEspaco() {
+        const tr = document.createElement('tr');
+        tr.className = 'espaco-virtual';
+        const td = document.createElement('td');
+        td.colSpan = this.colunas;
+        tr.appendChild(td);
+        return tr;
+    }
+
+    caminhoPagina(numero) {
+        const params = new URLSearchParams(this.parametros);
+        params.set('limite', this.tamanhoPagina);
+        params.set('deslocamento', numero * this.tamanhoPagina);
+        return `${this.endpoint}?${params}`;
+    }
+
+    // Primeira página já obtida por outra via (ex.: carga inicial em lote)
+    definirPrimeiraPagina(resposta) {
+        this.geracao++;
+        this.pendentes = new Map();
+        this.paginas = new Map([[0, resposta.itens]]);
+        this.total = resposta.total;
+        this.desenhar();
+    }
+
+    // Recarrega as páginas visíveis; com novos parâmetros (filtros) volta ao topo
+    async recarregar(parametros = this.parametros) {
+        if (parametros !== this.parametros) {
+            this.parametros = parametros;
+            this.total = null;
+            this.container.scrollTop = 0;
+        }
+        const geracao = ++this.geracao;
+        this.pendentes = new Map();
+
+        // As linhas atuais continuam na tela até as novas páginas chegarem
+        const [inicio, fim] = this.faixaVisivel();
+        const numeros = this.paginasDaFaixa(inicio, fim);
+        const respostas = await Promise.all(numeros.map(numero => this.buscarPagina(numero)));
+        if (geracao !== this.geracao) {
+            return;
+        }
+        this.paginas = new Map(numeros.map((numero, i) => [numero, respostas[i].itens]));
+        this.total = respostas[respostas.length - 1].total;
+        this.desenhar();
+    }
+
+    buscarPagina(numero) {
+        return apiCall(this.caminhoPagina(numero), { silencioso: true });
+    }
+
+    carregarPagina(numero) {
+        if (!this.pendentes.has(numero)) {
+            const geracao = this.geracao;
+            const pendentes = this.pendentes;
+            const requisicao = this.buscarPagina(numero).then(resposta => {
+                if (geracao === this.geracao) {
+                    this.paginas.set(numero, resposta.itens);
+                    this.total = resposta.total;
+                    this.agendarDesenho();
+                }
+            }).catch(error => {
+                console.error('Erro ao carregar página:', error);
+            }).finally(() => pendentes.delete(numero));
+            pendentes.set(numero, requisicao);
+        }
+        return this.pendentes.get(numero);
+    }
+
+    // Registro já carregado com o id informado (as ações da tabela só atuam sobre linhas visíveis)
+    obter(id) {
+        for (const itens of this.paginas.values()) {
+            const item = itens.find(registro => registro.id === id);
+            if (item) {
+                return item;
+            }
+        }
+        return null;
+    }
+
+    faixaVisivel() {
+        const altura = this.alturaLinha || ALTURA_LINHA_PADRAO;
+        const inicio = Math.max(0, Math.floor(this.container.scrollTop / altura) - this.margem);
+        let fim = inicio + Math.ceil(this.container.clientHeight / altura) + 2 * this.margem;
+        if (this.total !== null) {
+            fim = Math.min(fim, this.total);
+        }
+        return [inicio, fim];
+    }
+
+    paginasDaFaixa(inicio, fim) {
+        const primeira = Math.floor(inicio / this.tamanhoPagina);
+        const ultima = Math.floor(Math.max(inicio, fim - 1) / this.tamanhoPagina);
+        const numeros = [];
+        for (let numero = primeira; numero <= ultima; numero++) {
+            numeros.push(numero);
+        }
+        return numeros;
+    }
+
+    agendarDesenho() {
+        if (this.desenhoAgendado) {
+            return;
+        }
+        this.desenhoAgendado = true;
+        requestAnimationFrame(() => {
+            this.desenhoAgendado = false;
+            this.desenhar();
+        });
+    }
+
+    linhaDoRegistro(registro) {
+        const conteudo = JSON.stringify(registro);
+        const existente = this.linhas.get(registro.id);
+        if (existente && existente.conteudo === conteudo) {
+            return existente.tr;
+        }
+        const modelo = document.createElement('template');
+        modelo.innerHTML = this.renderLinha(registro).trim();
+        const tr = modelo.content.firstElementChild;
+        this.linhas.set(registro.id, { tr, conteudo });
+        return tr;
+    }
+
+    linhaPendente(posicao) {
+        const chave = `pendente-${posicao}`;
+        if (!this.linhas.has(chave)) {
+            const tr = document.createElement('tr');
+            tr.className = 'linha-pendente';
+            tr.innerHTML = `<td colspan="${this.colunas}">Carregando...</td>`;
+            this.linhas.set(chave, { tr, conteudo: null });
+        }
+        return this.linhas.get(chave).tr;
+    }
+
+    desenhar() {
+        if (this.total === 0) {
+            this.tbody.innerHTML = `<tr><td colspan="${this.colunas}" style="text-align: center; padding: 20px;">${this.vazio}</td></tr>`;
+            this.linhas.clear();
+            return;
+        }
+
+        const [inicio, fim] = this.faixaVisivel();
+        for (const numero of this.paginasDaFaixa(inicio, fim)) {
+            if (!this.paginas.has(numero)) {
+                this.carregarPagina(numero);
+            }
+        }
+
+        const desejadas = [];
+        for (let posicao = inicio; posicao < fim; posicao++) {
+            const itens = this.paginas.get(Math.floor(posicao / this.tamanhoPagina));
+            const registro = itens && itens[posicao % this.tamanhoPagina];
+            desejadas.push(registro ? this.linhaDoRegistro(registro) : this.linhaPendente(posicao));
+        }
+
+        const altura = this.alturaLinha || ALTURA_LINHA_PADRAO;
+        const total = this.total === null ? fim : this.total;
+        this.espacoAcima.firstChild.style.height = `${inicio * altura}px`;
+        this.espacoAbaixo.firstChild.style.height = `${Math.max(0, total - fim) * altura}px`;
+
+        // Reordena no lugar: linhas que continuam visíveis não saem do DOM
+        if (this.espacoAcima.parentNode !== this.tbody) {
+            this.tbody.replaceChildren(this.espacoAcima, this.espacoAbaixo);
+        }
+        let atual = this.espacoAcima.nextSibling;
+        for (const tr of desejadas) {
+            if (tr === atual) {
+                atual = atual.nextSibling;
+            } else {
+                this.tbody.insertBefore(tr, atual);
+            }
+        }
+        while (atual !== this.espacoAbaixo) {
+            const proxima = atual.nextSibling;
+            atual.remove();
+            atual = proxima;
+        }
+        for (const [chave, linha] of this.linhas) {
+            if (!linha.tr.isConnected) {
+                this.linhas.delete(chave);
+            }
+        }
+
+        // A altura real só é conhecida com a tabela visível
+        if (this.alturaLinha === null && desejadas.length && desejadas[0].offsetHeight) {
+            this.alturaLinha = desejadas[0].offsetHeight;
+            this.agendarDesenho();
+        }
     }
 }
 
 // Dashboard
 async function loadDashboard() {
     try {
-        const stats = await apiCall('/dashboard/estatisticas');
-        
-        document.getElementById('total-clientes').textContent = stats.total_clientes;
-        document.getElementById('agendamentos-hoje').textContent = stats.agendamentos_hoje;
-        document.getElementById('total-servicos').textContent = stats.total_servicos;
-        document.getElementById('receita-mes').textContent = formatCurrency(stats.receita_mes);
-
-        // Carregar agendamentos de hoje
-        const agendamentosHoje = await apiCall('/dashboard/agendamentos-hoje');
-        renderAgendamentosHoje(agendamentosHoje);
-
-        // Carregar próximos agendamentos
-        const proximosAgendamentos = await apiCall('/dashboard/proximos-agendamentos');
-        renderProximosAgendamentos(proximosAgendamentos);
-        
+        const [stats, agendamentosHoje, proximosAgendamentos] = await apiBatch([
+            '/api/dashboard/estatisticas',
+            '/api/dashboard/agendamentos-hoje',
+            '/api/dashboard/proximos-agendamentos'
+        ]);
+        renderDashboard(stats, agendamentosHoje, proximosAgendamentos);
     } catch (error) {
         console.error('Erro ao carregar dashboard:', error);
     }
 }
 
+function renderDashboard(stats, agendamentosHoje, proximosAgendamentos) {
+    document.getElementById('total-clientes').textContent = stats.total_clientes;
+    document.getElementById('agendamentos-hoje').textContent = stats.agendamentos_hoje;
+    document.getElementById('total-servicos').textContent = stats.total_servicos;
+    document.getElementById('receita-mes').textContent = formatCurrency(stats.receita_mes);
+
+    renderAgendamentosHoje(agendamentosHoje);
+    renderProximosAgendamentos(proximosAgendamentos);
+}
+
 function renderAgendamentosHoje(agendamentos) {
     const container = document.getElementById('agendamentos-hoje-lista');
     
@@ -234,23 +570,17 @@ function renderProximosAgendamentos(agendamentos) {
 
 // Clientes
 async function loadClientes() {
+    // O select do agendamento é recarregado na próxima abertura do modal
+    clientes = null;
     try {
-        clientes = await apiCall('/clientes');
-        renderClientes();
+        await tabelaClientes.recarregar();
     } catch (error) {
         console.error('Erro ao carregar clientes:', error);
     }
 }
 
-function renderClientes() {
-    const tbody = document.querySelector('#tabela-clientes tbody');
-    
-    if (clientes.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="5" style="text-align: center; padding: 20px;">Nenhum cliente cadastrado</td></tr>';
-        return;
-    }
-
-    tbody.innerHTML = clientes.map(cliente => `
+function linhaCliente(cliente) {
+    return `
         <tr>
             <td>${cliente.nome}</td>
             <td>${cliente.telefone}</td>
@@ -265,17 +595,19 @@ function renderClientes() {
                 </button>
             </td>
         </tr>
-    `).join('');
+    `;
 }
 
 function abrirModalCliente(clienteId = null) {
+    chaveIdempotencia = novaChaveIdempotencia();
     editingItem = clienteId;
     const modal = document.getElementById('modal-cliente');
     const titulo = document.getElementById('modal-cliente-titulo');
     const form = document.getElementById('form-cliente');
     
     if (clienteId) {
-        const cliente = clientes.find(c => c.id === clienteId);
+        const cliente = tabelaClientes.obter(clienteId);
+        itemEmEdicao = cliente;
         titulo.textContent = 'Editar Cliente';
         document.getElementById('cliente-nome').value = cliente.nome;
         document.getElementById('cliente-telefone').value = cliente.telefone;
@@ -319,12 +651,14 @@ async function handleClienteSubmit(e) {
         if (editingItem) {
             await apiCall(`/clientes/${editingItem}`, {
                 method: 'PUT',
+                headers: { 'Idempotency-Key': chaveIdempotencia, ...cabecalhoVersao(itemEmEdicao) },
                 body: JSON.stringify(formData)
             });
             showNotification('Cliente atualizado com sucesso!');
         } else {
             await apiCall('/clientes', {
                 method: 'POST',
+                headers: { 'Idempotency-Key': chaveIdempotencia },
                 body: JSON.stringify(formData)
             });
             showNotification('Cliente criado com sucesso!');
@@ -334,6 +668,11 @@ async function handleClienteSubmit(e) {
         loadClientes();
     } catch (error) {
         console.error('Erro ao salvar cliente:', error);
+        // Alterado em outro dispositivo: recarrega para editar a versão atual
+        if (error.status === 412) {
+            fecharModal('modal-cliente');
+            loadClientes();
+        }
     }
 }
 
@@ -395,6 +734,7 @@ function updateServicoSelects() {
 }
 
 function abrirModalServico(servicoId = null) {
+    chaveIdempotencia = novaChaveIdempotencia();
     editingItem = servicoId;
     const modal = document.getElementById('modal-servico');
     const titulo = document.getElementById('modal-servico-titulo');
@@ -402,6 +742,7 @@ function abrirModalServico(servicoId = null) {
     
     if (servicoId) {
         const servico = servicos.find(s => s.id === servicoId);
+        itemEmEdicao = servico;
         titulo.textContent = 'Editar Serviço';
         document.getElementById('servico-nome').value = servico.nome;
         document.getElementById('servico-descricao').value = servico.descricao || '';
@@ -421,11 +762,17 @@ function editarServico(id) {
 
 async function toggleServico(id) {
     try {
-        await apiCall(`/servicos/${id}/toggle`, { method: 'PATCH' });
+        await apiCall(`/servicos/${id}/toggle`, {
+            method: 'PATCH',
+            headers: cabecalhoVersao(servicos.find(s => s.id === id))
+        });
         showNotification('Status do serviço atualizado!');
         loadServicos();
     } catch (error) {
         console.error('Erro ao alterar status do serviço:', error);
+        if (error.status === 412) {
+            loadServicos();
+        }
     }
 }
 
@@ -457,12 +804,14 @@ async function handleServicoSubmit(e) {
         if (editingItem) {
             await apiCall(`/servicos/${editingItem}`, {
                 method: 'PUT',
+                headers: { 'Idempotency-Key': chaveIdempotencia, ...cabecalhoVersao(itemEmEdicao) },
                 body: JSON.stringify(formData)
             });
             showNotification('Serviço atualizado com sucesso!');
         } else {
             await apiCall('/servicos', {
                 method: 'POST',
+                headers: { 'Idempotency-Key': chaveIdempotencia },
                 body: JSON.stringify(formData)
             });
             showNotification('Serviço criado com sucesso!');
@@ -472,29 +821,25 @@ async function handleServicoSubmit(e) {
         loadServicos();
     } catch (error) {
         console.error('Erro ao salvar serviço:', error);
+        if (error.status === 412) {
+            fecharModal('modal-servico');
+            loadServicos();
+        }
     }
 }
 
 // Agendamentos
+// Recarrega as linhas visíveis mantendo filtros e posição da rolagem
 async function loadAgendamentos() {
     try {
-        agendamentos = await apiCall('/agendamentos');
-        renderAgendamentos();
-        updateClienteSelects();
+        await tabelaAgendamentos.recarregar();
     } catch (error) {
         console.error('Erro ao carregar agendamentos:', error);
     }
 }
 
-function renderAgendamentos() {
-    const tbody = document.querySelector('#tabela-agendamentos tbody');
-    
-    if (agendamentos.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="6" style="text-align: center; padding: 20px;">Nenhum agendamento encontrado</td></tr>';
-        return;
-    }
-
-    tbody.innerHTML = agendamentos.map(agendamento => `
+function linhaAgendamento(agendamento) {
+    return `
         <tr>
             <td>${formatDateTime(agendamento.data_agendamento)}</td>
             <td>${agendamento.cliente_nome}</td>
@@ -502,7 +847,7 @@ function renderAgendamentos() {
             <td>${formatCurrency(agendamento.servico_preco)}</td>
             <td>
                 <span class="status-badge status-${agendamento.status}">
-                    ${agendamento.status.charAt(0).toUpperCase() + agendamento.status.slice(1)}
+                    ${formatStatus(agendamento.status)}
                 </span>
             </td>
             <td>
@@ -522,7 +867,14 @@ function renderAgendamentos() {
                 </button>
             </td>
         </tr>
-    `).join('');
+    `;
+}
+
+async function carregarClientesSelect() {
+    if (clientes === null) {
+        clientes = await apiCall('/clientes');
+        updateClienteSelects();
+    }
 }
 
 function updateClienteSelects() {
@@ -537,14 +889,22 @@ function updateClienteSelects() {
     });
 }
 
-function abrirModalAgendamento(agendamentoId = null) {
+async function abrirModalAgendamento(agendamentoId = null) {
+    chaveIdempotencia = novaChaveIdempotencia();
     editingItem = agendamentoId;
     const modal = document.getElementById('modal-agendamento');
     const titulo = document.getElementById('modal-agendamento-titulo');
     const form = document.getElementById('form-agendamento');
+
+    try {
+        await carregarClientesSelect();
+    } catch (error) {
+        console.error('Erro ao carregar clientes:', error);
+    }
     
     if (agendamentoId) {
-        const agendamento = agendamentos.find(a => a.id === agendamentoId);
+        const agendamento = tabelaAgendamentos.obter(agendamentoId);
+        itemEmEdicao = agendamento;
         titulo.textContent = 'Editar Agendamento';
         
         const dataAgendamento = new Date(agendamento.data_agendamento);
@@ -572,6 +932,7 @@ async function concluirAgendamento(id) {
     try {
         await apiCall(`/agendamentos/${id}/status`, {
             method: 'PATCH',
+            headers: cabecalhoVersao(tabelaAgendamentos.obter(id)),
             body: JSON.stringify({ status: 'concluido' })
         });
         showNotification('Agendamento concluído!');
@@ -581,6 +942,9 @@ async function concluirAgendamento(id) {
         }
     } catch (error) {
         console.error('Erro ao concluir agendamento:', error);
+        if (error.status === 412) {
+            loadAgendamentos();
+        }
     }
 }
 
@@ -592,6 +956,7 @@ async function cancelarAgendamento(id) {
     try {
         await apiCall(`/agendamentos/${id}/status`, {
             method: 'PATCH',
+            headers: cabecalhoVersao(tabelaAgendamentos.obter(id)),
             body: JSON.stringify({ status: 'cancelado' })
         });
         showNotification('Agendamento cancelado!');
@@ -601,6 +966,9 @@ async function cancelarAgendamento(id) {
         }
     } catch (error) {
         console.error('Erro ao cancelar agendamento:', error);
+        if (error.status === 412) {
+            loadAgendamentos();
+        }
     }
 }
 
@@ -639,12 +1007,14 @@ async function handleAgendamentoSubmit(e) {
         if (editingItem) {
             await apiCall(`/agendamentos/${editingItem}`, {
                 method: 'PUT',
+                headers: { 'Idempotency-Key': chaveIdempotencia, ...cabecalhoVersao(itemEmEdicao) },
                 body: JSON.stringify(formData)
             });
             showNotification('Agendamento atualizado com sucesso!');
         } else {
             await apiCall('/agendamentos', {
                 method: 'POST',
+                headers: { 'Idempotency-Key': chaveIdempotencia },
                 body: JSON.stringify(formData)
             });
             showNotification('Agendamento criado com sucesso!');
@@ -657,31 +1027,34 @@ async function handleAgendamentoSubmit(e) {
         }
     } catch (error) {
         console.error('Erro ao salvar agendamento:', error);
+        if (error.status === 412) {
+            fecharModal('modal-agendamento');
+            loadAgendamentos();
+        }
     }
 }
 
 // Filtros
-async function aplicarFiltros() {
+function filtrosAgendamentos() {
     const data = document.getElementById('filtro-data').value;
     const status = document.getElementById('filtro-status').value;
-    
-    let url = '/agendamentos?';
-    const params = [];
-    
+    const params = new URLSearchParams();
+
     if (data) {
-        params.push(`data_inicio=${data}T00:00:00`);
-        params.push(`data_fim=${data}T23:59:59`);
+        params.set('data_inicio', `${data}T00:00:00`);
+        params.set('data_fim', `${data}T23:59:59`);
     }
-    
+
     if (status) {
-        params.push(`status=${status}`);
+        params.set('status', status);
     }
-    
-    url += params.join('&');
-    
+
+    return params.toString();
+}
+
+async function aplicarFiltros() {
     try {
-        agendamentos = await apiCall(url);
-        renderAgendamentos();
+        await tabelaAgendamentos.recarregar(filtrosAgendamentos());
     } catch (error) {
         console.error('Erro ao aplicar filtros:', error);
     }
@@ -691,5 +1064,6 @@ async function aplicarFiltros() {
 function fecharModal(modalId) {
     document.getElementById(modalId).classList.remove('active');
     editingItem = null;
+    itemEmEdicao = null;
 }
 